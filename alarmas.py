@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from lecturas import parsear_lecturas, variable_de_punto
+
+# ==========================================
+# LÍMITES DE ALARMA POR PUNTO
+# ==========================================
+# Hoja 3_MONITOREO/LIMITES: ID_Punto | Alerta | Disparo | Tasa_Max (unidades por hora).
+# Los puntos sin fila (o con celdas vacías) usan el límite por defecto de su variable.
+COLUMNAS_LIMITES = ["ID_Punto", "Alerta", "Disparo", "Tasa_Max"]
+LIMITES_DEFECTO = {
+    "TEM": (80.0, 95.0, 10.0),              # °C · °C/h
+    "VIB": (4.5, 7.1, 2.0),                 # mm/s RMS (ISO 10816, máquinas medianas)
+    "AMP": (np.nan, np.nan, np.nan),        # Depende de la placa del motor: solo con límite propio
+}
+
+NORMAL = "Normal"
+ALERTA = "Alerta"
+ALERTA_TASA = "Alerta (tasa)"
+DISPARO = "Disparo"
+SIN_LECTURAS = "Sin lecturas"
+NIVEL_ALARMA = {NORMAL: 0, ALERTA_TASA: 1, ALERTA: 1, DISPARO: 2}
+ICONOS_ALARMA = {NORMAL: "🟢", ALERTA_TASA: "🟠", ALERTA: "🟠", DISPARO: "🔴", SIN_LECTURAS: "⚪"}
+
+
+def tabla_limites(df_limites, puntos):
+    """DataFrame Alerta / Disparo / Tasa_Max indexado por ID_Punto (hoja LIMITES o defecto)"""
+    puntos = pd.Index(pd.unique(pd.Series(puntos, dtype=object).astype(str)))
+    variables = variable_de_punto(pd.Series(puntos, dtype=object))
+    limites = pd.DataFrame([LIMITES_DEFECTO.get(v, (np.nan,) * 3) for v in variables],
+                           index=puntos, columns=COLUMNAS_LIMITES[1:], dtype=float)
+    if not df_limites.empty and "ID_Punto" in df_limites.columns:
+        propios = df_limites.assign(ID_Punto=df_limites["ID_Punto"].astype(str)).drop_duplicates("ID_Punto", keep="last")
+        propios = (propios.set_index("ID_Punto")
+                   .reindex(columns=COLUMNAS_LIMITES[1:])
+                   .apply(pd.to_numeric, errors="coerce"))
+        limites = propios.reindex(puntos.union(propios.index)).combine_first(limites)
+    return limites
+
+
+# ==========================================
+# EVALUACIÓN VECTORIZADA
+# ==========================================
+def evaluar(datos, limites):
+    """
+    Estado de cada lectura de 'datos' (columnas de parsear_lecturas, ordenadas por
+    punto y fecha), en una pasada:
+      - valor >= Disparo -> Disparo; valor >= Alerta -> Alerta
+      - |Δvalor| / Δhoras respecto a la lectura anterior del mismo punto > Tasa_Max -> Alerta (tasa)
+    Retorna Serie de estados alineada con datos.
+    """
+    if datos.empty:
+        return pd.Series([], index=datos.index, dtype=object)
+    lim = limites.reindex(datos["ID_Punto"].astype(str).to_numpy())
+    valor = datos["valor"].to_numpy(dtype=float)
+    punto = datos["ID_Punto"].to_numpy(dtype=object)
+    horas = datos["fecha"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 3.6e12
+
+    mismo_punto = np.r_[False, punto[1:] == punto[:-1]]
+    delta_v = np.abs(np.diff(valor, prepend=np.nan))
+    delta_h = np.diff(horas, prepend=np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tasa = np.where(mismo_punto & (delta_h > 0), delta_v / delta_h, 0.0)
+        disparo = valor >= lim["Disparo"].to_numpy()
+        alerta = valor >= lim["Alerta"].to_numpy()
+        por_tasa = tasa > lim["Tasa_Max"].to_numpy()
+
+    estado = np.select([disparo, alerta, por_tasa], [DISPARO, ALERTA, ALERTA_TASA], NORMAL)
+    return pd.Series(estado, index=datos.index, dtype=object)
+
+
+def evaluar_lote(df_nuevas, indice, df_limites):
+    """
+    Estado de filas nuevas (formato de la hoja LECTURAS) antes de escribirlas.
+    La tasa de cambio se mide contra la última lectura guardada de cada punto.
+    Retorna lista de estados en el orden de df_nuevas.
+    """
+    nuevas = parsear_lecturas(df_nuevas.reset_index(drop=True))
+    previas = indice.ultimas(list(dict.fromkeys(zip(nuevas["tag"], nuevas["variable"]))))
+    juntas = (pd.concat([previas.assign(fila=-1), nuevas], ignore_index=True)
+              .sort_values(["ID_Punto", "fecha"], kind="mergesort"))
+    estados = evaluar(juntas.reset_index(drop=True), tabla_limites(df_limites, juntas["ID_Punto"]))
+    estados.index = juntas["fila"].to_numpy()
+    return estados.drop(-1, errors="ignore").reindex(range(len(nuevas))).fillna(NORMAL).tolist()
+
+
+def estado_actual(indice, df_limites):
+    """
+    Estado de la última lectura de cada punto (con su tasa respecto a la anterior).
+    Es la tabla que consulta el navegador; se calcula una vez por versión de LECTURAS.
+    """
+    ultimas = indice.ultimas(n=2).sort_values(["ID_Punto", "fecha"], kind="mergesort").reset_index(drop=True)
+    if ultimas.empty:
+        return ultimas.assign(Estado=pd.Series(dtype=object))
+    ultimas["Estado"] = evaluar(ultimas, tabla_limites(df_limites, ultimas["ID_Punto"]))
+    punto = ultimas["ID_Punto"].to_numpy(dtype=object)
+    es_ultima = np.r_[punto[1:] != punto[:-1], True]
+    return ultimas[es_ultima].reset_index(drop=True)
+
+
+def alarmas_por_activo(sub, actual):
+    """
+    Peor estado en el subárbol de CADA activo (incluye hijos), a partir de estado_actual.
+    Usa los totales por intervalos de Euler: una pasada para todos los TAGs.
+    """
+    pos = sub.posiciones(actual["tag"])
+    nivel = actual["Estado"].map(NIVEL_ALARMA).fillna(0).to_numpy()
+    con_lecturas = sub.totales(pos)
+    disparos = sub.totales(pos[nivel == 2])
+    alertas = sub.totales(pos[nivel == 1])
+    return pd.Series(np.select([disparos > 0, alertas > 0, con_lecturas > 0], [DISPARO, ALERTA, NORMAL], SIN_LECTURAS),
+                     index=con_lecturas.index)
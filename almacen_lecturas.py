@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lecturas import parsear_fechas
+
+# ==========================================
+# ALMACÉN LOCAL COLUMNAR DE LECTURAS
+# ==========================================
+# Las lecturas de meses cerrados no cambian: se guardan una vez en Parquet, particionadas
+# por mes y con columnas tipadas. De Drive solo se descarga lo posterior a lo ya guardado.
+#
+#   datos_locales/lecturas/
+#     manifiesto.json                     {"columnas", "filas", "archivos": [{"mes", "ruta", "filas"}]}
+#     mes=2024-05/filas_00000000_00012000.parquet
+#
+# "filas" = cuántas filas iniciales de la hoja están guardadas (el Excel, en su orden).
+# Cada archivo lleva la columna _fila para reconstruir ese orden al leer.
+#
+# Solo el proceso que descarga (el líder) modifica el almacén. Las demás réplicas piden
+# descartarlo dejando el archivo DESCARTE; el líder lo atiende en su siguiente sincronizar.
+
+MANIFIESTO = "manifiesto.json"
+DESCARTE = "descartar.solicitud"
+SIN_FECHA = "sin_fecha"
+
+
+def tipar_lecturas(df):
+    """Fecha_Lectura -> datetime, Valor_Medido -> float; el resto como texto"""
+    df = df.copy()
+    for col in df.columns:
+        if col == "Fecha_Lectura":
+            df[col] = parsear_fechas(df[col]).astype("datetime64[ns]")
+        elif col == "Valor_Medido":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        else:
+            df[col] = df[col].astype(str)
+    return df
+
+
+def _misma_fila(a, b):
+    return [str(v) for v in a.to_numpy()] == [str(v) for v in b.to_numpy()]
+
+
+class AlmacenLecturas:
+    """
+    Uso desde el cargador:
+      1. fila_desde() -> fila del Excel desde la que hay que descargar LECTURAS
+      2. sincronizar(df_descargado) -> LECTURAS completa y tipada (o None si la hoja
+         ya no coincide con lo guardado y hay que descargarla entera)
+    """
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._manifiesto = self._leer_manifiesto()
+        self._selladas = None   # Meses cerrados en memoria; se leen del disco al primer uso
+
+    @property
+    def filas(self):
+        return self._manifiesto["filas"]
+
+    def fila_desde(self):
+        """
+        Fila del Excel a partir de la cual descargar. Incluye la última fila guardada
+        para comprobar que la hoja no cambió por encima de lo sellado.
+        """
+        with self._lock:
+            self._releer_manifiesto()
+            return self.filas + 1 if self.filas else None
+
+    # --- Sincronización ---
+    def sincronizar(self, df_descargado, hoy=None):
+        """
+        Une lo guardado con lo descargado desde fila_desde() y sella en Parquet las
+        filas nuevas de meses ya cerrados. Retorna el DataFrame completo de la hoja.
+        """
+        with self._lock:
+            self._releer_manifiesto()
+            if os.path.exists(os.path.join(self.directorio, DESCARTE)):
+                descargada_entera = not self.filas
+                self._reiniciar()
+                if not descargada_entera:
+                    return None     # Lo descargado partía de lo sellado: hay que bajar la hoja entera
+
+            cola = tipar_lecturas(df_descargado)
+            selladas = self.selladas()
+            if self.filas:
+                if (list(cola.columns) != self._manifiesto["columnas"] or cola.empty
+                        or not _misma_fila(cola.iloc[0], selladas.iloc[-1])):
+                    self._reiniciar()
+                    return None
+                cola = cola.iloc[1:]
+
+            # Se sella el tramo inicial que ya pertenece a meses cerrados (el Excel crece al final)
+            hoy = hoy or datetime.now()
+            inicio_mes = np.datetime64(datetime(hoy.year, hoy.month, 1), "ns")
+            fechas = cola["Fecha_Lectura"].to_numpy() if "Fecha_Lectura" in cola.columns else np.full(len(cola), np.datetime64("NaT"))
+            abiertas = ~(np.isnat(fechas) | (fechas < inicio_mes))
+            n = int(np.argmax(abiertas)) if abiertas.any() else len(cola)
+            if n:
+                self._sellar(cola.iloc[:n])
+                selladas = self._selladas
+
+            return pd.concat([selladas, cola.iloc[n:]], ignore_index=True) if len(selladas) else cola.iloc[n:].reset_index(drop=True)
+
+    def selladas(self):
+        """Filas guardadas, en el orden del Excel (lectura memory-mapped, una vez por proceso)"""
+        if self._selladas is None:
+            partes = [pq.read_table(os.path.join(self.directorio, a["ruta"]), memory_map=True).to_pandas()
+                      for a in self._manifiesto["archivos"]]
+            if partes:
+                df = pd.concat(partes, ignore_index=True).sort_values("_fila", kind="mergesort")
+                self._selladas = df.drop(columns="_fila").reset_index(drop=True)
+            else:
+                self._selladas = tipar_lecturas(pd.DataFrame(columns=self._manifiesto["columnas"] or []))
+        return self._selladas
+
+    def _sellar(self, nuevas):
+        inicio, fin = self.filas, self.filas + len(nuevas)
+        df = nuevas.assign(_fila=np.arange(inicio, fin, dtype=np.int64))
+        meses = (df["Fecha_Lectura"].dt.strftime("%Y-%m").fillna(SIN_FECHA)
+                 if "Fecha_Lectura" in df.columns else pd.Series(SIN_FECHA, index=df.index))
+
+        archivos = []
+        for mes, grupo in df.groupby(meses.to_numpy(), sort=True):
+            ruta = os.path.join(f"mes={mes}", f"filas_{inicio:08d}_{fin:08d}.parquet")
+            destino = os.path.join(self.directorio, ruta)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            pq.write_table(pa.Table.from_pandas(grupo, preserve_index=False), destino + ".tmp")
+            os.replace(destino + ".tmp", destino)
+            archivos.append({"mes": mes, "ruta": ruta, "filas": len(grupo)})
+
+        # El manifiesto se escribe al final: un corte a mitad deja archivos huérfanos, no filas dobles
+        self._manifiesto = {
+            "columnas": list(nuevas.columns),
+            "filas": fin,
+            "archivos": self._manifiesto["archivos"] + archivos,
+        }
+        self._escribir_manifiesto()
+        previas = self.selladas()
+        self._selladas = pd.concat([previas, nuevas], ignore_index=True) if len(previas) else nuevas.reset_index(drop=True)
+
+    # --- Manifiesto ---
+    def meses(self):
+        """{mes: filas guardadas}"""
+        conteo = {}
+        for a in self._manifiesto["archivos"]:
+            conteo[a["mes"]] = conteo.get(a["mes"], 0) + a["filas"]
+        return conteo
+
+    def _leer_manifiesto(self):
+        try:
+            with open(os.path.join(self.directorio, MANIFIESTO), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"columnas": None, "filas": 0, "archivos": []}
+
+    def _releer_manifiesto(self):
+        """Otro proceso pudo haber sellado desde que se leyó (p. ej. el líder anterior)"""
+        en_disco = self._leer_manifiesto()
+        if en_disco != self._manifiesto:
+            self._manifiesto, self._selladas = en_disco, None
+
+    def _escribir_manifiesto(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, MANIFIESTO)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._manifiesto, f)
+        os.replace(ruta + ".tmp", ruta)
+
+    def descartar(self):
+        """
+        Pide volver a sellar desde Drive (p. ej. tras reescribir una columna). No se borra aquí:
+        otro proceso puede estar leyendo el almacén; lo borra quien lo sincroniza.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(os.path.join(self.directorio, DESCARTE), "w"):
+            pass
+
+    def _reiniciar(self):
+        """Descarta lo guardado (la hoja se editó en meses ya sellados)"""
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        self._manifiesto = {"columnas": None, "filas": 0, "archivos": []}
+        self._selladas = None
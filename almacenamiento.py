@@ -0,0 +1,249 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from carga_datos import LIBROS, HOJAS_OPCIONALES, ACTIVOS, MATERIALES, BOM, ORDENES, LECTURAS, leer_libro, _a1_a_posicion
+from escritura import _bloques_contiguos, _valor_celda, valores_api
+from sincronizador import fila_final_de_rango
+
+# ==========================================
+# ALMACENAMIENTO INTERCAMBIABLE (DRIVE / SQLITE)
+# ==========================================
+# La app solo usa estas operaciones, con la convención de posiciones de la hoja de cálculo
+# (fila 1 = encabezados, la fila i del DataFrame vive en la fila i+2):
+#   leer_libro(libro, hojas, desde=None, opcionales=()) -> ({hoja: DataFrame}, segundos)
+#   leer_hoja(libro, hoja)                              -> DataFrame
+#   anexar_filas(libro, hoja, filas)                    -> última fila escrita (o None)
+#   actualizar_rangos(libro, hoja, data)                   data = [{"range": "B5:D5", "values": [[...]]}] (sin la hoja)
+#   borrar_filas(libro, hoja, filas)                       filas del Excel
+#   reescribir_hoja(libro, hoja, valores)                  encabezados + filas
+# nombre: texto para mensajes ("Google Drive", "SQLite local").
+
+
+class AlmacenamientoDrive:
+    """
+    Google Sheets vía gspread (o cualquier cliente con la misma interfaz, como ClienteLocal).
+    client: cliente ya creado, o conectar: función que lo crea en el primer uso (así el import
+    de gspread y la lectura de credenciales no frenan el arranque si hay datos en disco).
+    """
+    nombre = "Google Drive"
+
+    def __init__(self, client=None, conectar=None):
+        self._client = client
+        self._conectar = conectar
+        self._lock = threading.Lock()
+        self._encabezados = {}      # {(libro, hoja): encabezados} de las hojas leídas con proyección
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._conectar() if self._conectar else None
+                    if self._client is None:
+                        raise RuntimeError("No hay credenciales para conectarse a Google Drive")
+        return self._client
+
+    def _hoja(self, libro, hoja):
+        sh = self.client.open(libro)
+        try:
+            return sh.worksheet(hoja)
+        except Exception:
+            # Si no encuentra la hoja exacta, toma la primera
+            return sh.get_worksheet(0)
+
+    def leer_libro(self, libro, hojas, desde=None, opcionales=(), columnas=None, omitir=None):
+        return leer_libro(self.client, libro, hojas, desde, opcionales, columnas, omitir, self._encabezados)
+
+    def leer_hoja(self, libro, hoja, columnas=None):
+        """La hoja completa, o solo 'columnas' (solo esos rangos se piden y se parsean)"""
+        return self.leer_libro(libro, [hoja], columnas={hoja: columnas} if columnas else None)[0][hoja]
+
+    def anexar_filas(self, libro, hoja, filas):
+        resp = self._hoja(libro, hoja).append_rows(filas)
+        return fila_final_de_rango((resp or {}).get("updates", {}).get("updatedRange"))
+
+    def actualizar_rangos(self, libro, hoja, data):
+        self._hoja(libro, hoja).batch_update(data)
+
+    def borrar_filas(self, libro, hoja, filas):
+        # Un solo batchUpdate con todos los deleteDimension, de abajo hacia arriba
+        ws = self._hoja(libro, hoja)
+        pedidos = [{
+            "deleteDimension": {
+                "range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": ini - 1, "endIndex": fin}
+            }
+        } for ini, fin in _bloques_contiguos(filas)]
+        ws.spreadsheet.batch_update({"requests": pedidos})
+
+    def reescribir_hoja(self, libro, hoja, valores):
+        ws = self._hoja(libro, hoja)
+        ws.clear()
+        ws.update(valores)
+
+
+# ==========================================
+# SQLITE LOCAL
+# ==========================================
+# Una tabla por hoja ("libro/hoja"); el orden de las filas es el rowid (una fila nueva
+# siempre recibe el mayor), así la posición en la "hoja" se conserva al borrar sin renumerar.
+# Las celdas se guardan con el tipo que llegan (SQLite tipa por valor): igual que Drive,
+# la app recibe números o texto y el esquema los convierte al cargar.
+INDICES = {
+    ACTIVOS: [["TAG"], ["TAG_Padre"]],
+    MATERIALES: [["SKU"]],
+    BOM: [["TAG_Equipo"], ["SKU_Material"]],
+    ORDENES: [["TAG_Equipo"], ["Estado_OT"]],
+    LECTURAS: [["ID_Punto", "Fecha_Lectura"]],
+}
+
+
+def _ident(nombre):
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+class AlmacenamientoSQLite:
+    """
+    Las mismas hojas en un archivo SQLite (sin red). Sirve para trabajar sin conexión,
+    para pruebas de rendimiento reproducibles y para plantas con historiales muy grandes.
+    """
+    nombre = "SQLite local"
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._local = threading.local()     # Una conexión por hilo (sqlite3 no se comparte entre hilos)
+        with self._conexion() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+
+    def _conexion(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30)
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    @staticmethod
+    def _tabla(libro, hoja):
+        return _ident(f"{libro}/{hoja}")
+
+    def _columnas(self, con, libro, hoja):
+        """Encabezados de la hoja en orden, o None si la hoja no existe"""
+        filas = con.execute(f"PRAGMA table_info({self._tabla(libro, hoja)})").fetchall()
+        return [f[1] for f in filas] if filas else None
+
+    def _rowids(self, con, libro, hoja):
+        return [r for (r,) in con.execute(f"SELECT rowid FROM {self._tabla(libro, hoja)} ORDER BY rowid")]
+
+    # --- Lectura ---
+    def leer_libro(self, libro, hojas, desde=None, opcionales=(), columnas=None, omitir=None):
+        """
+        Todas las hojas en una transacción de lectura (misma foto para el libro).
+        columnas / omitir: igual que carga_datos.leer_libro (las omitidas quedan vacías).
+        """
+        t0 = time.perf_counter()
+        desde, columnas, omitir = desde or {}, columnas or {}, omitir or {}
+        con = self._conexion()
+        tablas = {}
+        with con:
+            con.execute("BEGIN")
+            for hoja in hojas:
+                encabezados = self._columnas(con, libro, hoja)
+                if encabezados is None:
+                    tablas[hoja] = pd.DataFrame()
+                    continue
+                pedidas = [c for c in encabezados if (hoja not in columnas or c in columnas[hoja])
+                           and c not in omitir.get(hoja, ())]
+                salto = max((desde.get(hoja) or 2) - 2, 0)
+                filas = con.execute(f"SELECT {', '.join(map(_ident, pedidas)) or 'NULL'} FROM {self._tabla(libro, hoja)} "
+                                    f"ORDER BY rowid LIMIT -1 OFFSET ?", (salto,)).fetchall()
+                df = pd.DataFrame(filas, columns=pedidas).fillna("") if pedidas else pd.DataFrame(index=range(len(filas)))
+                if hoja not in columnas:
+                    df = df.reindex(columns=encabezados, fill_value="")
+                tablas[hoja] = df
+        return tablas, time.perf_counter() - t0
+
+    def leer_hoja(self, libro, hoja, columnas=None):
+        """La hoja completa, o solo 'columnas' (SELECT de esas columnas)"""
+        return self.leer_libro(libro, [hoja], columnas={hoja: columnas} if columnas else None)[0][hoja]
+
+    # --- Escritura ---
+    def anexar_filas(self, libro, hoja, filas):
+        con = self._conexion()
+        with con:
+            columnas = self._columnas(con, libro, hoja)
+            if columnas is None:
+                raise KeyError(f"Hoja no encontrada: {libro}/{hoja}")
+            n = len(columnas)
+            # Filas cortas se completan con "" y las largas se recortan (no hay columnas sin encabezado)
+            con.executemany(f"INSERT INTO {self._tabla(libro, hoja)} VALUES ({', '.join('?' * n)})",
+                            [([_valor_celda(v) for v in f] + [""] * n)[:n] for f in filas])
+            total = con.execute(f"SELECT COUNT(*) FROM {self._tabla(libro, hoja)}").fetchone()[0]
+        return total + 1
+
+    def actualizar_rangos(self, libro, hoja, data):
+        con = self._conexion()
+        with con:
+            columnas = self._columnas(con, libro, hoja)
+            if columnas is None:
+                raise KeyError(f"Hoja no encontrada: {libro}/{hoja}")
+            rowids = self._rowids(con, libro, hoja)
+            for item in data:
+                fila_ini, col_ini = _a1_a_posicion(item["range"].split(":")[0])
+                for i, valores in enumerate(item["values"]):
+                    pos = fila_ini + i - 2
+                    cols = columnas[col_ini - 1:col_ini - 1 + len(valores)]
+                    if pos < 0 or pos >= len(rowids) or not cols:
+                        continue    # Encabezados, filas o columnas fuera de la hoja
+                    asignaciones = ", ".join(f"{_ident(c)} = ?" for c in cols)
+                    con.execute(f"UPDATE {self._tabla(libro, hoja)} SET {asignaciones} WHERE rowid = ?",
+                                (*valores[:len(cols)], rowids[pos]))
+
+    def borrar_filas(self, libro, hoja, filas):
+        con = self._conexion()
+        with con:
+            rowids = self._rowids(con, libro, hoja)
+            borrar = [(rowids[f - 2],) for f in filas if 0 <= f - 2 < len(rowids)]
+            con.executemany(f"DELETE FROM {self._tabla(libro, hoja)} WHERE rowid = ?", borrar)
+
+    def reescribir_hoja(self, libro, hoja, valores):
+        """Reemplaza la hoja entera (encabezados incluidos) y recrea sus índices"""
+        encabezados = [str(h) for h in valores[0]] if valores else []
+        tabla = self._tabla(libro, hoja)
+        con = self._conexion()
+        with con:
+            con.execute(f"DROP TABLE IF EXISTS {tabla}")
+            if not encabezados:
+                return
+            con.execute(f"CREATE TABLE {tabla} ({', '.join(_ident(c) for c in encabezados)})")
+            n = len(encabezados)
+            con.executemany(f"INSERT INTO {tabla} VALUES ({', '.join('?' * n)})",
+                            [(list(f) + [""] * n)[:n] for f in valores[1:]])
+            for cols in INDICES.get((libro, hoja), []):
+                if set(cols) <= set(encabezados):
+                    nombre = _ident(f"ix_{libro}_{hoja}_{'_'.join(cols)}")
+                    con.execute(f"CREATE INDEX {nombre} ON {tabla} ({', '.join(map(_ident, cols))})")
+
+    def importar(self, libro, hoja, df):
+        """Carga un DataFrame como hoja (encabezados = columnas)"""
+        self.reescribir_hoja(libro, hoja, valores_api(df))
+
+
+def copiar_libros(origen, destino, libros=None):
+    """
+    Copia las hojas de un almacenamiento a otro (p. ej. Drive -> SQLite para trabajar sin
+    conexión o pasar una planta grande a SQLite). Retorna {(libro, hoja): filas copiadas}.
+    """
+    copiadas = {}
+    for libro, hojas in (libros or LIBROS).items():
+        tablas, _ = origen.leer_libro(libro, hojas, opcionales=[h for h in hojas if (libro, h) in HOJAS_OPCIONALES])
+        for hoja, df in tablas.items():
+            if len(df.columns):
+                destino.reescribir_hoja(libro, hoja, valores_api(df))
+                copiadas[(libro, hoja)] = len(df)
+    return copiadas
@@ -1,14 +1,34 @@
+import time
+T_INICIO = time.perf_counter()      # Arranque: importaciones y primer pintado (ver medicion.arranque)
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import plotly.express as px
+import os
+import numpy as np
 from datetime import datetime
+from carga_datos import ACTIVOS, MATERIALES, BOM, ORDENES, LECTURAS, LIMITES, HOJAS, TTL_HOJAS, COLUMNAS_DIFERIDAS, cargar_libros
+from sincronizador import Sincronizador
+from escritura import calcular_diff, aplicar_diff, rangos_columna, valores_api
+from almacenamiento import AlmacenamientoDrive, AlmacenamientoSQLite
+from cola_escritura import ColaEscritura, reservar_journal, PENDIENTE, CONFIRMADA
+from jerarquia import IndiceJerarquia, IndiceSubarbol, NIVELES, ESTADOS_OT_CERRADOS, resumen_subarbol
+from lecturas import IndiceLecturas, tag_de_punto, leer_archivo_lecturas, validar_carga, MOTIVOS_RECHAZO
+from almacen_lecturas import AlmacenLecturas
+from publicador import PublicadorSnapshot
+import medicion
+from medicion import tramo, medido, AlmacenamientoMedido, GRAFICO
+from estadisticas import EstadisticasPuntos, VENTANA, Z_ANOMALIA
+from busqueda import IndiceBusqueda
+from esquema import aplicar_esquema, sin_categorias, ErrorEsquema
+from alarmas import (COLUMNAS_LIMITES, LIMITES_DEFECTO, ICONOS_ALARMA, NORMAL, tabla_limites, evaluar,
+                     evaluar_lote, estado_actual, alarmas_por_activo)
+# gspread/oauth2client (get_client) y plotly (Monitoreo) se importan recién donde se usan
+medicion.marcar_arranque("importaciones", T_INICIO)
 
 # ==========================================
 # 1. CONEXIÓN Y CONFIGURACIÓN
 # ==========================================
 st.set_page_config(page_title="Sistema Integral Rendering (Cloud)", layout="wide", page_icon="☁️")
+medicion.iniciar_rerun()    # Solo con MEDICION=1 (ver panel de rendimiento al final)
 
 # Estilos CSS
 st.markdown("""
@@ -21,6 +41,8 @@ st.markdown("""
 # --- FUNCIÓN DE CONEXIÓN SEGURA ---
 @st.cache_resource
 def get_client():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     # Intentar obtener credenciales de Secrets (Nube) o Local
     if "gcp_service_account" in st.secrets:
@@ -35,86 +57,298 @@ def get_client():
             return None
     return gspread.authorize(creds)
 
-# --- LECTURA DE DATOS (Con Caché inteligente) ---
-@st.cache_data(ttl=60) # Recarga de Drive cada 60 segundos si no hay cambios manuales
-def load_data_from_drive():
-    client = get_client()
-    if not client: return None, None, None, None, None, None
+# Archivos locales (journal de escrituras, etc.); DATOS_LOCALES permite otra carpeta (pruebas de carga)
+DIR_LOCAL = os.environ.get("DATOS_LOCALES") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos_locales")
+if medicion.activa():
+    medicion.usar_log(os.path.join(DIR_LOCAL, "medicion.jsonl"))
 
-    def read_sheet(filename, sheetname):
+# --- ALMACENAMIENTO (Google Drive por defecto; SQLite local sin conexión) ---
+@st.cache_resource
+def get_almacenamiento():
+    """
+    Origen de las hojas. Con la variable de entorno ALMACENAMIENTO_SQLITE=<ruta.db> la app
+    trabaja contra ese archivo SQLite en lugar de Drive (sin credenciales ni red).
+    El cliente de Drive se crea en el primer uso, no al arrancar.
+    """
+    ruta = os.environ.get("ALMACENAMIENTO_SQLITE")
+    if ruta:
+        almacenamiento = AlmacenamientoSQLite(ruta)
+    else:
+        almacenamiento = AlmacenamientoDrive(conectar=get_client)
+    # Con la medición activa cada llamada al almacenamiento es un tramo "api"
+    return AlmacenamientoMedido(almacenamiento) if medicion.activa() else almacenamiento
+
+# --- LECTURA DE DATOS (Snapshot + refresco en segundo plano) ---
+def _descargar(almacenamiento, libros, almacen, informes):
+    # Un libro = una apertura + un batch de lectura; los libros en paralelo.
+    # LECTURAS: los meses cerrados ya están en el almacén local; solo se baja lo posterior.
+    # (almacen=None: descarga completa, sin tocar el almacén; lo usan las réplicas no líderes)
+    lee_lecturas = almacen is not None and LECTURAS[1] in libros.get(LECTURAS[0], [])
+    desde = {LECTURAS: almacen.fila_desde()} if lee_lecturas and almacen.fila_desde() else {}
+    # El texto largo (COLUMNAS_DIFERIDAS) no se descarga: se lee al abrir el detalle que lo muestra
+    tablas, tiempos, errores = cargar_libros(almacenamiento, libros, desde, COLUMNAS_DIFERIDAS)
+
+    if lee_lecturas and LECTURAS[0] not in errores:
+        completa = almacen.sincronizar(tablas[LECTURAS])
+        if completa is None:
+            # La hoja cambió por encima de lo guardado: se descarga entera una vez
+            otra, _, err = cargar_libros(almacenamiento, {LECTURAS[0]: [LECTURAS[1]]})
+            errores.update(err)
+            completa = otra[LECTURAS] if err else almacen.sincronizar(otra[LECTURAS])
+        tablas[LECTURAS] = completa
+
+    # Esquema declarado: tipos compactos en una pasada; una hoja mal formada no se publica
+    # (se conserva su versión anterior y el error se muestra como el de un libro caído)
+    for clave in [c for c in tablas if c[0] not in errores]:
         try:
-            sh = client.open(filename)
-            try:
-                ws = sh.worksheet(sheetname)
-            except:
-                # Si no encuentra la hoja exacta, toma la primera
-                ws = sh.get_worksheet(0)
-            data = ws.get_all_records()
-            return pd.DataFrame(data)
-        except Exception as e:
-            st.error(f"Error leyendo {filename}/{sheetname}: {e}")
-            return pd.DataFrame()
-
-    with st.spinner('☁️ Sincronizando con Google Drive...'):
-        # 1. DATA MAESTRA
-        df_activos = read_sheet("1_DATA_MAESTRA", "ACTIVOS")
-        df_mat = read_sheet("1_DATA_MAESTRA", "MATERIALES")
-        df_bom = read_sheet("1_DATA_MAESTRA", "BOM")
-        
-        # 2. GESTION
-        df_ots = read_sheet("2_GESTION_TRABAJO", "ORDENES")
-        
-        # 3. MONITOREO
-        df_lecturas = read_sheet("3_MONITOREO", "LECTURAS")
-        
-        # Conversión de tipos críticos
-        if not df_activos.empty: df_activos['TAG'] = df_activos['TAG'].astype(str)
-        
-        return df_activos, df_mat, df_bom, df_ots, df_lecturas
+            with tramo(f"esquema:{clave[1]}"):
+                tablas[clave], informes[clave] = aplicar_esquema(clave, tablas[clave])
+        except ErrorEsquema as e:
+            del tablas[clave]
+            errores["/".join(clave)] = str(e)
+
+    return tablas, tiempos, errores
+
+def _cargar_compartido(almacenamiento, libros, almacen, informes, publicador):
+    """
+    Con varias réplicas, solo el líder descarga del almacenamiento y publica el snapshot en disco;
+    las demás leen lo publicado. Una hoja que aún no se publicó se descarga directo.
+    """
+    if publicador.es_lider():
+        tablas, tiempos, errores = _descargar(almacenamiento, libros, almacen, informes)
+        publicador.publicar({c: df for c, df in tablas.items() if c[0] not in errores})
+        return tablas, tiempos, errores
+
+    with tramo("snapshot_compartido.leer"):
+        tablas, faltan = publicador.leer([(libro, hoja) for libro, hojas in libros.items() for hoja in hojas])
+    if not faltan:
+        return tablas, {}, {}
+    directas = {}
+    for libro, hoja in faltan:
+        directas.setdefault(libro, []).append(hoja)
+    descargadas, tiempos, errores = _descargar(almacenamiento, directas, None, informes)
+    return {**tablas, **descargadas}, tiempos, errores
+
+@st.cache_resource
+def get_publicador():
+    """Snapshot compartido entre réplicas de la app (datos_locales/snapshot)"""
+    return PublicadorSnapshot(os.path.join(DIR_LOCAL, "snapshot"))
+
+@st.cache_resource
+def get_informes_esquema():
+    """{(libro, hoja): informe de aplicar_esquema} de la última descarga de cada hoja"""
+    return {}
+
+def _publicar(filename, sheetname, df):
+    """Publica localmente una hoja ya escrita en Drive, con los mismos tipos que al cargarla"""
+    df, _ = aplicar_esquema((filename, sheetname), df.reset_index(drop=True), estricto=False)
+    get_sincronizador().reemplazar_tabla(filename, sheetname, df)
+    get_columnas_diferidas().pop((filename, sheetname), None)     # Se releen con lo recién escrito
+    get_publicador().solicitar(filename, sheetname)
+
+@st.cache_resource
+def get_almacen_lecturas():
+    """Meses cerrados de LECTURAS en Parquet local (datos_locales/lecturas)"""
+    return AlmacenLecturas(os.path.join(DIR_LOCAL, "lecturas"))
+
+@st.cache_resource
+def get_sincronizador():
+    almacenamiento = get_almacenamiento()
+    if not almacenamiento: return None
+
+    # Cada hoja se versiona y se refresca según su propio TTL
+    almacen, informes, publicador = get_almacen_lecturas(), get_informes_esquema(), get_publicador()
+    sinc = Sincronizador(lambda libros: _cargar_compartido(almacenamiento, libros, almacen, informes, publicador),
+                         HOJAS, ttl=TTL_HOJAS, externas=publicador.externas, aceptadas=publicador.confirmar)
+    # Arranque en frío: si quedó un snapshot publicado en disco se muestra ya, sin ir a la red,
+    # y el hilo de fondo refresca lo vencido. Sin snapshot, solo esta primera carga bloquea.
+    with tramo("arranque:snapshot_disco"):
+        guardado = publicador.guardado(HOJAS)
+    if guardado:
+        sinc.sembrar(*guardado)
+    else:
+        with st.spinner(f'☁️ Sincronizando con {almacenamiento.nombre}...'):
+            sinc.refrescar()
+    sinc.iniciar()
+    return sinc
+
+def load_data_from_drive():
+    """Retorna el último snapshot bueno al instante; Drive se sincroniza en segundo plano"""
+    sinc = get_sincronizador()
+    if not sinc: return None, None, None, None, None, None
+
+    # Los errores se muestran aunque no haya datos: en la primera carga la conexión corre en
+    # otros hilos (sus st.error no se pintan) y sin esto la página quedaría en blanco
+    for libro, err in sinc.errores.items():
+        st.error(f"Error leyendo {libro}: {err}" if libro != "*" else f"Error conectando con {get_almacenamiento().nombre}: {err}")
+    if not sinc.listo():
+        if not sinc.errores:
+            st.error(f"❌ No se pudieron cargar los datos desde {get_almacenamiento().nombre}.")
+        return None, None, None, None, None, None
+
+    snap = sinc.actual()
+
+    # 1. DATA MAESTRA
+    df_activos = snap.tabla(*ACTIVOS)
+    df_mat = snap.tabla(*MATERIALES)
+    df_bom = snap.tabla(*BOM)
+
+    # 2. GESTION
+    df_ots = snap.tabla(*ORDENES)
+
+    # 3. MONITOREO
+    df_lecturas = snap.tabla(*LECTURAS)
+
+    return df_activos, df_mat, df_bom, df_ots, df_lecturas, snap
+
+def vista(nombre, dependencias, construir, actualizar=None):
+    """Cálculo derivado de hojas; se rehace solo cuando cambia alguna de ellas (sobre el snapshot de este rerun)"""
+    return get_sincronizador().vista(nombre, dependencias, construir, actualizar, snapshot)
+
+# --- COLUMNAS DIFERIDAS (TEXTO LARGO QUE EL SNAPSHOT NO DESCARGA) ---
+@st.cache_resource
+def get_columnas_diferidas():
+    """{(libro, hoja): (cargado_en de la hoja al leerlas, DataFrame con solo esas columnas)}"""
+    return {}
+
+def _diferidas_leidas(clave):
+    """Las COLUMNAS_DIFERIDAS de la hoja: se leen (solo esas columnas) la primera vez que un detalle
+    las pide y se reusan hasta la próxima descarga de la hoja"""
+    cache = get_columnas_diferidas()
+    leidas_en = snapshot.cargado_en.get(clave)
+    guardado = cache.get(clave)
+    if guardado is None or guardado[0] != leidas_en:
+        with tramo(f"diferidas:{clave[1]}"):
+            remoto = get_almacenamiento().leer_hoja(*clave, columnas=COLUMNAS_DIFERIDAS[clave])
+        guardado = cache[clave] = (leidas_en, aplicar_esquema(clave, remoto, estricto=False)[0])
+    return guardado[1]
+
+def con_diferidas(clave, df):
+    """df con sus COLUMNAS_DIFERIDAS completas (las filas agregadas después de leerlas conservan su valor local)"""
+    columnas = [c for c in COLUMNAS_DIFERIDAS.get(clave, []) if c in df.columns]
+    if not columnas: return df
+    remoto = _diferidas_leidas(clave)
+    n = min(len(remoto), len(df))
+    completas = {}
+    for col in [c for c in columnas if c in remoto.columns]:
+        valores = df[col].copy()
+        valores.iloc[:n] = remoto[col].iloc[:n].to_numpy()
+        completas[col] = valores
+    return df.assign(**completas) if completas else df
+
+def valor_diferido(clave, df, fila, columna):
+    """Una celda de una columna diferida (detalle de un registro), sin completar toda la tabla"""
+    if columna not in df.columns: return ""
+    remoto = _diferidas_leidas(clave)
+    return remoto[columna].iloc[fila] if columna in remoto.columns and fila < len(remoto) else df[columna].iloc[fila]
+
+# --- ESCRITURA DE DATOS (COLA + APPEND_ROWS EN LOTE) ---
+@st.cache_resource
+def get_cola():
+    """Cola de escritura única del proceso: agrupa filas por hoja y las envía en lote"""
+    almacenamiento, sinc, publicador = get_almacenamiento(), get_sincronizador(), get_publicador()
+
+    def confirmar(libro, hoja, no_aplicadas, fila_final, restantes):
+        if no_aplicadas: sinc.aplicar_filas(libro, hoja, no_aplicadas)   # Recuperadas del journal
+        sinc.verificar_deriva(libro, hoja, fila_final, restantes)
+        publicador.solicitar(libro, hoja)   # Réplica no líder: que el líder publique la hoja con estas filas
+
+    def fallar(libro, hoja):
+        publicador.solicitar(libro, hoja)
+        sinc.invalidar(libro, hoja)
+
+    cola = ColaEscritura(
+        almacenamiento.anexar_filas,
+        reservar_journal(DIR_LOCAL),      # Journal propio: otras réplicas comparten DIR_LOCAL
+        al_confirmar=confirmar, al_fallar=fallar,
+    )
+    sinc.pendientes = cola.pendientes
+    cola.iniciar()
+    return cola
 
-# --- ESCRITURA DE DATOS (APPEND ROW) ---
 def save_row_to_drive(filename, sheetname, row_dict):
-    """Agrega una fila nueva al final del Excel en Drive"""
-    client = get_client()
+    """
+    Encola una fila nueva para el final del Excel en Drive y la muestra al instante.
+    Retorna el id de la escritura (su estado se consulta en la cola) o False.
+    """
     try:
-        sh = client.open(filename)
-        try:
-            ws = sh.worksheet(sheetname)
-        except:
-            ws = sh.get_worksheet(0)
-            
-        # Convertir diccionario a lista de valores respetando el orden de columnas si es posible,
-        # o simplemente append de valores (gspread es inteligente)
-        ws.append_row(list(row_dict.values()))
-        
-        st.cache_data.clear() # Limpiar caché para ver el dato nuevo inmediatamente
-        return True
+        # Primero localmente: si la cola confirmara antes, verificar_deriva vería una fila de
+        # menos y recargaría la hoja. Orden de valores = orden del diccionario (como append_row)
+        get_sincronizador().aplicar_filas(filename, sheetname, [row_dict])
+        id_escritura = get_cola().encolar(filename, sheetname, list(row_dict.values()))
+        st.session_state.setdefault("mis_escrituras", []).append((id_escritura, sheetname))
+        return id_escritura
     except Exception as e:
         st.error(f"Error guardando en Drive: {e}")
         return False
 
-# --- ESCRITURA MASIVA (UPDATE FULL SHEET) ---
-def update_full_excel(filename, sheetname, df):
-    """Sobreescribe toda la hoja (Usado para el editor masivo)"""
-    client = get_client()
+def save_rows_to_drive(filename, sheetname, df):
+    """
+    Carga masiva: encola todas las filas de df (en su orden de columnas) con una sola
+    escritura del journal; la cola las envía en pocos append_rows. Retorna los ids o False.
+    """
     try:
-        sh = client.open(filename)
-        try:
-            ws = sh.worksheet(sheetname)
-        except:
-            ws = sh.get_worksheet(0)
-            
-        ws.clear()
-        # gspread requiere lista de listas, incluyendo encabezados
-        ws.update([df.columns.values.tolist()] + df.values.tolist())
-        st.cache_data.clear()
+        get_sincronizador().aplicar_filas(filename, sheetname, df.to_dict("records"))
+        ids = get_cola().encolar_lote(filename, sheetname, df.to_numpy(dtype=object).tolist())
+        st.session_state.setdefault("mis_escrituras", []).append((ids[-1], f"{sheetname} ({len(ids)} filas)"))
+        return ids
+    except Exception as e:
+        st.error(f"Error guardando en Drive: {e}")
+        return False
+
+# --- ESCRITURA MASIVA (DIFF POR CELDAS) ---
+def update_full_excel(filename, sheetname, df, df_original):
+    """
+    Guarda el resultado del editor masivo enviando solo lo que cambió respecto a la hoja cargada:
+    celdas modificadas en un batch, filas borradas y filas nuevas aparte.
+    Retorna el resumen {celdas, rangos, insertadas, eliminadas} o False si falla.
+    """
+    with tramo(f"diff:{sheetname}"):
+        diff = calcular_diff(df_original, df)
+    if diff and not diff["celdas"] and not diff["eliminadas"] and not len(diff["insertadas"]):
+        return {"celdas": 0, "rangos": 0, "insertadas": 0, "eliminadas": 0}
+
+    try:
+        almacenamiento = get_almacenamiento()
+
+        if diff is None:
+            # Cambió la estructura de columnas: no hay diff posible, se reescribe la hoja
+            # (lista de listas, incluyendo encabezados)
+            almacenamiento.reescribir_hoja(filename, sheetname, valores_api(df))
+            resumen = {"celdas": int(df.size), "rangos": 1, "insertadas": 0, "eliminadas": 0}
+            _publicar(filename, sheetname, df)
+        else:
+            resumen = aplicar_diff(almacenamiento, filename, sheetname, diff)
+            _publicar(filename, sheetname, diff["resultado"])
+        return resumen
+    except Exception as e:
+        st.error(f"Error actualizando Excel: {e}")
+        return False
+
+def update_column_excel(filename, sheetname, df, columna, valores):
+    """
+    Escribe una columna recalculada (solo las celdas que cambiaron, o la columna entera en un
+    rango si cambió la mayoría) y publica la hoja localmente
+    """
+    try:
+        data = rangos_columna(list(df.columns).index(columna) + 1, df[columna], valores)
+        if data:
+            get_almacenamiento().actualizar_rangos(filename, sheetname, data)
+        _publicar(filename, sheetname, df.assign(**{columna: valores}))
         return True
     except Exception as e:
         st.error(f"Error actualizando Excel: {e}")
         return False
 
+# Título y menú se pintan antes de cargar datos (la primera carga puede esperar a la red)
+st.title("🏭 Sistema Integral Rendering (Conectado a Drive)")
+st.caption("Los datos se guardan directamente en tus archivos Excel.")
+
+menu = st.sidebar.radio("Módulos:", 
+    ["1. Maestro de Activos", "2. Gestión Mantenimiento", "3. Monitoreo", "4. Almacén & BOM"])
+
 # CARGA INICIAL
-df_activos, df_mat, df_bom, df_ots, df_lecturas = load_data_from_drive()
+df_activos, df_mat, df_bom, df_ots, df_lecturas, snapshot = load_data_from_drive()
 
 # Si falla la carga, detenemos
 if df_activos is None:
@@ -123,32 +357,163 @@ if df_activos is None:
 # ==========================================
 # 2. LÓGICA DE FILTROS EN CASCADA (5 NIVELES)
 # ==========================================
-def filtro_cascada_5_niveles(key_prefix):
+def jerarquia():
+    """Índice padre/hijos de ACTIVOS (se reconstruye solo cuando cambia la hoja)"""
+    return vista("jerarquia", [ACTIVOS], IndiceJerarquia)
+
+def subarbol():
+    """Intervalos de Euler de ACTIVOS; un alta desde "Crear Activo" se inserta sin reconstruir"""
+    return vista("subarbol", [ACTIVOS], lambda df: IndiceSubarbol(jerarquia()),
+                 actualizar=lambda previo, df: previo.con_activos_nuevos(df))
+
+# Columna con el TAG del activo en cada hoja relacionada
+_TAG_DE_HOJA = {
+    ORDENES: lambda df: df['TAG_Equipo'],
+    BOM: lambda df: df['TAG_Equipo'],
+    LECTURAS: lambda df: tag_de_punto(df['ID_Punto']),
+}
+
+def posiciones_en_arbol(hoja):
+    """Posición de Euler del activo de cada fila de la hoja (para filtrar subárboles por rango)"""
+    def construir(df_act, df):
+        try:
+            return subarbol().posiciones(_TAG_DE_HOJA[hoja](df))
+        except KeyError:
+            return np.full(len(df), -1)
+    return vista(f"euler_{hoja[1]}", [ACTIVOS, hoja], construir)
+
+def ots_abiertas_por_activo():
+    """OTs abiertas en el subárbol de cada TAG (todos los activos en una pasada)"""
+    def construir(df_act, df):
+        pos = posiciones_en_arbol(ORDENES)
+        abiertas = ~df['Estado_OT'].isin(ESTADOS_OT_CERRADOS).to_numpy() if 'Estado_OT' in df.columns else np.zeros(len(df), bool)
+        return subarbol().totales(pos[abiertas]).astype(int)
+    return vista("ots_abiertas_subarbol", [ACTIVOS, ORDENES], construir)
+
+# Días visibles en el gráfico de tendencias (None = toda la historia)
+VENTANAS_TENDENCIA = {"7 días": 7, "30 días": 30, "90 días": 90, "1 año": 365, "Todo": None}
+
+def indice_lecturas():
+    """LECTURAS tipadas e indexadas por (TAG, variable); las filas nuevas se parsean solas"""
+    return vista("indice_lecturas", [LECTURAS], IndiceLecturas,
+                 actualizar=lambda previo, df: previo.con_filas_nuevas(df))
+
+def estadisticas_puntos():
+    """Media/desviación móvil, EWMA y z por punto; se pone al día solo con las filas nuevas"""
+    ruta = os.path.join(DIR_LOCAL, "estadisticas_puntos.parquet")
+
+    def construir(df):
+        # Primero el estado guardado por una ejecución anterior; si no sirve, desde el índice
+        guardado = EstadisticasPuntos.cargar(ruta)
+        est = guardado.con_filas_nuevas(df, indice_lecturas()) if guardado else None
+        est = est or EstadisticasPuntos.desde_indice(indice_lecturas(), df)
+        est.guardar(ruta)
+        return est
+
+    def actualizar(previo, df):
+        est = previo.con_filas_nuevas(df, indice_lecturas())
+        if est is not None and est is not previo:
+            est.guardar(ruta)
+        return est
+
+    return vista("estadisticas_puntos", [LECTURAS], construir, actualizar)
+
+def estado_alarmas():
+    """Estado actual de cada punto: su última lectura contra los límites (LIMITES o defecto)"""
+    return vista("estado_alarmas", [LECTURAS, LIMITES], lambda df_lec, df_lim: estado_actual(indice_lecturas(), df_lim))
+
+def alarmas_activos():
+    """Peor alarma del subárbol de cada TAG (tabla precalculada que consulta el navegador)"""
+    return vista("alarmas_subarbol", [ACTIVOS, LECTURAS, LIMITES],
+                 lambda *dfs: alarmas_por_activo(subarbol(), estado_alarmas()))
+
+# ==========================================
+# BÚSQUEDA DE ACTIVOS Y MATERIALES (ÍNDICE INVERTIDO)
+# ==========================================
+def indice_activos():
+    """TAG y Nombre (opciones y etiquetas de los selectbox); los activos nuevos se indexan sin reconstruir"""
+    return vista("busqueda_activos", [ACTIVOS],
+                 lambda df: IndiceBusqueda(df, "TAG", {"TAG": 3, "Nombre": 2}, ["Nombre"]),
+                 actualizar=lambda previo, df: previo.con_filas_nuevas(df))
+
+def indice_activos_con_especificacion():
+    """Además Especificacion_Tecnica (columna diferida): se arma la primera vez que alguien busca"""
+    campos = {"TAG": 3, "Nombre": 2, "Especificacion_Tecnica": 1}
+    return vista("busqueda_activos_especificacion", [ACTIVOS],
+                 lambda df: IndiceBusqueda(con_diferidas(ACTIVOS, df), "TAG", campos, ["Nombre"]),
+                 actualizar=lambda previo, df: previo.con_filas_nuevas(con_diferidas(ACTIVOS, df)))
+
+def indice_materiales():
+    """SKU y descripción de MATERIALES"""
+    return vista("busqueda_materiales", [MATERIALES],
+                 lambda df: IndiceBusqueda(df, "SKU", {"SKU": 3, "Descripcion": 2, "Desc": 2, "Numero_Parte": 2, "Marca": 1},
+                                           ["Descripcion", "Desc"]),
+                 actualizar=lambda previo, df: previo.con_filas_nuevas(df))
+
+def opciones_buscables(indice, key, que, contenedor=st, limite=50, buscador=None):
+    """
+    Caja de búsqueda para un selectbox: claves que coinciden (todas si está vacía).
+    buscador: función que da el índice para las consultas, si es otro más completo (se arma al buscar).
+    """
+    consulta = contenedor.text_input(f"🔍 Buscar {que}", key=key, placeholder="TAG, nombre, especificación...")
+    if not consulta.strip():
+        return indice.claves
+    with tramo(f"busqueda:{que}"):
+        resultados = (buscador() if buscador else indice).buscar(consulta, limite=limite)
+    if not resultados:
+        contenedor.caption("Sin coincidencias.")
+    return resultados
+
+def _ir_a_activo(key_prefix):
+    """Lleva la cascada al activo elegido en el buscador (antes de que se dibujen los selectbox)"""
+    tag = st.session_state.get(f"{key_prefix}_ir")
+    if not tag:
+        return
+    ruta = {jerarquia().nivel.get(t): t for t in jerarquia().ruta(tag)}
+    for nivel, sufijo in zip(NIVELES, "paesc"):
+        if nivel in ruta:
+            st.session_state[f"{key_prefix}_{sufijo}"] = ruta[nivel]
+        else:
+            st.session_state.pop(f"{key_prefix}_{sufijo}", None)
+
+@medido("cascada")
+def filtro_cascada_5_niveles(key_prefix, buscador=False):
     """
     Navegación: Planta > Área > Equipo > Sistema > Componente
+    buscador: agrega una búsqueda por TAG/nombre que salta directo al activo
     """
-    df = df_activos
+    idx = jerarquia()
+
+    if buscador:
+        b1, b2 = st.columns([1, 2])
+        consulta = b1.text_input("🔍 Ir a activo", key=f"{key_prefix}_buscar", placeholder="TAG, nombre, especificación...")
+        if consulta.strip():
+            with tramo("busqueda:activo"):
+                resultados = indice_activos_con_especificacion().buscar(consulta)
+            b2.selectbox("Resultados", resultados, index=None, key=f"{key_prefix}_ir",
+                         format_func=indice_activos().etiqueta, on_change=_ir_a_activo, args=(key_prefix,),
+                         placeholder="Elegir activo..." if resultados else "Sin coincidencias")
     
     c1, c2, c3, c4, c5 = st.columns(5)
     
     # 1. Planta
-    plantas = df[df['Nivel'] == 'L2-Planta']['TAG'].unique()
+    plantas = idx.plantas()
     sel_planta = c1.selectbox("📍 Planta", plantas, key=f"{key_prefix}_p")
     
     # 2. Área
-    areas = df[df['TAG_Padre'] == sel_planta]['TAG'].unique() if sel_planta else []
+    areas = idx.hijos_de(sel_planta)
     sel_area = c2.selectbox("🏭 Área", areas, key=f"{key_prefix}_a")
     
     # 3. Equipo
-    equipos = df[df['TAG_Padre'] == sel_area]['TAG'].unique() if sel_area else []
+    equipos = idx.hijos_de(sel_area)
     sel_equipo = c3.selectbox("⚙️ Equipo", equipos, key=f"{key_prefix}_e")
     
     # 4. Sistema
-    sistemas = df[df['TAG_Padre'] == sel_equipo]['TAG'].unique() if sel_equipo else []
+    sistemas = idx.hijos_de(sel_equipo)
     sel_sistema = c4.selectbox("🔄 Sistema", sistemas, key=f"{key_prefix}_s")
     
     # 5. Componente
-    componentes = df[df['TAG_Padre'] == sel_sistema]['TAG'].unique() if sel_sistema else []
+    componentes = idx.hijos_de(sel_sistema)
     sel_comp = c5.selectbox("🔩 Componente", componentes, key=f"{key_prefix}_c")
     
     # Retornamos el TAG más profundo seleccionado y el contexto
@@ -162,11 +527,41 @@ def filtro_cascada_5_niveles(key_prefix):
 # ==========================================
 # 3. INTERFAZ DE USUARIO
 # ==========================================
-st.title("🏭 Sistema Integral Rendering (Conectado a Drive)")
-st.caption("Los datos se guardan directamente en tus archivos Excel.")
+# Antigüedad de los datos mostrados
+edad = snapshot.edad_segundos()
+st.sidebar.caption(f"🕒 Datos de hace {int(edad)} s (versión {snapshot.version})")
+if get_sincronizador().desde_disco:
+    st.sidebar.caption("💾 Datos guardados en disco; sincronizando en segundo plano...")
+if get_sincronizador().errores:
+    st.sidebar.warning("Último refresco falló: se muestran los datos anteriores.")
+if st.sidebar.button("🔄 Sincronizar ahora"):
+    get_sincronizador().solicitar_refresco()
 
-menu = st.sidebar.radio("Módulos:", 
-    ["1. Maestro de Activos", "2. Gestión Mantenimiento", "3. Monitoreo", "4. Almacén & BOM"])
+# Estado de las escrituras en cola
+cola = get_cola()
+if cola.pendientes():
+    st.sidebar.caption(f"⏳ {cola.pendientes()} filas en cola hacia Drive")
+if st.session_state.get("mis_escrituras"):
+    with st.sidebar.expander("📝 Mis últimos registros"):
+        iconos = {PENDIENTE: "⏳ pendiente", CONFIRMADA: "✅ confirmado"}
+        for id_esc, hoja in reversed(st.session_state["mis_escrituras"][-5:]):
+            st.caption(f"{hoja}: {iconos.get(cola.estado(id_esc), '❌ falló')}")
+
+medicion.marcar_arranque("primer_pintado", T_INICIO, origen="disco" if get_sincronizador().sembrado else "descarga")
+
+with st.sidebar.expander("⏱️ Tiempos de carga"):
+    inicio = medicion.arranque
+    st.caption(f"Arranque: importaciones {inicio['importaciones']['ms']:.0f} ms, "
+               f"primer pintado {inicio['primer_pintado']['ms']:.0f} ms (datos de {inicio['primer_pintado']['origen']})")
+    for libro, seg in snapshot.tiempos.items():
+        st.caption(f"{libro}: {seg:.2f} s")
+    for libro, hoja in HOJAS:
+        st.caption(f"{hoja}: v{snapshot.version_de(libro, hoja)}, hace {int(snapshot.edad_segundos(libro, hoja))} s (TTL {TTL_HOJAS[(libro, hoja)]} s)")
+    almacen = get_almacen_lecturas()
+    st.caption(f"LECTURAS locales: {almacen.filas} filas en {len(almacen.meses())} meses cerrados")
+    for (libro, hoja), inf in get_informes_esquema().items():
+        invalidas = f", {sum(inf['invalidas'].values())} celdas ilegibles" if inf["invalidas"] else ""
+        st.caption(f"{hoja}: {inf['mb_antes']:.2f} → {inf['mb_despues']:.2f} MB en memoria{invalidas}")
 
 # ------------------------------------------------------------------
 # MÓDULO 1: MAESTRO DE ACTIVOS
@@ -177,28 +572,48 @@ if menu == "1. Maestro de Activos":
     # --- A. NAVEGADOR ---
     with tab_arbol:
         st.subheader("Explorador Jerárquico")
-        ctx = filtro_cascada_5_niveles("nav")
+        ctx = filtro_cascada_5_niveles("nav", buscador=True)
         
         if ctx['ultimo_tag']:
             st.divider()
             tag = ctx['ultimo_tag']
             # Buscar info del activo seleccionado
-            info_df = df_activos[df_activos['TAG'] == tag]
+            info = jerarquia().registro(tag)
             
-            if not info_df.empty:
-                info = info_df.iloc[0]
+            if info is not None:
                 st.markdown(f"### {info.get('Nombre', 'Sin Nombre')} ({tag})")
                 
                 c1, c2 = st.columns(2)
                 c1.info(f"**Nivel:** {info.get('Nivel','')}")
                 c2.info(f"**Estado:** {info.get('Estado','Unknown')}")
-                st.text_area("Especificaciones:", value=str(info.get('Especificacion_Tecnica','')), disabled=True)
+                # Texto diferido: se lee al abrir el primer detalle (después sale de la caché)
+                especificacion = valor_diferido(ACTIVOS, df_activos, jerarquia().fila[str(tag)], 'Especificacion_Tecnica')
+                st.text_area("Especificaciones:", value=str(especificacion), disabled=True)
+                
+                # Resumen de todo lo que cuelga del activo (rango de Euler, sin recorrer TAG_Padre)
+                with tramo("arbol:resumen"):
+                    res = resumen_subarbol(subarbol(), tag,
+                                           df_ots, posiciones_en_arbol(ORDENES),
+                                           df_bom, posiciones_en_arbol(BOM),
+                                           df_lecturas, posiciones_en_arbol(LECTURAS))
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("OTs abiertas (incluye hijos)", res['ots_abiertas'])
+                m2.metric("Ítems BOM (incluye hijos)", res['bom_lineas'])
+                ult = res['ultima_lectura']
+                m3.metric("Última lectura", ult['Valor_Medido'] if ult is not None else "—",
+                          help=f"{ult['ID_Punto']} · {ult['Fecha_Lectura']}" if ult is not None else None)
+                alarma = alarmas_activos().get(tag, NORMAL)
+                m4.metric("Alarma (incluye hijos)", f"{ICONOS_ALARMA.get(alarma, '')} {alarma}")
                 
                 # Buscar Hijos
-                hijos = df_activos[df_activos['TAG_Padre'] == tag]
+                hijos = jerarquia().tabla_hijos(tag)
                 if not hijos.empty:
                     st.markdown("⬇️ **Componentes / Subsistemas:**")
-                    st.dataframe(hijos[['TAG', 'Nombre', 'Nivel', 'Estado']], use_container_width=True)
+                    alarmas = hijos['TAG'].map(alarmas_activos()).fillna(NORMAL)
+                    hijos = hijos[['TAG', 'Nombre', 'Nivel', 'Estado']].assign(
+                        OTs_Abiertas=hijos['TAG'].map(ots_abiertas_por_activo()).fillna(0).astype(int),
+                        Alarma=alarmas.map(ICONOS_ALARMA).fillna("") + " " + alarmas)
+                    st.dataframe(hijos, use_container_width=True)
                     
                 else:
                     st.caption("No tiene elementos hijos registrados.")
@@ -212,9 +627,7 @@ if menu == "1. Maestro de Activos":
         padre = ctx_add['ultimo_tag']
         
         # Determinar nivel sugerido
-        nivel_padre = df_activos[df_activos['TAG'] == padre]['Nivel'].iloc[0] if padre else "ROOT"
-        niveles_map = {"L2-Planta": "L3-Area", "L3-Area": "L4-Equipo", "L4-Equipo": "L5-Sistema", "L5-Sistema": "L6-Componente"}
-        sugerencia = niveles_map.get(nivel_padre, "L2-Planta")
+        sugerencia = jerarquia().nivel_sugerido(padre)
         
         if padre:
             st.success(f"Padre: **{padre}**. Se sugiere crear un: **{sugerencia}**")
@@ -225,14 +638,14 @@ if menu == "1. Maestro de Activos":
             new_tag = c1.text_input("TAG (Único)", value=f"{padre}-NEW" if padre else "")
             new_name = c2.text_input("Nombre Descriptivo")
             
-            opciones_niv = ["L2-Planta", "L3-Area", "L4-Equipo", "L5-Sistema", "L6-Componente"]
+            opciones_niv = NIVELES
             idx = opciones_niv.index(sugerencia) if sugerencia in opciones_niv else 0
             new_lvl = c1.selectbox("Nivel Jerárquico", opciones_niv, index=idx)
             
             new_spec = c2.text_area("Especificaciones Técnicas")
             
             if st.form_submit_button("💾 Guardar en Excel"):
-                if new_tag in df_activos['TAG'].values:
+                if jerarquia().existe(new_tag):
                     st.error("Error: El TAG ya existe en el Excel.")
                 else:
                     # Crear diccionario con las columnas exactas de tu CSV
@@ -249,20 +662,24 @@ if menu == "1. Maestro de Activos":
                         "Fecha_Instalacion": str(datetime.today().date())
                     }
                     if save_row_to_drive("1_DATA_MAESTRA", "ACTIVOS", new_row):
-                        st.success("✅ Guardado en Drive exitosamente!")
+                        st.success("✅ Guardado! Se está enviando a Drive.")
                         st.rerun()
 
     # --- C. EDITOR MASIVO ---
     with tab_edit:
         st.subheader("Editor Masivo (Cuidado)")
-        st.warning("Esto sobreescribirá la hoja 'ACTIVOS' en tu Excel.")
-        
-        df_editado = st.data_editor(df_activos, num_rows="dynamic", use_container_width=True, height=500)
+        st.warning("Los cambios se escriben directamente en la hoja 'ACTIVOS' de tu Excel.")
         
-        if st.button("🔴 Guardar TODOS los cambios en Drive"):
-            if update_full_excel("1_DATA_MAESTRA", "ACTIVOS", df_editado):
-                st.success("Base de datos actualizada correctamente.")
-                st.rerun()
+        # La hoja completa (con el texto diferido) se carga solo al abrir el editor
+        if st.toggle("Abrir editor de la hoja completa", key="ed_activos_abrir"):
+            df_completo = con_diferidas(ACTIVOS, df_activos)
+            df_editado = st.data_editor(sin_categorias(df_completo), num_rows="dynamic", use_container_width=True, height=500)
+
+            if st.button("🔴 Guardar TODOS los cambios en Drive"):
+                res = update_full_excel("1_DATA_MAESTRA", "ACTIVOS", df_editado, df_completo)
+                if res:
+                    st.success(f"Base de datos actualizada: {res['celdas']} celdas escritas, "
+                               f"{res['insertadas']} filas nuevas, {res['eliminadas']} eliminadas.")
 
 # ------------------------------------------------------------------
 # MÓDULO 2: GESTIÓN MANTENIMIENTO
@@ -274,16 +691,19 @@ if menu == "2. Gestión Mantenimiento":
     
     with col1:
         st.markdown("#### Crear Orden de Trabajo")
-        # Selector simple
-        all_tags = df_activos['TAG'].unique()
+        # La búsqueda va fuera del formulario para filtrar mientras se escribe
+        all_tags = opciones_buscables(indice_activos(), "ot_buscar", "equipo", buscador=indice_activos_con_especificacion)
         
         with st.form("frm_ot"):
-            tag_ot = st.selectbox("Equipo Afectado", all_tags)
+            tag_ot = st.selectbox("Equipo Afectado", all_tags, format_func=indice_activos().etiqueta)
             desc_ot = st.text_area("Descripción del Trabajo")
             tipo_ot = st.selectbox("Tipo", ["Correctivo", "Preventivo", "Predictivo"])
             fecha_ot = st.date_input("Fecha Programada")
             
-            if st.form_submit_button("Generar OT"):
+            enviar_ot = st.form_submit_button("Generar OT")
+            if enviar_ot and not tag_ot:
+                st.error("Seleccione un equipo.")
+            elif enviar_ot:
                 # Calcular nuevo ID
                 new_id = int(df_ots['ID_OT'].max()) + 1 if not df_ots.empty and 'ID_OT' in df_ots.columns else 5000
                 
@@ -300,12 +720,15 @@ if menu == "2. Gestión Mantenimiento":
                     "Tipo_Proveedor": "Interno"
                 }
                 if save_row_to_drive("2_GESTION_TRABAJO", "ORDENES", row_ot):
-                    st.success(f"OT #{new_id} creada en Drive.")
+                    st.success(f"OT #{new_id} creada (enviando a Drive).")
                     st.rerun()
                     
     with col2:
         st.markdown("#### Listado de OTs (Drive)")
-        st.dataframe(df_ots, use_container_width=True)
+        if st.toggle("Mostrar descripción del trabajo", key="ots_descripcion"):
+            st.dataframe(con_diferidas(ORDENES, df_ots), use_container_width=True)
+        else:
+            st.dataframe(df_ots.drop(columns=COLUMNAS_DIFERIDAS[ORDENES], errors="ignore"), use_container_width=True)
 
 # ------------------------------------------------------------------
 # MÓDULO 3: MONITOREO
@@ -314,7 +737,7 @@ if menu == "3. Monitoreo":
     st.subheader("📈 Registro de Lecturas")
     
     # Filtro cascada para encontrar el punto exacto
-    ctx_mon = filtro_cascada_5_niveles("mon")
+    ctx_mon = filtro_cascada_5_niveles("mon", buscador=True)
     tag_mon = ctx_mon['ultimo_tag']
     
     c1, c2 = st.columns([1, 2])
@@ -335,24 +758,136 @@ if menu == "3. Monitoreo":
                         "Inspector": insp,
                         "Estado": "Registrado"
                     }
+                    # Estado según los límites del punto (y la tasa respecto a su lectura anterior)
+                    row_lec["Estado"] = evaluar_lote(pd.DataFrame([row_lec]), indice_lecturas(), snapshot.tabla(*LIMITES))[0]
                     if save_row_to_drive("3_MONITOREO", "LECTURAS", row_lec):
-                        st.success("Lectura guardada.")
+                        st.success(f"Lectura guardada ({row_lec['Estado']}).")
                         st.rerun()
                         
     with c2:
         st.markdown("**Tendencias Históricas**")
         if not df_lecturas.empty and tag_mon:
-            # Filtrar por aproximación de ID (ya que el ID_Punto contiene el TAG)
-            mask = df_lecturas['ID_Punto'].str.contains(tag_mon, na=False)
-            historia = df_lecturas[mask]
+            # Lookup exacto por TAG en el índice (antes: str.contains, que confundía EQ-DIG-01 con EQ-DIG-010)
+            incluir_hijos = st.checkbox("Incluir componentes hijos", key="mon_hijos")
+            tags_mon = subarbol().descendientes(tag_mon) if incluir_hijos else [tag_mon]
+
+            # Ventana visible y ancho del gráfico -> puntos por serie (LTTB, memorizado por punto y ventana)
+            cv, cr = st.columns(2)
+            ventana = cv.selectbox("Ventana", list(VENTANAS_TENDENCIA), index=2, key="mon_ventana")
+            puntos = cr.select_slider("Resolución (puntos por serie)", [250, 500, 1000, 2000], value=1000, key="mon_puntos")
+            with tramo("tendencia:filtro"):
+                historia, total = indice_lecturas().historia_reducida(tags_mon, VENTANAS_TENDENCIA[ventana], puntos)
             
             if not historia.empty:
-                fig = px.line(historia, x="Fecha_Lectura", y="Valor_Medido", color="ID_Punto", markers=True)
-                st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"{len(historia)} de {total} lecturas graficadas")
+                with tramo("tendencia:grafico", GRAFICO, puntos=len(historia)):
+                    import plotly.express as px     # Solo este gráfico lo usa: fuera del arranque
+                    fig = px.line(historia, x="fecha", y="valor", color="ID_Punto", markers=len(historia) <= 300,
+                                  render_mode="webgl", labels={"fecha": "Fecha_Lectura", "valor": "Valor_Medido"})
+                    st.plotly_chart(fig, use_container_width=True)
                 
             else:
                 st.info("No hay datos históricos para este equipo.")
 
+    # --- CARGA MASIVA (rutas de colectores de vibración, historiadores de PLC) ---
+    st.divider()
+    with st.expander("📥 Carga masiva de lecturas (CSV / XLSX)"):
+        st.caption("Columnas: Fecha_Lectura, ID_Punto (o TAG + Variable) y Valor_Medido. Inspector y Estado son opcionales.")
+        archivo = st.file_uploader("Exportación del colector / historiador", type=["csv", "xlsx"], key="mon_carga")
+        insp_carga = st.text_input("Inspector por defecto", value="Carga masiva", key="mon_carga_insp")
+
+        if archivo and st.button("Validar y cargar", key="mon_carga_btn"):
+            t0 = time.perf_counter()
+            crudo = leer_archivo_lecturas(archivo, archivo.name)
+            validas, rechazadas = validar_carga(crudo, jerarquia().fila.keys(), indice_lecturas().datos, insp_carga)
+            if len(validas):
+                validas["Estado"] = evaluar_lote(validas, indice_lecturas(), snapshot.tabla(*LIMITES))
+                save_rows_to_drive("3_MONITOREO", "LECTURAS", validas)
+            segundos = max(time.perf_counter() - t0, 1e-6)
+
+            cuarentena = None
+            if len(rechazadas):
+                # Las filas rechazadas quedan en cuarentena para corregirlas y volver a subirlas
+                os.makedirs(os.path.join(DIR_LOCAL, "cuarentena"), exist_ok=True)
+                cuarentena = os.path.join(DIR_LOCAL, "cuarentena", f"lecturas_{datetime.now():%Y%m%d_%H%M%S}.csv")
+                rechazadas.to_csv(cuarentena, index=False)
+            st.session_state["mon_carga_resultado"] = {
+                "archivo": archivo.name, "total": len(crudo), "validas": len(validas),
+                "filas_s": len(crudo) / segundos, "rechazadas": rechazadas, "cuarentena": cuarentena,
+            }
+            st.rerun()
+
+        res = st.session_state.get("mon_carga_resultado")
+        if res:
+            st.success(f"{res['archivo']}: {res['validas']} de {res['total']} filas encoladas hacia Drive "
+                       f"({res['filas_s']:,.0f} filas/s).")
+            rech = res["rechazadas"]
+            if len(rech):
+                resumen = rech["Motivo"].value_counts().reindex(MOTIVOS_RECHAZO).dropna().astype(int)
+                st.warning(f"{len(rech)} filas rechazadas (en cuarentena: {os.path.basename(res['cuarentena'])})")
+                st.dataframe(resumen.rename("Filas"), use_container_width=True)
+                st.download_button("⬇️ Descargar rechazadas", rech.to_csv(index=False).encode("utf-8"),
+                                   file_name=os.path.basename(res["cuarentena"]), mime="text/csv")
+
+    # --- PEORES ACTIVOS AHORA (z de la última lectura frente a su ventana móvil) ---
+    with st.expander("📉 Peores activos ahora"):
+        cz1, cz2 = st.columns(2)
+        solo_rod = cz1.checkbox("Solo chumaceras (-ROD-)", key="mon_solo_rod")
+        k_peores = cz2.number_input("Cantidad", 5, 100, 10, step=5, key="mon_k_peores")
+        est = estadisticas_puntos()
+        tags_rod = [t for t in est.ranking["tag"].unique() if "-ROD-" in t] if solo_rod else None
+        peores = est.peores(int(k_peores), tags_rod)
+        if peores.empty:
+            st.info("Aún no hay lecturas para calcular estadísticas.")
+        else:
+            st.caption(f"Ventana móvil de {VENTANA} lecturas · anomalía si |z| ≥ {Z_ANOMALIA:g}")
+            st.dataframe(peores.rename_axis("ID_Punto").reset_index()[
+                ["tag", "ID_Punto", "ultima_fecha", "ultimo_valor", "media", "desv", "ewma", "z", "anomalia"]]
+                .round({"ultimo_valor": 3, "media": 3, "desv": 3, "ewma": 3, "z": 2}),
+                use_container_width=True, hide_index=True)
+
+    # --- LÍMITES DE ALARMA ---
+    with st.expander("🚨 Límites de alarma"):
+        st.caption("Por defecto: " + " · ".join(
+            f"{var} alerta {a:g} / disparo {d:g} (tasa {t:g}/h)" if not np.isnan(a) else f"{var} sin límite"
+            for var, (a, d, t) in LIMITES_DEFECTO.items()) + ". Una fila en LIMITES reemplaza el defecto del punto.")
+        df_lim = snapshot.tabla(*LIMITES)
+        if df_lim.columns.empty:
+            st.info(f"Cree la hoja LIMITES en 3_MONITOREO con las columnas: {', '.join(COLUMNAS_LIMITES)}.")
+        else:
+            df_lim_ed = st.data_editor(df_lim, num_rows="dynamic", use_container_width=True, key="ed_limites")
+            if st.button("Guardar Límites"):
+                res = update_full_excel("3_MONITOREO", "LIMITES", df_lim_ed, df_lim)
+                if res:
+                    st.success(f"{res['celdas']} celdas escritas, {res['insertadas']} filas nuevas, {res['eliminadas']} eliminadas.")
+
+        actual = estado_alarmas()
+        if not actual.empty:
+            en_alarma = actual[actual["Estado"] != NORMAL]
+            st.markdown(f"**Puntos en alarma ahora:** {len(en_alarma)} de {len(actual)}")
+            if not en_alarma.empty:
+                st.dataframe(en_alarma[["ID_Punto", "fecha", "valor", "Estado"]], use_container_width=True, hide_index=True)
+
+        # Recalcula Estado en toda la historia (p. ej. tras cambiar límites) y escribe solo lo que cambió
+        if st.button("🔁 Reevaluar historial completo", key="mon_reevaluar"):
+            if "Estado" not in df_lecturas.columns:
+                st.error("La hoja LECTURAS no tiene columna Estado.")
+            elif get_cola().pendientes(*LECTURAS):
+                st.warning("Hay lecturas en cola hacia Drive; reintente cuando se confirmen.")
+            else:
+                datos = indice_lecturas().datos
+                # Vacío = "" (astype(str) daría "nan", que se escribiría y contaría como cambio)
+                estado = df_lecturas["Estado"]
+                previos = estado.astype(object).where(estado.notna(), "").astype(str).to_numpy()
+                estados = previos.astype(object)
+                estados[datos["fila"].to_numpy()] = evaluar(datos, tabla_limites(df_lim, datos["ID_Punto"])).to_numpy()
+                cambios = int((estados != previos).sum())
+                if not cambios:
+                    st.info("El historial ya está al día con los límites actuales.")
+                elif update_column_excel("3_MONITOREO", "LECTURAS", df_lecturas, "Estado", estados):
+                    get_almacen_lecturas().descartar()    # Los meses sellados tenían el Estado anterior
+                    st.success(f"Estado actualizado en {cambios} lecturas.")
+
 # ------------------------------------------------------------------
 # MÓDULO 4: ALMACÉN
 # ------------------------------------------------------------------
@@ -361,24 +896,29 @@ if menu == "4. Almacén & BOM":
     
     with t1:
         st.subheader("Maestro de Materiales")
-        df_mat_ed = st.data_editor(df_mat, num_rows="dynamic", use_container_width=True)
+        df_mat_ed = st.data_editor(sin_categorias(df_mat), num_rows="dynamic", use_container_width=True)
         if st.button("Guardar Cambios Materiales"):
-            update_full_excel("1_DATA_MAESTRA", "MATERIALES", df_mat_ed)
+            res = update_full_excel("1_DATA_MAESTRA", "MATERIALES", df_mat_ed, df_mat)
+            if res:
+                st.success(f"{res['celdas']} celdas escritas, {res['insertadas']} filas nuevas, {res['eliminadas']} eliminadas.")
             
     with t2:
         st.subheader("Asignar Repuestos a Equipos")
         c1, c2, c3 = st.columns(3)
         
-        tags = df_activos['TAG'].unique()
-        skus = df_mat['SKU'].unique() if not df_mat.empty else []
+        tags = opciones_buscables(indice_activos(), "bom_buscar_tag", "activo", c1, buscador=indice_activos_con_especificacion)
+        skus = opciones_buscables(indice_materiales(), "bom_buscar_sku", "repuesto", c2)
         
         with st.form("frm_bom"):
-            s_tag = c1.selectbox("Activo", tags)
-            s_sku = c2.selectbox("Repuesto", skus)
+            s_tag = c1.selectbox("Activo", tags, format_func=indice_activos().etiqueta)
+            s_sku = c2.selectbox("Repuesto", skus, format_func=indice_materiales().etiqueta)
             s_cant = c3.number_input("Cantidad", min_value=1)
             s_obs = st.text_input("Observación")
             
-            if st.form_submit_button("Vincular"):
+            enviar_bom = st.form_submit_button("Vincular")
+            if enviar_bom and not (s_tag and s_sku):
+                st.error("Seleccione activo y repuesto.")
+            elif enviar_bom:
                 row_bom = {
                     "TAG_Equipo": s_tag,
                     "SKU_Material": s_sku,
@@ -390,3 +930,34 @@ if menu == "4. Almacén & BOM":
                     st.rerun()
         
         st.dataframe(df_bom, use_container_width=True)
+
+# ==========================================
+# 4. PANEL DE RENDIMIENTO (solo con MEDICION=1)
+# ==========================================
+def panel_rendimiento(rerun):
+    """Tiempos de este rerun, llamadas al almacenamiento y tramos más lentos de la sesión"""
+    sesion = st.session_state.setdefault("medicion", {"reruns": [], "api": {}, "lentos": []})
+    sesion["reruns"] = (sesion["reruns"] + [rerun["ms"]])[-20:]
+    for nombre, n in rerun["api"].items():
+        sesion["api"][nombre] = sesion["api"].get(nombre, 0) + n
+    sesion["lentos"] = sorted(sesion["lentos"] + rerun["tramos"], key=lambda t: -t["ms"])[:10]
+
+    with st.sidebar.expander("📊 Rendimiento"):
+        st.caption(f"Este rerun: {rerun['ms']:.0f} ms · {len(rerun['tramos'])} tramos")
+        st.caption("Últimos reruns (ms): " + " · ".join(f"{ms:.0f}" for ms in sesion["reruns"][-8:]))
+        grupos = medicion.agrupar(rerun["tramos"])
+        if grupos:
+            st.dataframe(pd.DataFrame(grupos[:15], columns=["Tipo", "Tramo", "Llamadas", "ms total", "ms máx"]).round(1),
+                         hide_index=True, use_container_width=True)
+        en_proceso = sum(n for (tipo, _), n in medicion.proceso.items() if tipo == medicion.API)
+        st.caption(f"Llamadas al almacenamiento: {sum(rerun['api'].values())} en este rerun, "
+                   f"{sum(sesion['api'].values())} en la sesión, {en_proceso} en el proceso (incluye refrescos en segundo plano)")
+        if sesion["lentos"]:
+            st.markdown("**Tramos más lentos de la sesión**")
+            st.dataframe(pd.DataFrame([{"Tramo": t["nombre"], "Tipo": t["tipo"], "ms": round(t["ms"], 1),
+                                        "Hora": datetime.fromtimestamp(t["t"]).strftime("%H:%M:%S")}
+                                       for t in sesion["lentos"]]), hide_index=True, use_container_width=True)
+
+rerun_medido = medicion.terminar_rerun()
+if rerun_medido is not None:
+    panel_rendimiento(rerun_medido)
@@ -3,7 +3,10 @@ import pandas as pd
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import plotly.express as px
+import numpy as np
 import time
+from jerarquia import IndiceJerarquia
+from busqueda import IndiceBusqueda
 
 # ==========================================
 # 1. CONFIGURACIÓN Y CONEXIÓN
@@ -23,6 +26,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(max_entries=4)
+def indice_repuestos(df_rep):
+    """Índice de búsqueda del almacén (se reconstruye solo si cambia la tabla)"""
+    campos = {col: 1 for col in df_rep.columns}
+    campos.update({"SKU": 3, "Desc": 2})
+    return IndiceBusqueda(df_rep, "SKU", campos)
+
 @st.cache_resource
 def get_google_sheet_client():
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
@@ -115,31 +125,37 @@ def render_gestion_activos():
     # --- TAB 1: ÁRBOL VISUAL ---
     with tab1:
         st.info("Estructura Jerárquica Completa.")
-        plantas = df_eq[df_eq['Nivel'] == 'L2-Planta']
-        for _, p in plantas.iterrows():
-            st.markdown(f"<div class='n2'>🏢 {p['Nombre']} ({p['TAG']})</div>", unsafe_allow_html=True)
-            areas = df_eq[df_eq['TAG_Padre'] == p['TAG']]
-            for _, a in areas.iterrows():
-                with st.expander(f"📍 {a['Nombre']}"):
-                    equipos = df_eq[df_eq['TAG_Padre'] == a['TAG']]
-                    for _, e in equipos.iterrows():
-                        spec_eq = f"<span class='spec'>{e['Especificacion']}</span>" if e['Especificacion'] else ""
-                        st.markdown(f"<div class='n4'>⚙️ {e['Nombre']} {spec_eq}</div>", unsafe_allow_html=True)
-                        
-                        sistemas = df_eq[df_eq['TAG_Padre'] == e['TAG']]
-                        for _, s in sistemas.iterrows():
-                            st.markdown(f"<div class='n5'>↳ 🔧 {s['Nombre']}</div>", unsafe_allow_html=True)
-                            
-                            componentes = df_eq[df_eq['TAG_Padre'] == s['TAG']]
-                            for _, c in componentes.iterrows():
-                                spec_comp = f"<span class='spec'>{c['Especificacion']}</span>" if c['Especificacion'] else ""
-                                # Conteo de BOM
-                                bom_count = 0
-                                if not df_bom.empty:
-                                    bom_count = len(df_bom[df_bom['TAG_Equipo'] == c['TAG']])
-                                
-                                bom_tag = f"<span class='bom-tag'>🧩 {bom_count} Items</span>" if bom_count > 0 else ""
-                                st.markdown(f"<div class='n6'>• 🔩 {c['Nombre']} {spec_comp} {bom_tag}</div>", unsafe_allow_html=True)
+        # Índice padre -> hijos y conteo de BOM en una sola pasada (antes se filtraba df_eq por cada nodo)
+        jer = IndiceJerarquia(df_eq)
+        bom_por_tag = df_bom['TAG_Equipo'].astype(str).value_counts() if not df_bom.empty else pd.Series(dtype=int)
+        tags = df_eq['TAG'].astype(str).to_numpy()
+        nombres = df_eq['Nombre'].astype(str).to_numpy()
+        specs = df_eq['Especificacion'].fillna("").astype(str).to_numpy()
+
+        def spec_html(i):
+            return f"<span class='spec'>{specs[i]}</span>" if specs[i] else ""
+
+        for p in np.flatnonzero((df_eq['Nivel'] == 'L2-Planta').to_numpy()):
+            st.markdown(f"<div class='n2'>🏢 {nombres[p]} ({tags[p]})</div>", unsafe_allow_html=True)
+            for a in jer.posiciones_hijos(tags[p]):
+                # Render perezoso: solo las áreas abiertas generan el HTML de sus equipos
+                if not st.toggle(f"📍 {nombres[a]}", key=f"arbol_a_{tags[a]}"):
+                    continue
+                for e in jer.posiciones_hijos(tags[a]):
+                    st.markdown(f"<div class='n4'>⚙️ {nombres[e]} {spec_html(e)}</div>", unsafe_allow_html=True)
+                    sistemas = jer.posiciones_hijos(tags[e])
+                    if not len(sistemas) or not st.toggle(f"Ver sistemas ({len(sistemas)})", key=f"arbol_e_{tags[e]}"):
+                        continue
+
+                    # Sistemas y componentes del equipo en un solo bloque de HTML
+                    partes = []
+                    for s_ in sistemas:
+                        partes.append(f"<div class='n5'>↳ 🔧 {nombres[s_]}</div>")
+                        for c in jer.posiciones_hijos(tags[s_]):
+                            bom_count = int(bom_por_tag.get(tags[c], 0))
+                            bom_tag = f"<span class='bom-tag'>🧩 {bom_count} Items</span>" if bom_count > 0 else ""
+                            partes.append(f"<div class='n6'>• 🔩 {nombres[c]} {spec_html(c)} {bom_tag}</div>")
+                    st.markdown("".join(partes), unsafe_allow_html=True)
 
     # --- TAB 2: CREAR ---
     with tab2:
@@ -271,8 +287,10 @@ def render_gestion_activos():
                 else:
                     filtro_rep = st.text_input("🔍 Buscar en Almacén (Nombre o SKU):")
                     if filtro_rep:
-                        mask = df_rep.apply(lambda x: filtro_rep.lower() in str(x).lower(), axis=1)
-                        rep_opts = df_rep[mask]
+                        # Índice invertido en lugar de convertir cada fila a texto en cada rerun
+                        skus = indice_repuestos(df_rep).buscar(filtro_rep, limite=50)
+                        rango = df_rep['SKU'].astype(str).map({sku: i for i, sku in enumerate(skus)})
+                        rep_opts = df_rep.loc[rango.dropna().sort_values().index]
                     else:
                         rep_opts = df_rep
                     
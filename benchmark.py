@@ -0,0 +1,368 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import ACTIVOS, BOM, ORDENES, LECTURAS, HOJAS, COLUMNAS_DIFERIDAS, ClienteLocal, cargar_libros
+from almacenamiento import AlmacenamientoDrive, AlmacenamientoSQLite
+from esquema import aplicar_esquema, sin_categorias
+from escritura import calcular_diff
+from jerarquia import IndiceJerarquia, IndiceSubarbol, ESTADOS_OT_CERRADOS, resumen_subarbol
+from lecturas import IndiceLecturas, tag_de_punto
+from busqueda import IndiceBusqueda
+from generador_planta import generar_planta, a_libros, volcar, resumen
+
+# ==========================================
+# BENCHMARK DE LOS CAMINOS CRÍTICOS
+# ==========================================
+# python benchmark.py --escala media --almacenamiento sqlite
+# Genera una planta sintética (siempre la misma para una escala), mide cada caso
+# (mediana de N repeticiones y pico de memoria de Python/numpy con tracemalloc) y lo
+# compara con la corrida anterior de la misma escala y almacenamiento, guardada en
+# datos_locales/benchmarks/<escala>.jsonl.
+ESCALAS = {
+    # ~300 activos, ~190 mil lecturas
+    "chica": dict(plantas=1, areas=3, equipos=10, sistemas=2, componentes=4, materiales=500,
+                  ots_por_equipo=20, anos=1, lecturas_por_dia=1),
+    # ~1.300 activos, ~770 mil lecturas
+    "media": dict(plantas=2, areas=5, equipos=12, sistemas=2, componentes=4, materiales=5000,
+                  ots_por_equipo=40, anos=1, lecturas_por_dia=1),
+    # ~9.000 activos, ~5,8 millones de lecturas
+    "grande": dict(plantas=3, areas=8, equipos=20, sistemas=3, componentes=5, materiales=20000,
+                   ots_por_equipo=60, anos=1, lecturas_por_dia=1),
+}
+DIR_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos_locales", "benchmarks")
+# Más lento que la corrida anterior en esta fracción (y al menos MIN_MS) se marca como regresión
+UMBRAL_REGRESION = 0.25
+MIN_MS = 5.0
+
+CASOS = {}
+
+
+def caso(nombre):
+    """Registra preparar(ctx) -> función sin argumentos a medir"""
+    def registrar(preparar):
+        CASOS[nombre] = preparar
+        return preparar
+    return registrar
+
+
+class Contexto:
+    """Datos de la planta sintética y objetos derivados que los casos comparten (se crean una vez)"""
+    def __init__(self, escala, almacenamiento, semilla=0):
+        self.parametros = dict(ESCALAS[escala], semilla=semilla)
+        self.crudas = generar_planta(**self.parametros)
+        self.rng = np.random.default_rng(semilla)
+        self.tipo_almacenamiento = almacenamiento
+        self._dir_temporal = None
+        self._cache = {}
+
+    def almacenamiento(self):
+        if "almacenamiento" not in self._cache:
+            if self.tipo_almacenamiento == "sqlite":
+                self._dir_temporal = tempfile.TemporaryDirectory()
+                alm = AlmacenamientoSQLite(os.path.join(self._dir_temporal.name, "planta.db"))
+                volcar(self.crudas, alm)
+            else:
+                # Igual que Drive: cada celda llega como texto y se parsea al cargar
+                alm = AlmacenamientoDrive(ClienteLocal(a_libros(self.crudas)))
+            self._cache["almacenamiento"] = alm
+        return self._cache["almacenamiento"]
+
+    def tablas(self):
+        """Hojas como las ve la app: descargadas del almacenamiento y tipadas con su esquema"""
+        if "tablas" not in self._cache:
+            descargadas, _, _ = cargar_libros(self.almacenamiento())
+            self._cache["tablas"] = {c: aplicar_esquema(c, df)[0] for c, df in descargadas.items()}
+        return self._cache["tablas"]
+
+    def obtener(self, nombre, construir):
+        if nombre not in self._cache:
+            self._cache[nombre] = construir()
+        return self._cache[nombre]
+
+    def jerarquia(self):
+        return self.obtener("jerarquia", lambda: IndiceJerarquia(self.tablas()[ACTIVOS]))
+
+    def subarbol(self):
+        return self.obtener("subarbol", lambda: IndiceSubarbol(self.jerarquia()))
+
+    def muestra(self, nivel, n):
+        tags = self.jerarquia().tags[self.tablas()[ACTIVOS]["Nivel"].astype(str).to_numpy() == nivel]
+        return list(self.rng.choice(tags, min(n, len(tags)), replace=False)) if len(tags) else []
+
+    def cerrar(self):
+        if self._dir_temporal:
+            self._dir_temporal.cleanup()
+
+
+# --- Carga ---
+@caso("carga_parseo")
+def _carga(ctx):
+    alm = ctx.almacenamiento()
+
+    def medir():
+        descargadas, _, errores = cargar_libros(alm)
+        assert not errores, errores
+        return {c: aplicar_esquema(c, df)[0] for c, df in descargadas.items()}
+    return medir
+
+
+@caso("carga_proyectada")
+def _carga_proyectada(ctx):
+    """Como la app: sin las COLUMNAS_DIFERIDAS (texto largo que se lee al abrir un detalle)"""
+    alm = ctx.almacenamiento()
+
+    def medir():
+        descargadas, _, errores = cargar_libros(alm, omitir=COLUMNAS_DIFERIDAS)
+        assert not errores, errores
+        return {c: aplicar_esquema(c, df)[0] for c, df in descargadas.items()}
+    return medir
+
+
+# --- Cascada de 5 niveles ---
+@caso("cascada_indice")
+def _cascada_indice(ctx):
+    df = ctx.tablas()[ACTIVOS]
+    return lambda: IndiceJerarquia(df)
+
+
+@caso("cascada_navegacion")
+def _cascada_navegacion(ctx):
+    idx, destinos = ctx.jerarquia(), ctx.muestra("L6-Componente", 200)
+
+    def medir():
+        # Lo que hace filtro_cascada_5_niveles al saltar a un activo: ruta + opciones de cada nivel
+        for tag in destinos:
+            ruta = idx.ruta(tag)
+            idx.plantas()
+            for padre in ruta[:-1]:
+                idx.hijos_de(padre)
+            idx.registro(tag)
+    return medir
+
+
+# --- Árbol (navegador con resúmenes de subárbol) ---
+def _posiciones(ctx):
+    t = ctx.tablas()
+    sub = ctx.subarbol()
+    return {
+        ORDENES: sub.posiciones(t[ORDENES]["TAG_Equipo"]),
+        BOM: sub.posiciones(t[BOM]["TAG_Equipo"]),
+        LECTURAS: sub.posiciones(tag_de_punto(t[LECTURAS]["ID_Punto"])),
+    }
+
+
+@caso("arbol_indice")
+def _arbol_indice(ctx):
+    idx, df_ots, df_bom, df_lec = ctx.jerarquia(), ctx.tablas()[ORDENES], ctx.tablas()[BOM], ctx.tablas()[LECTURAS]
+
+    def medir():
+        sub = IndiceSubarbol(idx)
+        pos_ots = sub.posiciones(df_ots["TAG_Equipo"])
+        sub.posiciones(df_bom["TAG_Equipo"])
+        sub.posiciones(tag_de_punto(df_lec["ID_Punto"]))
+        abiertas = ~df_ots["Estado_OT"].isin(ESTADOS_OT_CERRADOS).to_numpy()
+        return sub.totales(pos_ots[abiertas])
+    return medir
+
+
+@caso("arbol_resumen")
+def _arbol_resumen(ctx):
+    t, sub, idx = ctx.tablas(), ctx.subarbol(), ctx.jerarquia()
+    pos = ctx.obtener("posiciones", lambda: _posiciones(ctx))
+    tags = ctx.muestra("L4-Equipo", 25) + ctx.muestra("L3-Area", 5)
+
+    def medir():
+        for tag in tags:
+            resumen_subarbol(sub, tag, t[ORDENES], pos[ORDENES], t[BOM], pos[BOM], t[LECTURAS], pos[LECTURAS])
+            idx.tabla_hijos(tag)
+    return medir
+
+
+# --- Tendencias ---
+@caso("tendencia_indice")
+def _tendencia_indice(ctx):
+    df = ctx.tablas()[LECTURAS]
+    return lambda: IndiceLecturas(df)
+
+
+@caso("tendencia_filtro")
+def _tendencia_filtro(ctx):
+    indice = ctx.obtener("indice_lecturas", lambda: IndiceLecturas(ctx.tablas()[LECTURAS]))
+    sub = ctx.subarbol()
+    equipos = [sub.descendientes(t) for t in ctx.muestra("L4-Equipo", 20)]
+
+    def medir():
+        indice._reducidas.clear()     # Sin lo memorizado de la corrida anterior
+        for tags in equipos:
+            for dias in (7, 90, None):
+                indice.historia_reducida(tags, dias, puntos=1000)
+    return medir
+
+
+# --- Búsqueda ---
+def _indice_activos(df):
+    return IndiceBusqueda(df, "TAG", {"TAG": 3, "Nombre": 2, "Especificacion_Tecnica": 1}, ["Nombre"])
+
+
+@caso("busqueda_indice")
+def _busqueda_indice(ctx):
+    df = ctx.tablas()[ACTIVOS]
+    return lambda: _indice_activos(df)
+
+
+@caso("busqueda_consultas")
+def _busqueda_consultas(ctx):
+    indice = ctx.obtener("indice_activos", lambda: _indice_activos(ctx.tablas()[ACTIVOS]))
+    tags = ctx.muestra("L6-Componente", 25)
+    # TAG exacto, prefijo, nombre, especificación y con error de tipeo
+    consultas = tags + [t[:8] for t in tags] + ["chumacera carga", "motor", "digestor 3", "316L", "rodamiento skf"]
+    consultas += [t.replace("-", "")[:-1] + "x" for t in tags[:10]]
+
+    def medir():
+        for q in consultas:
+            indice.buscar(q, limite=50)
+    return medir
+
+
+# --- Editor masivo ---
+@caso("diff_editor")
+def _diff_editor(ctx):
+    original = sin_categorias(ctx.tablas()[ACTIVOS])
+    editado = original.copy()
+    n = len(editado)
+    filas = ctx.rng.choice(n, max(1, n // 100), replace=False)
+    editado.loc[filas, "Nombre"] = editado.loc[filas, "Nombre"].astype(str) + " (rev)"
+    editado = editado.drop(index=ctx.rng.choice(n, min(10, n), replace=False))
+    nuevas = original.tail(10).assign(TAG=[f"NUEVO-{i}" for i in range(min(10, n))])
+    editado = pd.concat([editado, nuevas.set_axis(range(n, n + len(nuevas)))])
+    return lambda: calcular_diff(original, editado)
+
+
+# ==========================================
+# MEDICIÓN, GUARDADO Y COMPARACIÓN
+# ==========================================
+def medir_caso(funcion, repeticiones):
+    """Mediana y mínimo en segundos de 'repeticiones' corridas, y pico de memoria (MB) de una más"""
+    funcion()   # Calentamiento (importaciones perezosas, cachés de pandas)
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seg": statistics.median(tiempos), "seg_min": min(tiempos), "mb_pico": pico / 1e6}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def ejecutar(escala="chica", almacenamiento="local", repeticiones=5, solo=None, semilla=0):
+    """Corre los casos (todos o los de 'solo') y retorna el registro de la corrida"""
+    ctx = Contexto(escala, almacenamiento, semilla)
+    try:
+        filas = {hoja: len(ctx.crudas[(libro, hoja)]) for libro, hoja in HOJAS}
+        print(f"Planta '{escala}': {resumen(ctx.crudas)}")
+        casos = {}
+        for nombre, preparar in CASOS.items():
+            if solo and nombre not in solo:
+                continue
+            casos[nombre] = medir_caso(preparar(ctx), repeticiones)
+            print(f"  {nombre:<20} {casos[nombre]['seg'] * 1000:10.1f} ms {casos[nombre]['mb_pico']:9.1f} MB")
+    finally:
+        ctx.cerrar()
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"), "commit": _commit(),
+        "escala": escala, "almacenamiento": almacenamiento, "repeticiones": repeticiones,
+        "parametros": ctx.parametros, "filas": filas,
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "casos": casos,
+    }
+
+
+def ruta_resultados(escala):
+    return os.path.join(DIR_RESULTADOS, f"{escala}.jsonl")
+
+
+def corrida_anterior(registro):
+    """Última corrida guardada con la misma escala, almacenamiento y parámetros (o None)"""
+    try:
+        with open(ruta_resultados(registro["escala"]), encoding="utf-8") as f:
+            previas = [json.loads(linea) for linea in f if linea.strip()]
+    except OSError:
+        return None
+    previas = [p for p in previas if p["almacenamiento"] == registro["almacenamiento"]
+               and p["parametros"] == registro["parametros"]]
+    return previas[-1] if previas else None
+
+
+def guardar(registro):
+    os.makedirs(DIR_RESULTADOS, exist_ok=True)
+    with open(ruta_resultados(registro["escala"]), "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro) + "\n")
+
+
+def comparar(registro, anterior):
+    """Imprime la tabla contra la corrida anterior. Retorna los casos que empeoraron."""
+    if anterior is None:
+        print("Sin corrida anterior para comparar.")
+        return []
+    print(f"\nComparación con {anterior['fecha']} ({anterior.get('commit') or 'sin commit'}):")
+    print(f"  {'caso':<20} {'antes ms':>10} {'ahora ms':>10} {'Δ':>8} {'antes MB':>9} {'ahora MB':>9}")
+    regresiones = []
+    for nombre, ahora in registro["casos"].items():
+        antes = anterior["casos"].get(nombre)
+        if antes is None:
+            print(f"  {nombre:<20} {'—':>10} {ahora['seg'] * 1000:10.1f}")
+            continue
+        delta = ahora["seg"] / antes["seg"] - 1 if antes["seg"] else 0.0
+        peor = delta > UMBRAL_REGRESION and (ahora["seg"] - antes["seg"]) * 1000 > MIN_MS
+        if peor:
+            regresiones.append(nombre)
+        print(f"  {nombre:<20} {antes['seg'] * 1000:10.1f} {ahora['seg'] * 1000:10.1f} {delta:+8.0%}"
+              f" {antes['mb_pico']:9.1f} {ahora['mb_pico']:9.1f}{'  ⚠' if peor else ''}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga, cascada, árbol, tendencias, búsqueda y diffs")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="chica")
+    parser.add_argument("--almacenamiento", choices=["local", "sqlite"], default="local",
+                        help="local: ClienteLocal (celdas como texto, igual que Drive); sqlite: AlmacenamientoSQLite")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--solo", nargs="+", choices=list(CASOS), help="Medir solo estos casos")
+    parser.add_argument("--no-guardar", action="store_true", help="No agregar esta corrida al historial")
+    parser.add_argument("--estricto", action="store_true", help="Salir con código 1 si algún caso empeoró")
+    args = parser.parse_args()
+
+    registro = ejecutar(args.escala, args.almacenamiento, args.repeticiones, args.solo)
+    regresiones = comparar(registro, corrida_anterior(registro))
+    if not args.no_guardar:
+        guardar(registro)
+    if regresiones:
+        print(f"\nMás lentos que la corrida anterior (>{UMBRAL_REGRESION:.0%}): {', '.join(regresiones)}")
+        if args.estricto:
+            raise SystemExit(1)
@@ -0,0 +1,187 @@
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ÍNDICE INVERTIDO PARA BÚSQUEDA (ACTIVOS Y MATERIALES)
+# ==========================================
+# token -> {documento: peso del campo}. Cada palabra de la consulta se resuelve contra el
+# vocabulario, no contra las filas:  exacta (x3) > prefijo (x2) > parecida por trigramas.
+# Los resultados se ordenan por cantidad de palabras encontradas y luego por puntaje.
+
+_SEPARADOR = re.compile(r"[^0-9a-z]+")
+MAX_PREFIJOS = 200      # Tokens del vocabulario revisados por prefijo ("0" no recorre todo)
+SIMILITUD_MIN = 0.35    # Jaccard de trigramas para aceptar una coincidencia difusa
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ("Vibración" -> "vibracion")"""
+    texto = str(texto).lower()
+    if texto.isascii():
+        return texto
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokens(texto, compacto=True):
+    """'EQ-DIG-01' -> ['eq', 'dig', '01', 'eqdig01'] (el compacto permite buscar el TAG sin guiones)"""
+    partes = [t for t in _SEPARADOR.split(normalizar(texto)) if t]
+    if compacto and len(partes) > 1:
+        partes.append("".join(partes))
+    return partes
+
+
+def _trigramas(token):
+    t = f"  {token} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+class IndiceBusqueda:
+    """
+    df: tabla de origen; clave: columna que identifica el resultado (TAG, SKU)
+    campos: {columna: peso} a indexar (las que no existan se ignoran)
+    etiqueta: columnas que acompañan a la clave al mostrar un resultado
+    Se amplía con las filas nuevas sin reconstruir (con_filas_nuevas, que retorna otro índice).
+    """
+    def __init__(self, df, clave, campos, etiqueta=()):
+        self.clave = clave
+        self.campos = {c: p for c, p in campos.items() if c in df.columns}
+        self.col_etiqueta = [c for c in etiqueta if c in df.columns]
+        self.claves = []                        # documento -> clave
+        self._etiquetas = {}                    # clave -> texto para mostrar
+        self._posteo = defaultdict(dict)        # token -> {documento: peso}
+        self._arreglos = {}                     # token -> (documentos, pesos) en numpy, al primer uso
+        self._por_trigrama = defaultdict(set)   # trigrama -> tokens del vocabulario
+        self._vocabulario = []                  # tokens ordenados (búsqueda por prefijo)
+        self._huellas = np.array([], dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._agregar(df)
+
+    def _huellas_de(self, df):
+        columnas = [c for c in [self.clave, *self.campos, *self.col_etiqueta] if c in df.columns]
+        return pd.util.hash_pandas_object(df[list(dict.fromkeys(columnas))].astype(str), index=False).to_numpy()
+
+    def _agregar(self, df):
+        if df.empty or self.clave not in df.columns:
+            return
+        with self._lock:
+            columnas = list(dict.fromkeys([self.clave, *self.campos, *self.col_etiqueta]))
+            nuevos, tokenizados = set(), {}     # Nombres y especificaciones se repiten mucho
+            # Posteos y trigramas pueden ser compartidos con la versión anterior del índice
+            # (con_filas_nuevas): se copian la primera vez que esta llamada los modifica
+            posteos_propios, trigramas_propios = set(), set()
+            for fila in df[columnas].astype(str).itertuples(index=False, name=None):
+                valores = dict(zip(columnas, fila))
+                clave = valores[self.clave]
+                if clave in self._etiquetas:
+                    continue    # Claves repetidas: gana la primera aparición
+                doc = len(self.claves)
+                self.claves.append(clave)
+                extra = " · ".join(valores[c] for c in self.col_etiqueta if valores[c])
+                self._etiquetas[clave] = f"{clave} · {extra}" if extra else clave
+                for col, peso in self.campos.items():
+                    valor = valores[col]
+                    if valor not in tokenizados:
+                        tokenizados[valor] = tokens(valor)
+                    for tok in tokenizados[valor]:
+                        if tok not in posteos_propios:
+                            self._posteo[tok] = dict(self._posteo.get(tok, ()))
+                            posteos_propios.add(tok)
+                        posteo = self._posteo[tok]
+                        if not posteo and tok not in nuevos:
+                            nuevos.add(tok)
+                            for tri in _trigramas(tok):
+                                if tri not in trigramas_propios:
+                                    self._por_trigrama[tri] = set(self._por_trigrama.get(tri, ()))
+                                    trigramas_propios.add(tri)
+                                self._por_trigrama[tri].add(tok)
+                        posteo[doc] = max(posteo.get(doc, 0), peso)
+                        self._arreglos.pop(tok, None)
+            if nuevos:
+                self._vocabulario = sorted(self._posteo)
+            self._huellas = np.concatenate([self._huellas, self._huellas_de(df)])
+
+    def con_filas_nuevas(self, df):
+        """
+        Si la tabla solo creció al final (mismas filas previas, mismo contenido), retorna un
+        índice nuevo que indexa únicamente las filas nuevas; este no cambia (las vistas de
+        versiones anteriores lo siguen usando). Retorna None si hubo otros cambios (reconstruir).
+        """
+        n = len(self._huellas)
+        if len(df) < n or not np.array_equal(self._huellas_de(df.iloc[:n]), self._huellas):
+            return None
+        if len(df) == n:
+            return self
+
+        # Copia superficial: _agregar copia los posteos y trigramas que toca
+        nuevo = object.__new__(IndiceBusqueda)
+        nuevo.clave, nuevo.campos, nuevo.col_etiqueta = self.clave, self.campos, self.col_etiqueta
+        nuevo.claves, nuevo._etiquetas = list(self.claves), dict(self._etiquetas)
+        nuevo._posteo, nuevo._arreglos = defaultdict(dict, self._posteo), dict(self._arreglos)
+        nuevo._por_trigrama, nuevo._vocabulario = defaultdict(set, self._por_trigrama), self._vocabulario
+        nuevo._huellas, nuevo._lock = self._huellas, threading.Lock()
+        nuevo._agregar(df.iloc[n:])
+        return nuevo
+
+    # --- Consultas ---
+    def etiqueta(self, clave):
+        return self._etiquetas.get(clave, clave)
+
+    def _arreglo(self, tok):
+        if tok not in self._arreglos:
+            posteo = self._posteo[tok]
+            self._arreglos[tok] = (np.fromiter(posteo.keys(), dtype=np.int64, count=len(posteo)),
+                                   np.fromiter(posteo.values(), dtype=float, count=len(posteo)))
+        return self._arreglos[tok]
+
+    def _coincidencias(self, palabra):
+        """Puntaje de cada documento para una palabra de la consulta (0 = no coincide)"""
+        mejores = np.zeros(len(self.claves))
+        candidatos = []
+        if palabra in self._posteo:
+            candidatos.append((palabra, 3.0))
+        i = bisect.bisect_left(self._vocabulario, palabra)
+        for tok in self._vocabulario[i:i + MAX_PREFIJOS]:
+            if not tok.startswith(palabra):
+                break
+            if tok != palabra:
+                candidatos.append((tok, 2.0))
+
+        if not candidatos and len(palabra) >= 3:
+            # Sin exactas ni prefijos: tokens parecidos (errores de tipeo, "rodamineto")
+            tris = _trigramas(palabra)
+            comunes = defaultdict(int)
+            for tri in tris:
+                for tok in self._por_trigrama.get(tri, ()):
+                    comunes[tok] += 1
+            for tok, c in comunes.items():
+                similitud = c / len(tris | _trigramas(tok))
+                if similitud >= SIMILITUD_MIN:
+                    candidatos.append((tok, similitud))
+
+        for tok, factor in candidatos:
+            docs, pesos = self._arreglo(tok)
+            mejores[docs] = np.maximum(mejores[docs], factor * pesos)
+        return mejores
+
+    def buscar(self, consulta, limite=20):
+        """Claves que coinciden con la consulta, de mejor a peor"""
+        palabras = tokens(consulta, compacto=False)
+        if not palabras or not self.claves:
+            return []
+        with self._lock:
+            puntaje = np.zeros(len(self.claves))
+            encontradas = np.zeros(len(self.claves), dtype=np.int64)
+            for palabra in palabras:
+                s = self._coincidencias(palabra)
+                puntaje += s
+                encontradas += s > 0
+            docs = np.flatnonzero(encontradas)
+            # Más palabras encontradas primero, luego mayor puntaje, luego orden de la hoja
+            orden = docs[np.lexsort((docs, -puntaje[docs], -encontradas[docs]))[:limite]]
+            return [self.claves[d] for d in orden]
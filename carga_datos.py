@@ -0,0 +1,358 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from escritura import _columna_a1
+
+# ==========================================
+# LIBROS Y HOJAS QUE CONSUME LA APP
+# ==========================================
+LIBROS = {
+    "1_DATA_MAESTRA": ["ACTIVOS", "MATERIALES", "BOM"],
+    "2_GESTION_TRABAJO": ["ORDENES"],
+    "3_MONITOREO": ["LECTURAS", "LIMITES"],
+}
+
+# Claves (libro, hoja) de cada tabla
+ACTIVOS = ("1_DATA_MAESTRA", "ACTIVOS")
+MATERIALES = ("1_DATA_MAESTRA", "MATERIALES")
+BOM = ("1_DATA_MAESTRA", "BOM")
+ORDENES = ("2_GESTION_TRABAJO", "ORDENES")
+LECTURAS = ("3_MONITOREO", "LECTURAS")
+LIMITES = ("3_MONITOREO", "LIMITES")
+HOJAS = [ACTIVOS, MATERIALES, BOM, ORDENES, LECTURAS, LIMITES]
+
+# Hojas que pueden no existir todavía: si faltan se leen vacías (no se usa la primera del libro)
+HOJAS_OPCIONALES = {LIMITES}
+
+# Texto libre largo que ninguna vista de navegación usa: el snapshot no lo descarga (la columna
+# queda vacía, en su posición) y se lee aparte cuando se abre el detalle que lo muestra.
+COLUMNAS_DIFERIDAS = {
+    ACTIVOS: ["Especificacion_Tecnica"],
+    ORDENES: ["Descripcion_Trabajo"],
+}
+
+# Segundos de vigencia de cada hoja antes de volver a consultarla en Drive
+TTL_HOJAS = {
+    ACTIVOS: 600,       # Cambia muy poco
+    MATERIALES: 600,
+    BOM: 300,
+    ORDENES: 120,
+    LECTURAS: 30,       # Se registran lecturas todo el turno
+    LIMITES: 600,
+}
+
+
+def _numerizar(valor):
+    """Igual que gspread.get_all_records: '12' -> 12, '1.5' -> 1.5, resto sin cambios"""
+    if not isinstance(valor, str) or valor == "":
+        return valor
+    try:
+        return int(valor)
+    except ValueError:
+        pass
+    try:
+        return float(valor)
+    except ValueError:
+        return valor
+
+
+def valores_a_dataframe(valores):
+    """
+    Convierte la respuesta cruda de la API (lista de filas) en DataFrame.
+    La primera fila son los encabezados; las filas cortas se rellenan con "".
+    """
+    if not valores:
+        return pd.DataFrame()
+    encabezados = [str(h) for h in valores[0]]
+    n = len(encabezados)
+    filas = [[_numerizar(v) for v in (fila + [""] * (n - len(fila)))[:n]] for fila in valores[1:]]
+    return pd.DataFrame(filas, columns=encabezados)
+
+
+def _rango_hoja(hoja):
+    # Rango = hoja completa (las comillas simples admiten espacios en el nombre)
+    return "'" + hoja.replace("'", "''") + "'"
+
+
+def _rangos_hoja(hoja, desde=None):
+    """
+    Rangos a pedir para una hoja: la hoja completa, o solo encabezados + filas desde
+    la fila 'desde' del Excel (lo anterior ya está guardado localmente).
+    """
+    if not desde or desde <= 2:
+        return [_rango_hoja(hoja)]
+    return [f"{_rango_hoja(hoja)}!1:1", f"{_rango_hoja(hoja)}!A{desde}:ZZ"]
+
+
+# --- Proyección de columnas ---
+def _posiciones(encabezados, columnas=None, omitir=()):
+    """Posiciones (desde 1) de las columnas a leer: solo 'columnas' (si se indican), sin las de 'omitir'"""
+    return [i for i, h in enumerate(encabezados, 1) if (columnas is None or h in columnas) and h not in omitir]
+
+
+def _bloques_columnas(posiciones):
+    """[1, 2, 3, 6] -> [(1, 3), (6, 6)]"""
+    bloques = []
+    for p in posiciones:
+        if bloques and p == bloques[-1][1] + 1:
+            bloques[-1] = (bloques[-1][0], p)
+        else:
+            bloques.append((p, p))
+    return bloques
+
+
+def _rangos_columnas(hoja, posiciones, desde=None):
+    """Un rango por bloque de columnas contiguas, desde la fila 2 (o 'desde'): 'H'!A2:C, 'H'!F2:F"""
+    fila = desde if desde and desde > 2 else 2
+    return [f"{_rango_hoja(hoja)}!{_columna_a1(a)}{fila}:{_columna_a1(b)}" for a, b in _bloques_columnas(posiciones)]
+
+
+def dataframe_proyectado(encabezados, posiciones, bloques, columnas=None):
+    """
+    DataFrame a partir de los valores de cada bloque de columnas (mismo orden que _rangos_columnas).
+    Con 'columnas' quedan solo las pedidas; sin ellas están todas y las no leídas van vacías ("").
+    """
+    n = max((len(filas) for filas in bloques), default=0)
+    datos = {}
+    for (a, b), filas in zip(_bloques_columnas(posiciones), bloques):
+        for j, h in enumerate(encabezados[a - 1:b]):
+            datos[h] = [_numerizar(f[j]) if j < len(f) else "" for f in filas] + [""] * (n - len(filas))
+    if columnas is not None:
+        return pd.DataFrame({h: datos[h] for h in encabezados if h in datos}, index=range(n))
+    return pd.DataFrame({h: datos.get(h, [""] * n) for h in encabezados}, index=range(n))
+
+
+def leer_libro(client, libro, hojas, desde=None, opcionales=(), columnas=None, omitir=None, encabezados=None):
+    """
+    Abre el libro UNA vez y trae todas sus hojas en un solo values_batch_get.
+    Si alguna hoja no existe se usa la primera del libro (mismo criterio que antes),
+    salvo las opcionales, que se leen vacías.
+    desde: {hoja: fila del Excel} para leer solo el final de esas hojas (encabezados incluidos).
+    columnas: {hoja: [columnas]} para traer y parsear solo esas (un rango por bloque contiguo).
+    omitir: {hoja: [columnas]} para traer todas menos esas; quedan en la tabla vacías, así las
+            posiciones siguen siendo las del Excel (para escribir filas y celdas).
+    encabezados: {(libro, hoja): [encabezados]} ya conocidos de las hojas proyectadas; con ellos
+            los rangos de columnas van en el mismo pedido (si no, o si cambiaron, hay un segundo).
+    Retorna ({hoja: DataFrame}, segundos).
+    """
+    t0 = time.perf_counter()
+    desde, columnas, omitir = desde or {}, columnas or {}, omitir or {}
+    encabezados = {} if encabezados is None else encabezados
+    sh = client.open(libro)
+
+    def proyectada(h):
+        return h in columnas or h in omitir
+
+    def posiciones(h):
+        return _posiciones(encabezados.get((libro, h), []), columnas.get(h), omitir.get(h, ()))
+
+    def rangos_de(h, n):
+        if not n:
+            return []
+        if not proyectada(h):
+            return _rangos_hoja(n, desde.get(h))
+        conocidos = (libro, h) in encabezados
+        return [f"{_rango_hoja(n)}!1:1"] + (_rangos_columnas(n, posiciones(h), desde.get(h)) if conocidos else [])
+
+    def pedir(rangos):
+        pedidos = [r for rs in rangos for r in rs]
+        resp = sh.values_batch_get(pedidos) if pedidos else {}
+        partes = iter(resp.get("valueRanges", []))
+        return [[next(partes, {}).get("values", []) for _ in rs] for rs in rangos]
+
+    def leer(nombres):
+        partes = pedir([rangos_de(h, n) for h, n in zip(hojas, nombres)])
+        # Hojas proyectadas sin encabezado conocido (o que cambió): segundo pedido con los rangos correctos
+        otra = {}
+        for i, (h, n) in enumerate(zip(hojas, nombres)):
+            if n and proyectada(h):
+                enc = [str(x) for x in (partes[i][0][0] if partes[i][0] else [])]
+                if enc != encabezados.get((libro, h)):
+                    encabezados[(libro, h)] = enc
+                    otra[i] = _rangos_columnas(n, posiciones(h), desde.get(h))
+        if otra:
+            for i, bloques in zip(otra, pedir(list(otra.values()))):
+                partes[i] = partes[i][:1] + bloques
+        return partes
+
+    try:
+        partes = leer(hojas)
+    except Exception:
+        # Algún nombre no existe: resolvemos contra la lista real de pestañas y reintentamos
+        titulos = [ws.title for ws in sh.worksheets()]
+        nombres = [h if h in titulos else (None if h in opcionales else titulos[0]) for h in hojas]
+        partes = leer(nombres)
+
+    tablas = {}
+    for h, p in zip(hojas, partes):
+        if proyectada(h) and p:
+            tablas[h] = dataframe_proyectado(encabezados[(libro, h)], posiciones(h), p[1:], columnas.get(h))
+        else:
+            tablas[h] = valores_a_dataframe([fila for filas in p for fila in filas])
+    return tablas, time.perf_counter() - t0
+
+
+def cargar_libros(origen, libros=None, desde=None, omitir=None):
+    """
+    Descarga todos los libros en paralelo (un hilo por libro).
+    origen: un almacenamiento (con leer_libro, ver almacenamiento.py) o un cliente gspread.
+    desde: {(libro, hoja): fila del Excel} para hojas que solo se leen desde esa fila.
+    omitir: {(libro, hoja): [columnas]} que no se descargan (quedan vacías, ver COLUMNAS_DIFERIDAS).
+    Retorna (tablas, tiempos, errores):
+      - tablas:  {(libro, hoja): DataFrame}
+      - tiempos: {libro: segundos}
+      - errores: {libro: mensaje}  -> sus hojas quedan como DataFrame vacío
+    """
+    libros = libros or LIBROS
+    desde, omitir = desde or {}, omitir or {}
+    tablas, tiempos, errores = {}, {}, {}
+    leer = getattr(origen, "leer_libro", None) or (lambda *args, **kw: leer_libro(origen, *args, **kw))
+
+    with ThreadPoolExecutor(max_workers=len(libros)) as pool:
+        futuros = {
+            libro: pool.submit(leer, libro, hojas,
+                               {h: desde[(libro, h)] for h in hojas if (libro, h) in desde},
+                               [h for h in hojas if (libro, h) in HOJAS_OPCIONALES],
+                               omitir={h: omitir[(libro, h)] for h in hojas if (libro, h) in omitir})
+            for libro, hojas in libros.items()
+        }
+
+    for libro, futuro in futuros.items():
+        try:
+            resultado, segundos = futuro.result()
+        except Exception as e:
+            errores[libro] = str(e)
+            resultado, segundos = {}, 0.0
+        tiempos[libro] = segundos
+        for hoja in libros[libro]:
+            tablas[(libro, hoja)] = resultado.get(hoja, pd.DataFrame())
+
+    return tablas, tiempos, errores
+
+
+# ==========================================
+# CLIENTE LOCAL (PRUEBAS SIN GOOGLE DRIVE)
+# ==========================================
+class _HojaLocal:
+    def __init__(self, title, filas=None, libro=None, id=0):
+        self.title = title
+        self._filas = filas if filas is not None else []
+        self.spreadsheet = libro
+        self.id = id
+
+    def append_rows(self, values, **kwargs):
+        inicio = len(self._filas) + 1
+        self._filas.extend([list(v) for v in values])
+        return {"updates": {"updatedRange": f"'{self.title}'!A{inicio}:A{len(self._filas)}"}}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def clear(self):
+        del self._filas[:]
+
+    def update(self, values, **kwargs):
+        self._filas[:] = [list(v) for v in values]
+
+    def batch_update(self, data, **kwargs):
+        for item in data:
+            if "!" in item["range"]:
+                # Como gspread: el título de la hoja lo agrega Worksheet, un rango con hoja queda inválido
+                raise ValueError(f"Rango con nombre de hoja en Worksheet.batch_update: {item['range']}")
+            celdas = item["range"].split(":")
+            fila_ini, col = _a1_a_posicion(celdas[0])
+            for i, valores in enumerate(item["values"]):
+                fila = fila_ini + i
+                while len(self._filas) < fila:
+                    self._filas.append([])
+                destino = self._filas[fila - 1]
+                destino.extend([""] * (col + len(valores) - 1 - len(destino)))
+                for j, valor in enumerate(valores):
+                    destino[col - 1 + j] = valor
+        return {}
+
+
+def _a1_a_posicion(celda):
+    """'C12' -> (12, 3)"""
+    letras = "".join(c for c in celda if c.isalpha())
+    col = 0
+    for c in letras:
+        col = col * 26 + ord(c.upper()) - 64
+    return int(celda[len(letras):]), col
+
+
+def _partes_a1(celda):
+    """'C12' -> (12, 3), 'C' -> (None, 3), '12' -> (12, None)"""
+    letras = "".join(c for c in celda if c.isalpha())
+    digitos = celda[len(letras):]
+    return (int(digitos) if digitos else None), (_a1_a_posicion(letras + "1")[1] if letras else None)
+
+
+class _LibroLocal:
+    def __init__(self, hojas, latencia):
+        self._hojas = hojas
+        self._latencia = latencia
+
+    def worksheets(self):
+        return [_HojaLocal(t, f, self, i) for i, (t, f) in enumerate(self._hojas.items())]
+
+    def worksheet(self, title):
+        if title not in self._hojas:
+            raise KeyError(f"Hoja no encontrada: {title}")
+        return _HojaLocal(title, self._hojas[title], self, list(self._hojas).index(title))
+
+    def batch_update(self, body):
+        # Solo se usa deleteDimension (borrado de filas del editor masivo)
+        hojas = list(self._hojas.values())
+        for pedido in body.get("requests", []):
+            rango = pedido["deleteDimension"]["range"]
+            del hojas[rango["sheetId"]][rango["startIndex"]:rango["endIndex"]]
+        return {}
+
+    def get_worksheet(self, index):
+        return self.worksheets()[index]
+
+    def values_batch_get(self, ranges, params=None):
+        time.sleep(self._latencia)
+        salida = []
+        for rango in ranges:
+            nombre, _, celdas = rango.rpartition("!") if "!" in rango else (rango, "", "")
+            nombre = nombre.strip("'").replace("''", "'")
+            if nombre not in self._hojas:
+                raise KeyError(f"Hoja no encontrada: {nombre}")
+            filas = self._hojas[nombre]
+            if celdas:
+                # "1:1", "A120:ZZ", "C2:E": filas y columnas (sin límite si no se indican)
+                ini, _, fin = celdas.partition(":")
+                (fila_ini, col_ini), (fila_fin, col_fin) = _partes_a1(ini), _partes_a1(fin or ini)
+                filas = filas[(fila_ini or 1) - 1:fila_fin]
+                if col_ini or col_fin:
+                    filas = [f[(col_ini or 1) - 1:col_fin] for f in filas]
+                    while filas and not any(v != "" for v in filas[-1]):
+                        filas = filas[:-1]      # Como la API: sin filas vacías al final
+            salida.append({"range": rango, "values": filas})
+        return {"valueRanges": salida}
+
+
+class ClienteLocal:
+    """
+    Imita la parte de gspread que usa la app (open / values_batch_get / worksheet / append_row).
+    libros: {libro: {hoja: DataFrame o lista de filas con encabezado}}
+    latencia: segundos simulados por cada llamada a la API.
+    """
+    def __init__(self, libros, latencia=0.0):
+        self._libros = {}
+        for libro, hojas in libros.items():
+            self._libros[libro] = {
+                hoja: ([list(df.columns)] + df.astype(str).values.tolist()) if isinstance(df, pd.DataFrame) else [list(f) for f in df]
+                for hoja, df in hojas.items()
+            }
+        self.latencia = latencia
+
+    def open(self, libro):
+        time.sleep(self.latencia)
+        if libro not in self._libros:
+            raise FileNotFoundError(f"Libro no encontrado: {libro}")
+        return _LibroLocal(self._libros[libro], self.latencia)
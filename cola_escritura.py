@@ -0,0 +1,239 @@
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:     # Windows: sin bloqueo entre procesos, todos usan el mismo journal
+    fcntl = None
+
+# ==========================================
+# COLA DE ESCRITURA (WRITE-BEHIND)
+# ==========================================
+# Los formularios encolan la fila y siguen; un hilo agrupa lo pendiente por
+# (libro, hoja) y lo envía con un solo append_rows. Todo se registra en un
+# journal JSONL para no perder filas si el proceso se reinicia. Cada proceso usa
+# su propio journal (ver reservar_journal): la compactación reescribe el archivo
+# completo y borraría las filas encoladas por otra réplica.
+
+PENDIENTE = "pendiente"
+CONFIRMADA = "confirmada"
+FALLIDA = "fallida"
+
+
+def es_limite_cuota(error):
+    """True si la API rechazó por cuota/límite de peticiones (HTTP 429)"""
+    codigo = getattr(error, "code", None)
+    if codigo is None and getattr(error, "response", None) is not None:
+        codigo = getattr(error.response, "status_code", None)
+    texto = str(error)
+    return codigo == 429 or "RATE_LIMIT" in texto or "Quota exceeded" in texto
+
+
+_reservados = {}    # {ruta journal: archivo .lock abierto} (el bloqueo dura lo que el proceso)
+
+
+def reservar_journal(carpeta, nombre="cola_escrituras"):
+    """
+    Retorna la ruta del journal de este proceso: el primer nombre.jsonl, nombre.1.jsonl, ...
+    cuyo .lock esté libre. Un proceso reiniciado retoma el de una réplica muerta y reenvía
+    lo que quedó pendiente en él.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    for n in itertools.count():
+        ruta = os.path.join(carpeta, f"{nombre}.jsonl" if n == 0 else f"{nombre}.{n}.jsonl")
+        if fcntl is None:
+            return ruta
+        if ruta in _reservados:
+            continue
+        f = open(ruta + ".lock", "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            continue
+        _reservados[ruta] = f
+        return ruta
+
+
+class ColaEscritura:
+    """
+    escribir(libro, hoja, filas) -> última fila escrita en Drive (o None)
+    al_confirmar(libro, hoja, filas_no_aplicadas, fila_final, pendientes_restantes):
+        se llama tras cada envío exitoso. filas_no_aplicadas son las que no se
+        aplicaron localmente al encolar (p. ej. recuperadas del journal).
+    al_fallar(libro, hoja): se llama si un lote se descarta por error permanente.
+    """
+    def __init__(self, escribir, journal, al_confirmar=None, al_fallar=None,
+                 ventana=1.0, backoff_inicial=2.0, backoff_max=64.0, max_reintentos=5, lote_maximo=5000):
+        self._escribir = escribir
+        self.journal = journal
+        self._al_confirmar = al_confirmar
+        self._al_fallar = al_fallar
+        self.ventana = ventana                  # Segundos para juntar filas antes de enviar
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+        self.max_reintentos = max_reintentos    # Para errores que NO son de cuota
+        self.lote_maximo = lote_maximo          # Filas por append_rows (cargas masivas)
+        self._pendientes = []                   # [{id, libro, hoja, fila, aplicada}] en orden
+        self._estados = {}                      # {id: estado} de las pendientes y fallidas (las confirmadas se olvidan)
+        self._lock = threading.Lock()
+        self._lock_journal = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._hilo = None
+        self.ultimo_error = None
+        self._recuperar_journal()
+
+    # --- API para la app ---
+    def encolar(self, libro, hoja, fila, aplicada=True):
+        """Registra la fila y retorna su id. aplicada=True si ya se mostró localmente."""
+        return self.encolar_lote(libro, hoja, [fila], aplicada)[0]
+
+    def encolar_lote(self, libro, hoja, filas, aplicada=True):
+        """Registra varias filas con una sola escritura del journal. Retorna sus ids."""
+        items = [{"id": uuid.uuid4().hex, "libro": libro, "hoja": hoja, "fila": list(f), "aplicada": aplicada}
+                 for f in filas]
+        # Journal y cola bajo el mismo candado: la compactación nunca ve uno sin el otro
+        with self._lock_journal:
+            self._anotar(*[{"op": "encolar", **{k: i[k] for k in ("id", "libro", "hoja", "fila")}} for i in items])
+            with self._lock:
+                self._pendientes.extend(items)
+                for i in items:
+                    self._estados[i["id"]] = PENDIENTE
+        self._hay_trabajo.set()
+        return [i["id"] for i in items]
+
+    def estado(self, id_escritura):
+        """PENDIENTE, FALLIDA o CONFIRMADA (un id que ya no está registrado se confirmó)"""
+        return self._estados.get(id_escritura, CONFIRMADA)
+
+    def pendientes(self, libro=None, hoja=None):
+        with self._lock:
+            return sum(1 for p in self._pendientes
+                       if libro is None or (p["libro"] == libro and p["hoja"] == hoja))
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._hilo = threading.Thread(target=self._bucle, name="cola-escritura", daemon=True)
+        self._hilo.start()
+        if self._pendientes:
+            self._hay_trabajo.set()
+
+    # --- Envío ---
+    def vaciar(self):
+        """
+        Envía todo lo pendiente, un append_rows por (libro, hoja) y cada lote_maximo filas.
+        Retorna filas confirmadas.
+        """
+        with self._lock:
+            lote = list(self._pendientes)
+        grupos = {}
+        for item in lote:
+            grupos.setdefault((item["libro"], item["hoja"]), []).append(item)
+        envios = [(clave, items[i:i + self.lote_maximo])
+                  for clave, items in grupos.items() for i in range(0, len(items), self.lote_maximo)]
+
+        confirmadas = 0
+        for (libro, hoja), items in envios:
+            fila_final = self._enviar_con_reintentos(libro, hoja, [i["fila"] for i in items])
+            ids = {i["id"] for i in items}
+            if fila_final is False:
+                estado = FALLIDA
+            else:
+                estado = CONFIRMADA
+                confirmadas += len(items)
+            with self._lock:
+                self._pendientes = [p for p in self._pendientes if p["id"] not in ids]
+                for i in ids:
+                    if estado == CONFIRMADA:
+                        self._estados.pop(i, None)
+                    else:
+                        self._estados[i] = estado
+                restantes = sum(1 for p in self._pendientes if p["libro"] == libro and p["hoja"] == hoja)
+            self._registrar({"op": estado, "ids": sorted(ids)})
+
+            if estado == CONFIRMADA and self._al_confirmar:
+                no_aplicadas = [i["fila"] for i in items if not i["aplicada"]]
+                self._al_confirmar(libro, hoja, no_aplicadas, fila_final, restantes)
+            elif estado == FALLIDA and self._al_fallar:
+                self._al_fallar(libro, hoja)
+
+        self._compactar_journal()
+        return confirmadas
+
+    def _enviar_con_reintentos(self, libro, hoja, filas):
+        espera = self.backoff_inicial
+        for intento in itertools.count(1):
+            try:
+                return self._escribir(libro, hoja, filas)
+            except Exception as e:
+                self.ultimo_error = str(e)
+                # La cuota se recupera sola: se reintenta siempre. Otros errores tienen tope.
+                if not es_limite_cuota(e) and intento >= self.max_reintentos:
+                    return False
+                time.sleep(espera)
+                espera = min(espera * 2, self.backoff_max)
+
+    def _bucle(self):
+        while True:
+            self._hay_trabajo.wait()
+            time.sleep(self.ventana)    # Ventana para juntar filas de varios usuarios
+            self._hay_trabajo.clear()
+            try:
+                self.vaciar()
+            except Exception as e:
+                self.ultimo_error = str(e)
+                time.sleep(1)
+            if self.pendientes():
+                self._hay_trabajo.set()
+
+    # --- Journal ---
+    def _registrar(self, evento):
+        with self._lock_journal:
+            self._anotar(evento)
+
+    def _anotar(self, *eventos):
+        if not self.journal:
+            return
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, default=str) + "\n" for e in eventos))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _recuperar_journal(self):
+        """Reencola lo que quedó pendiente en una ejecución anterior"""
+        if not self.journal:
+            return
+        os.makedirs(os.path.dirname(self.journal) or ".", exist_ok=True)
+        if not os.path.exists(self.journal):
+            return
+        pendientes = {}
+        with open(self.journal, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    evento = json.loads(linea)
+                except ValueError:
+                    continue    # Línea cortada por un corte abrupto
+                if evento.get("op") == "encolar":
+                    pendientes[evento["id"]] = {**{k: evento[k] for k in ("id", "libro", "hoja", "fila")}, "aplicada": False}
+                else:
+                    for i in evento.get("ids", []):
+                        pendientes.pop(i, None)
+        self._pendientes = list(pendientes.values())
+        self._estados = {i: PENDIENTE for i in pendientes}
+        self._compactar_journal()
+
+    def _compactar_journal(self):
+        """Reescribe el journal solo con lo pendiente (evita que crezca sin límite)"""
+        if not self.journal:
+            return
+        with self._lock_journal, self._lock:
+            temporal = self.journal + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                for p in self._pendientes:
+                    f.write(json.dumps({"op": "encolar", **{k: p[k] for k in ("id", "libro", "hoja", "fila")}}, default=str) + "\n")
+            os.replace(temporal, self.journal)
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# DIFERENCIAS ENTRE LA HOJA CARGADA Y LA EDITADA
+# ==========================================
+# Convención: el DataFrame cargado tiene índice 0..n-1 y la fila i vive en la fila i+2
+# del Excel (la fila 1 son los encabezados). st.data_editor conserva esas etiquetas en
+# las filas existentes y asigna etiquetas nuevas a las filas agregadas.
+
+
+def _columna_a1(n):
+    """1 -> A, 27 -> AA"""
+    letras = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        letras = chr(65 + r) + letras
+    return letras
+
+
+def _valor_celda(v):
+    """Valor serializable para la API (sin NaN ni tipos numpy)"""
+    if v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NA or v is pd.NaT:
+        return ""
+    if isinstance(v, (pd.Timestamp, np.datetime64)):
+        v = pd.Timestamp(v)
+        if pd.isna(v):
+            return ""
+        # Columnas tipadas como fecha: sin hora se escribe solo la fecha (como en el Excel)
+        return str(v.date()) if v == v.normalize() else str(v)
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def valores_api(df):
+    """Filas de df (con encabezados) listas para ws.update, sin tipos pandas/numpy"""
+    return [list(map(str, df.columns))] + [[_valor_celda(v) for v in fila] for fila in df.to_numpy(dtype=object)]
+
+
+def _normalizar(df):
+    # Vacíos (NaN / None / "") se comparan como iguales
+    return df.astype(object).where(df.notna(), "")
+
+
+def calcular_diff(original, editado):
+    """
+    Compara la hoja cargada con la editada.
+    Retorna dict con:
+      - celdas:      [(fila_excel, col_excel, valor)] que cambiaron
+      - insertadas:  DataFrame de filas nuevas (van al final)
+      - eliminadas:  [fila_excel] a borrar
+      - resultado:   DataFrame final con índice 0..n-1 (para publicarlo localmente)
+    Si las columnas no coinciden retorna None (no es posible un diff por celdas).
+    """
+    if list(original.columns) != list(editado.columns):
+        return None
+
+    comunes = editado.index[editado.index.isin(original.index)]
+    insertadas = editado.loc[~editado.index.isin(original.index)]
+    eliminadas = original.index[~original.index.isin(editado.index)]
+
+    celdas = []
+    if len(comunes):
+        a = _normalizar(original.loc[comunes])
+        b = _normalizar(editado.loc[comunes])
+        distintos = (a != b).to_numpy()
+        filas_pos, cols_pos = np.nonzero(distintos)
+        etiquetas = comunes.to_numpy()
+        valores = editado.loc[comunes].to_numpy(dtype=object)
+        for i, j in zip(filas_pos, cols_pos):
+            celdas.append((int(etiquetas[i]) + 2, int(j) + 1, _valor_celda(valores[i, j])))
+
+    resultado = pd.concat([editado.loc[comunes], insertadas]).reset_index(drop=True)
+    return {
+        "celdas": celdas,
+        "insertadas": insertadas,
+        "eliminadas": sorted(int(e) + 2 for e in eliminadas),
+        "resultado": resultado,
+    }
+
+
+def agrupar_rangos(celdas):
+    """
+    Une celdas contiguas de una misma fila en un rango (B5:D5) para el batch_update.
+    Retorna la lista data=[{"range", "values"}] que espera Worksheet.batch_update: los rangos
+    van sin la hoja porque gspread antepone el título de la pestaña.
+    """
+    data = []
+    por_fila = {}
+    for fila, col, valor in sorted(celdas):
+        por_fila.setdefault(fila, []).append((col, valor))
+
+    for fila, cols in por_fila.items():
+        tramos = []     # [[col_inicio, col_fin, [valores]]]
+        for col, valor in cols:
+            if tramos and col == tramos[-1][1] + 1:
+                tramos[-1][1] = col
+                tramos[-1][2].append(valor)
+            else:
+                tramos.append([col, col, [valor]])
+        for ini, fin, valores in tramos:
+            rango = f"{_columna_a1(ini)}{fila}"
+            if fin != ini:
+                rango += f":{_columna_a1(fin)}{fila}"
+            data.append({"range": rango, "values": [valores]})
+    return data
+
+
+def rango_columna(col, valores, fila_inicial=2):
+    """
+    Una columna completa como un solo rango (E2:E5000) para ws.batch_update:
+    reescribir un estado en toda la historia cuesta una llamada, no una por celda.
+    """
+    letra = _columna_a1(col)
+    rango = f"{letra}{fila_inicial}:{letra}{fila_inicial + len(valores) - 1}"
+    return [{"range": rango, "values": [[_valor_celda(v)] for v in valores]}]
+
+
+def rangos_columna(col, previos, valores, fila_inicial=2):
+    """
+    Rangos para escribir una columna recalculada: solo las celdas que cambiaron respecto a
+    'previos' (agrupar_rangos), o la columna entera en un rango si cambió la mayoría de las filas.
+    """
+    previos, valores = pd.Series(np.asarray(previos, dtype=object)), pd.Series(np.asarray(valores, dtype=object))
+    cambiadas = np.flatnonzero((_normalizar(previos) != _normalizar(valores)).to_numpy())
+    if 2 * len(cambiadas) > len(valores):
+        return rango_columna(col, valores.tolist(), fila_inicial)
+    return agrupar_rangos([(int(i) + fila_inicial, col, _valor_celda(valores.iat[i])) for i in cambiadas])
+
+
+def _bloques_contiguos(filas):
+    """[5, 6, 7, 10] -> [(5, 7), (10, 10)] (de abajo hacia arriba para borrar sin desfasar)"""
+    bloques = []
+    for f in sorted(filas):
+        if bloques and f == bloques[-1][1] + 1:
+            bloques[-1] = (bloques[-1][0], f)
+        else:
+            bloques.append((f, f))
+    return list(reversed(bloques))
+
+
+def aplicar_diff(almacenamiento, libro, hoja, diff):
+    """
+    Envía el diff a la hoja en a lo sumo tres llamadas al almacenamiento:
+      1. actualizar_rangos con las celdas cambiadas (posiciones previas al borrado)
+      2. borrar_filas con todas las filas eliminadas (Drive: un batchUpdate de abajo hacia arriba)
+      3. anexar_filas con las filas nuevas
+    Retorna el resumen {celdas, rangos, insertadas, eliminadas}.
+    """
+    data = agrupar_rangos(diff["celdas"])
+    if data:
+        almacenamiento.actualizar_rangos(libro, hoja, data)
+
+    if diff["eliminadas"]:
+        almacenamiento.borrar_filas(libro, hoja, diff["eliminadas"])
+
+    insertadas = diff["insertadas"]
+    if len(insertadas):
+        filas = [[_valor_celda(v) for v in fila] for fila in insertadas.to_numpy(dtype=object)]
+        almacenamiento.anexar_filas(libro, hoja, filas)
+
+    return {
+        "celdas": len(diff["celdas"]),
+        "rangos": len(data),
+        "insertadas": len(insertadas),
+        "eliminadas": len(diff["eliminadas"]),
+    }
@@ -0,0 +1,128 @@
+import pandas as pd
+
+from carga_datos import ACTIVOS, MATERIALES, BOM, ORDENES, LECTURAS, LIMITES
+from lecturas import parsear_fechas
+
+# ==========================================
+# ESQUEMA DECLARADO POR HOJA
+# ==========================================
+# get_all_records / values_batch_get entregan todo como texto u object. Al cargar, cada
+# columna declarada se convierte una vez a su tipo compacto:
+#   texto     -> str            (valores casi únicos: TAG, SKU, descripciones)
+#   categoria -> category       (pocos valores que se repiten: Nivel, Estado_OT, ID_Punto...)
+#   entero    -> Int64          (admite celdas vacías)
+#   decimal   -> float64
+#   fecha     -> datetime64[ns]
+# Las columnas no declaradas quedan como llegaron; las declaradas que la hoja no tenga se ignoran.
+TEXTO, CATEGORIA, ENTERO, DECIMAL, FECHA = "texto", "categoria", "entero", "decimal", "fecha"
+
+ESQUEMAS = {
+    ACTIVOS: {
+        "ID": ENTERO, "TAG": TEXTO, "Nombre": TEXTO, "Nivel": CATEGORIA, "TAG_Padre": CATEGORIA,
+        "Area": CATEGORIA, "Criticidad": CATEGORIA, "Estado": CATEGORIA, "Especificacion_Tecnica": TEXTO,
+        "Centro_Costo": CATEGORIA, "Fecha_Instalacion": FECHA,
+    },
+    MATERIALES: {"SKU": TEXTO, "Descripcion": TEXTO, "Unidad": CATEGORIA, "Stock": DECIMAL},
+    BOM: {"TAG_Equipo": CATEGORIA, "SKU_Material": CATEGORIA, "Cantidad": DECIMAL, "Observacion": TEXTO},
+    ORDENES: {
+        "ID_OT": ENTERO, "ID_Aviso_Vinculado": ENTERO, "TAG_Equipo": CATEGORIA, "Descripcion_Trabajo": TEXTO,
+        "Tipo_Mtto": CATEGORIA, "Fecha_Programada": FECHA, "Fecha_Inicio_Real": FECHA, "Fecha_Fin_Real": FECHA,
+        "Estado_OT": CATEGORIA, "Tipo_Proveedor": CATEGORIA,
+    },
+    LECTURAS: {
+        "Fecha_Lectura": FECHA, "ID_Punto": CATEGORIA, "Valor_Medido": DECIMAL,
+        "Inspector": CATEGORIA, "Estado": CATEGORIA,
+    },
+    LIMITES: {"ID_Punto": TEXTO, "Alerta": DECIMAL, "Disparo": DECIMAL, "Tasa_Max": DECIMAL},
+}
+
+# Sin estas columnas la app no puede usar la hoja (si la hoja tiene datos)
+OBLIGATORIAS = {ACTIVOS: ["TAG"], MATERIALES: ["SKU"], LECTURAS: ["ID_Punto"]}
+
+# Fracción de celdas no vacías ilegibles desde la cual la columna se considera mal formada.
+# Por debajo, esas celdas quedan vacías (NaN / NaT) y se cuentan en el informe.
+TOLERANCIA = 0.2
+
+
+class ErrorEsquema(ValueError):
+    """Hoja con columnas obligatorias ausentes o columnas que no respetan su tipo"""
+
+
+def memoria_mb(df):
+    return float(df.memory_usage(deep=True).sum()) / 1e6
+
+
+def _ya_tipada(serie, tipo):
+    if tipo == FECHA:
+        return pd.api.types.is_datetime64_any_dtype(serie)
+    if tipo == DECIMAL:
+        return pd.api.types.is_float_dtype(serie)
+    if tipo == ENTERO:
+        return serie.dtype == "Int64"
+    if tipo == CATEGORIA:
+        return isinstance(serie.dtype, pd.CategoricalDtype)
+    return isinstance(serie.dtype, pd.StringDtype)
+
+
+def _convertir(serie, tipo):
+    """(serie convertida, máscara de celdas con dato que no se pudieron convertir)"""
+    if _ya_tipada(serie, tipo):
+        return serie, None
+    if tipo == TEXTO:
+        return serie.astype(str), None
+
+    vacias = serie.isna() | (serie.astype(str).str.strip() == "")
+    datos = serie.mask(vacias)
+    if tipo == FECHA:
+        nueva = parsear_fechas(datos).astype("datetime64[ns]")
+    elif tipo == CATEGORIA:
+        nueva = datos.astype(str).mask(vacias).astype("category")
+    else:
+        nueva = pd.to_numeric(datos, errors="coerce").astype(float)
+        if tipo == ENTERO:
+            nueva = nueva.mask(nueva % 1 != 0).astype("Int64")    # 1.5 no es un entero válido
+    return nueva, nueva.isna() & ~vacias
+
+
+def aplicar_esquema(clave, df, estricto=True):
+    """
+    Tipa las columnas declaradas de la hoja 'clave' (libro, hoja) en una pasada.
+    Retorna (df_tipado, informe) con informe = {filas, mb_antes, mb_despues, invalidas: {col: n}}.
+    estricto: una columna obligatoria ausente o una columna mayormente ilegible lanza
+    ErrorEsquema (la hoja no se publica); si no, esas celdas quedan vacías.
+    """
+    esquema = ESQUEMAS.get(clave, {})
+    nombre = "/".join(clave)
+    problemas = []
+    if estricto and len(df.columns):
+        faltan = [c for c in OBLIGATORIAS.get(clave, []) if c not in df.columns]
+        if faltan:
+            problemas.append(f"faltan las columnas {', '.join(faltan)}")
+
+    convertidas, invalidas = {}, {}
+    for col, tipo in esquema.items():
+        if col not in df.columns:
+            continue
+        nueva, malas = _convertir(df[col], tipo)
+        convertidas[col] = nueva
+        n_malas = int(malas.sum()) if malas is not None else 0
+        if not n_malas:
+            continue
+        invalidas[col] = n_malas
+        con_dato = n_malas + int(nueva.notna().sum())
+        if estricto and n_malas > TOLERANCIA * con_dato:
+            ejemplos = ", ".join(repr(v) for v in pd.unique(df[col][malas].astype(str))[:3])
+            problemas.append(f"'{col}' no es {tipo} ({n_malas} de {con_dato} celdas, p. ej. {ejemplos})")
+
+    if problemas:
+        raise ErrorEsquema(f"{nombre}: " + "; ".join(problemas))
+
+    tipado = df.assign(**convertidas) if convertidas else df
+    informe = {"filas": len(df), "mb_antes": memoria_mb(df), "mb_despues": memoria_mb(tipado), "invalidas": invalidas}
+    return tipado, informe
+
+
+def sin_categorias(df):
+    """Copia para st.data_editor: las categorías pasan a texto libre (se pueden escribir valores nuevos)"""
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.assign(**{c: df[c].astype(object) for c in cats}) if cats else df
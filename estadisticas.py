@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lecturas import parsear_lecturas, huellas_lecturas
+
+# ==========================================
+# ESTADÍSTICAS MÓVILES POR PUNTO (INCREMENTALES)
+# ==========================================
+VENTANA = 30        # Lecturas en la media / desviación móvil
+ALFA = 0.1          # Suavizado del EWMA (peso de la lectura nueva)
+Z_ANOMALIA = 3.0    # |z| desde el cual la última lectura se marca como anómala
+
+COLUMNAS = ["tag", "n", "ultima_fecha", "ultimo_valor", "media", "desv", "ewma", "ewm_desv", "z", "anomalia"]
+
+
+def _z(valor, previos):
+    """z de una lectura contra las lecturas anteriores del mismo punto (ventana móvil)"""
+    if len(previos) < 2:
+        return 0.0
+    desv = np.std(previos, ddof=1)
+    return float((valor - np.mean(previos)) / desv) if desv > 0 else 0.0
+
+
+def _resumen_ventana(ventana):
+    return float(np.mean(ventana)), float(np.std(ventana, ddof=1)) if len(ventana) > 1 else 0.0
+
+
+def _avanzar(previo, ventana, tag, valores, fechas):
+    """Incorpora lecturas (ordenadas por fecha) al estado de un punto. Retorna (fila, ventana)."""
+    if previo is None:
+        n, ewma, var, z = 0, np.nan, 0.0, 0.0
+    else:
+        n, ewma, var, z = int(previo["n"]), previo["ewma"], previo["ewm_desv"] ** 2, previo["z"]
+    buf = list(ventana)
+    for x in valores:
+        z = _z(x, buf[-VENTANA:])
+        if n == 0:
+            ewma, var = x, 0.0
+        else:
+            # EWMA y su varianza (misma recursión que pandas ewm(adjust=False))
+            d = x - ewma
+            ewma += ALFA * d
+            var = (1 - ALFA) * (var + d * ALFA * d)
+        buf.append(x)
+        n += 1
+    buf = np.asarray(buf[-VENTANA:], dtype=float)
+    media, desv = _resumen_ventana(buf)
+    fila = {"tag": tag, "n": n, "ultima_fecha": fechas[-1], "ultimo_valor": float(valores[-1]),
+            "media": media, "desv": desv, "ewma": float(ewma), "ewm_desv": float(np.sqrt(var)),
+            "z": z, "anomalia": abs(z) >= Z_ANOMALIA}
+    return fila, buf
+
+
+class EstadisticasPuntos:
+    """
+    Estado pequeño por ID_Punto: últimas VENTANA lecturas, media y desviación móvil,
+    EWMA con su desviación y el z de la última lectura frente a las anteriores.
+    Se pone al día solo con las filas nuevas de LECTURAS (nunca recorre la historia en un rerun).
+      - filas:  cuántas filas de LECTURAS ya están incorporadas
+      - huella: hash de punto, fecha y valor de esas filas (detecta lecturas editadas o borradas)
+    """
+    def __init__(self, estado, ventanas, filas, huella):
+        self.estado = estado
+        self.ventanas = ventanas
+        self.filas = filas
+        self.huella = huella
+        # Ranking "peores ahora": un activo por fila, ordenado por |z| de su peor punto
+        self.ranking = (estado.assign(abs_z=estado["z"].abs())
+                        .sort_values(["anomalia", "abs_z"], ascending=False)
+                        .drop_duplicates("tag")
+                        .drop(columns="abs_z"))
+
+    @staticmethod
+    def _huella(huellas):
+        """Resumen de huellas_lecturas de las filas incorporadas (se guarda junto al estado)"""
+        return hashlib.blake2b(huellas.tobytes(), digest_size=16).hexdigest()
+
+    # --- Construcción completa (una vez por proceso) ---
+    @classmethod
+    def desde_indice(cls, indice, df_lecturas):
+        """Estado inicial a partir de IndiceLecturas, con operaciones por grupo de pandas"""
+        datos = indice.datos[indice.datos["valor"].notna()]
+        if datos.empty:
+            return cls(pd.DataFrame(columns=COLUMNAS), {}, len(df_lecturas), cls._huella(huellas_lecturas(df_lecturas)))
+
+        grupos = datos.groupby("ID_Punto", sort=False)
+        ewm = grupos["valor"].ewm(alpha=ALFA, adjust=False)
+        ewma = ewm.mean().groupby(level=0).last()
+        ewm_desv = np.sqrt(ewm.var(bias=True).groupby(level=0).last().fillna(0.0))
+
+        ventanas, zs = {}, {}
+        for punto, valores in grupos.tail(VENTANA + 1).groupby("ID_Punto", sort=False)["valor"]:
+            v = valores.to_numpy(dtype=float)
+            zs[punto] = _z(v[-1], v[:-1])
+            ventanas[punto] = v[-VENTANA:]
+        resumen = pd.DataFrame([_resumen_ventana(v) for v in ventanas.values()],
+                               index=list(ventanas), columns=["media", "desv"])
+
+        ultimas = grupos.tail(1).set_index("ID_Punto")
+        z = pd.Series(zs)
+        estado = pd.DataFrame({
+            "tag": ultimas["tag"], "n": grupos.size(),
+            "ultima_fecha": ultimas["fecha"], "ultimo_valor": ultimas["valor"],
+            "media": resumen["media"], "desv": resumen["desv"],
+            "ewma": ewma, "ewm_desv": ewm_desv, "z": z, "anomalia": z.abs() >= Z_ANOMALIA,
+        }, columns=COLUMNAS)
+        return cls(estado, ventanas, len(df_lecturas), cls._huella(huellas_lecturas(df_lecturas)))
+
+    # --- Actualización incremental ---
+    def con_filas_nuevas(self, df_lecturas, indice):
+        """
+        Incorpora solo las filas posteriores a self.filas. Una lectura más antigua que la
+        última de su punto (carga atrasada) recalcula ese punto con su serie del índice.
+        Retorna None si la hoja cambió de otra forma (reconstruir).
+        """
+        n = self.filas
+        if len(df_lecturas) < n:
+            return None
+        huellas = huellas_lecturas(df_lecturas)
+        if self._huella(huellas[:n]) != self.huella:
+            return None
+        if len(df_lecturas) == n:
+            return self
+
+        nuevas = parsear_lecturas(df_lecturas, desde_fila=n)
+        nuevas = (nuevas[nuevas["valor"].notna() & nuevas["fecha"].notna()]
+                  .sort_values(["ID_Punto", "fecha"], kind="mergesort"))
+        filas, ventanas = {}, dict(self.ventanas)
+        for punto, grupo in nuevas.groupby("ID_Punto", sort=False):
+            previo = self.estado.loc[punto] if punto in self.estado.index else None
+            tag = grupo["tag"].iloc[0]
+            if previo is not None and grupo["fecha"].iloc[0] < previo["ultima_fecha"]:
+                serie = indice.serie(tag, grupo["variable"].iloc[0])
+                grupo = serie[(serie["ID_Punto"] == punto) & serie["valor"].notna()]
+                previo, ventanas[punto] = None, []
+            filas[punto], ventanas[punto] = _avanzar(previo, ventanas.get(punto, []), tag,
+                                                     grupo["valor"].to_numpy(dtype=float), grupo["fecha"].to_numpy())
+
+        cambios = pd.DataFrame.from_dict(filas, orient="index", columns=COLUMNAS)
+        estado = pd.concat([self.estado.drop(index=list(filas), errors="ignore"), cambios]) if len(self.estado) else cambios
+        return EstadisticasPuntos(estado, ventanas, len(df_lecturas), self._huella(huellas))
+
+    # --- Consultas ---
+    def peores(self, k=10, solo_tags=None):
+        """Los k activos con la lectura más anómala ahora (ranking ya ordenado)"""
+        ranking = self.ranking if solo_tags is None else self.ranking[self.ranking["tag"].isin(solo_tags)]
+        return ranking.head(k)
+
+    # --- Persistencia junto al snapshot (datos_locales) ---
+    def guardar(self, ruta):
+        tabla = self.estado.rename_axis("ID_Punto").reset_index()
+        tabla["ventana"] = [list(self.ventanas.get(p, [])) for p in tabla["ID_Punto"]]
+        tabla = pa.Table.from_pandas(tabla, preserve_index=False).replace_schema_metadata(
+            {"filas": str(self.filas), "huella": self.huella})
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        # Varias réplicas (y varias sesiones del mismo proceso) pueden guardar a la vez
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(tabla, temporal)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Estado guardado por una ejecución anterior, o None"""
+        try:
+            tabla = pq.read_table(ruta)
+        except (OSError, pa.ArrowException):
+            return None
+        meta = {k.decode(): v.decode() for k, v in (tabla.schema.metadata or {}).items()}
+        df = tabla.to_pandas().set_index("ID_Punto")
+        ventanas = {p: np.asarray(v, dtype=float) for p, v in df.pop("ventana").items()}
+        return cls(df.reindex(columns=COLUMNAS), ventanas, int(meta.get("filas", 0)), meta.get("huella", ""))
@@ -0,0 +1,229 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import ACTIVOS, MATERIALES, BOM, ORDENES, LECTURAS, LIMITES, HOJAS
+from alarmas import COLUMNAS_LIMITES, LIMITES_DEFECTO
+
+# ==========================================
+# PLANTA SINTÉTICA (PRUEBAS DE ESCALA)
+# ==========================================
+# Genera las seis hojas con la misma forma que las reales:
+#   plantas × áreas × equipos × sistemas × componentes en ACTIVOS (niveles L2..L6),
+#   MATERIALES, BOM por componente, ORDENES sobre equipos/sistemas/componentes,
+#   LECTURAS de varios años (VIB y TEM por componente, AMP en motores) y LIMITES.
+# Con la misma semilla el resultado es idéntico (para comparar corridas de benchmark).
+AREAS = ["DIG", "PREN", "SEC", "MOL", "CAL", "EMP", "TRT", "SRV"]
+COMPONENTES = ["MTR", "RED", "ROD-A", "ROD-B", "ACP", "BBA", "VAL", "SEN"]
+NOMBRES_AREA = {"DIG": "Digestores", "PREN": "Prensado", "SEC": "Secado", "MOL": "Molienda",
+                "CAL": "Calderos", "EMP": "Empaque", "TRT": "Tratamiento de efluentes", "SRV": "Servicios"}
+NOMBRES_COMPONENTE = {"MTR": "Motor eléctrico", "RED": "Reductor", "ROD-A": "Chumacera lado carga",
+                      "ROD-B": "Chumacera lado libre", "ACP": "Acoplamiento", "BBA": "Bomba de lubricación",
+                      "VAL": "Válvula de alivio", "SEN": "Sensor de nivel"}
+ESPECIFICACIONES = ["Capacidad 5 Ton/h", "Vapor indirecto 8 bar", "75HP 1800RPM 440V", "Rodamiento SKF 22522",
+                    "Acero inoxidable 316L", "Sello mecánico doble", "Lubricación ISO VG 220", "IP55 clase F"]
+MATERIALES_BASE = [("Rodamiento", "UN"), ("Faja", "UN"), ("Sello mecánico", "UN"), ("Aceite", "L"),
+                   ("Grasa", "KG"), ("Perno", "UN"), ("Empaquetadura", "M"), ("Filtro", "UN")]
+TIPOS_MTTO = ["Preventivo", "Correctivo", "Predictivo"]
+ESTADOS_OT = ["Abierta", "En Proceso", "Cerrada", "Finalizada"]
+# Valor típico y dispersión de cada variable (para que las alarmas por defecto salten poco)
+PERFIL_VARIABLE = {"VIB": (2.5, 0.6), "TEM": (60.0, 6.0), "AMP": (90.0, 8.0)}
+
+
+def _codigos(base, n):
+    """Los n primeros códigos de la lista; si no alcanzan, se numeran (MTR, ..., SEN, C09, C10)"""
+    return [base[i] if i < len(base) else f"C{i + 1:02d}" for i in range(n)]
+
+
+def _texto(rng, piezas, n, minimo=2, maximo=4):
+    """n textos de 'minimo' a 'maximo' piezas al azar (columnas de texto ancho)"""
+    largos = rng.integers(minimo, maximo + 1, n)
+    elegidas = rng.integers(0, len(piezas), (n, maximo))
+    return [", ".join(piezas[j] for j in fila[:k]) for fila, k in zip(elegidas, largos)]
+
+
+def generar_activos(rng, plantas, areas, equipos, sistemas, componentes, inicio):
+    filas = []
+    for p in range(1, plantas + 1):
+        tag_pl = f"PL-{p:02d}"
+        filas.append((tag_pl, f"Planta {p}", "L2-Planta", "ROOT", "", "A"))
+        for cod in _codigos(AREAS, areas):
+            tag_ar = f"AR-{p:02d}-{cod}"
+            filas.append((tag_ar, NOMBRES_AREA.get(cod, f"Área {cod}"), "L3-Area", tag_pl, tag_ar, "A"))
+            for e in range(1, equipos + 1):
+                tag_eq = f"EQ-{p:02d}-{cod}-{e:02d}"
+                filas.append((tag_eq, f"{NOMBRES_AREA.get(cod, cod)} #{e}", "L4-Equipo", tag_ar, tag_ar, "A"))
+                for s in range(1, sistemas + 1):
+                    tag_sis = f"{tag_eq}-S{s}"
+                    filas.append((tag_sis, f"Sistema {s}", "L5-Sistema", tag_eq, tag_ar, "B"))
+                    for c in _codigos(COMPONENTES, componentes):
+                        filas.append((f"{tag_sis}-{c}", NOMBRES_COMPONENTE.get(c, f"Componente {c}"),
+                                      "L6-Componente", tag_sis, tag_ar, "C"))
+
+    df = pd.DataFrame(filas, columns=["TAG", "Nombre", "Nivel", "TAG_Padre", "Area", "Criticidad"])
+    n = len(df)
+    df.insert(0, "ID", np.arange(1, n + 1))
+    df["Estado"] = np.where(rng.random(n) < 0.95, "Operativo", "Fuera de servicio")
+    df["Especificacion_Tecnica"] = _texto(rng, ESPECIFICACIONES, n)
+    df["Centro_Costo"] = np.where(df["Area"] == "", "", "CC-" + df["Area"].str[-3:])
+    df["Fecha_Instalacion"] = (inicio - pd.to_timedelta(rng.integers(0, 3650, n), unit="D")).strftime("%Y-%m-%d")
+    return df
+
+
+def generar_materiales(rng, n):
+    base = rng.integers(0, len(MATERIALES_BASE), n)
+    return pd.DataFrame({
+        "SKU": [str(100000 + i) for i in range(n)],
+        "Descripcion": [f"{MATERIALES_BASE[b][0]} {m}" for b, m in zip(base, rng.integers(100, 99999, n))],
+        "Unidad": [MATERIALES_BASE[b][1] for b in base],
+        "Stock": rng.integers(0, 200, n),
+    })
+
+
+def generar_bom(rng, df_activos, df_mat, por_componente):
+    comps = df_activos.loc[df_activos["Nivel"] == "L6-Componente", "TAG"].to_numpy()
+    n = len(comps) * por_componente
+    return pd.DataFrame({
+        "TAG_Equipo": np.repeat(comps, por_componente),
+        "SKU_Material": df_mat["SKU"].to_numpy()[rng.integers(0, len(df_mat), n)] if len(df_mat) else "",
+        "Cantidad": rng.integers(1, 9, n),
+        "Observacion": np.where(rng.random(n) < 0.3, "Cambio cada 6 meses", ""),
+    })
+
+
+def generar_ordenes(rng, df_activos, por_equipo, inicio, dias):
+    equipos = df_activos.loc[df_activos["Nivel"] == "L4-Equipo", "TAG"].to_numpy()
+    candidatos = df_activos.loc[df_activos["Nivel"].isin(["L4-Equipo", "L5-Sistema", "L6-Componente"]), "TAG"].to_numpy()
+    n = len(equipos) * por_equipo
+    programada = inicio + pd.to_timedelta(rng.integers(0, max(dias, 1), n), unit="D")
+    estado = np.array(ESTADOS_OT)[rng.choice(len(ESTADOS_OT), n, p=[0.1, 0.05, 0.45, 0.4])]
+    iniciada = estado != "Abierta"
+    cerrada = np.isin(estado, ["Cerrada", "Finalizada"])
+    inicio_real = programada + pd.to_timedelta(rng.integers(0, 3, n), unit="D")
+    fin_real = inicio_real + pd.to_timedelta(rng.integers(0, 5, n), unit="D")
+    return pd.DataFrame({
+        "ID_OT": np.arange(5000, 5000 + n),
+        "ID_Aviso_Vinculado": "",
+        "TAG_Equipo": candidatos[rng.integers(0, len(candidatos), n)] if len(candidatos) else "",
+        "Descripcion_Trabajo": _texto(rng, ["Cambio de rodamiento", "Inspección termográfica", "Ajuste de fajas",
+                                            "Lubricación general", "Alineamiento láser", "Reparación de fuga",
+                                            "Cambio de sello", "Limpieza de intercambiador"], n, 1, 3),
+        "Tipo_Mtto": np.array(TIPOS_MTTO)[rng.integers(0, len(TIPOS_MTTO), n)],
+        "Fecha_Programada": programada.strftime("%Y-%m-%d"),
+        "Fecha_Inicio_Real": np.where(iniciada, inicio_real.strftime("%Y-%m-%d"), ""),
+        "Fecha_Fin_Real": np.where(cerrada, fin_real.strftime("%Y-%m-%d"), ""),
+        "Estado_OT": estado,
+        "Tipo_Proveedor": np.where(rng.random(n) < 0.8, "Interno", "Externo"),
+    })
+
+
+def puntos_de_medicion(df_activos):
+    """ID_Punto de cada componente: VIB y TEM; los motores además AMP"""
+    comps = df_activos.loc[df_activos["Nivel"] == "L6-Componente", "TAG"]
+    puntos = [f"PM-{t}-{v}" for t in comps for v in ("VIB", "TEM")]
+    puntos += [f"PM-{t}-AMP" for t in comps if t.endswith("-MTR")]
+    return sorted(puntos)
+
+
+def generar_lecturas(rng, puntos, inicio, dias, por_dia):
+    """
+    Ronda de todos los puntos 'por_dia' veces al día durante 'dias' días, en orden
+    cronológico (como se registran). Cada punto oscila alrededor de su valor típico
+    con una deriva lenta, así las tendencias y estadísticas tienen forma.
+    """
+    if not puntos or not dias or not por_dia:
+        return pd.DataFrame(columns=["Fecha_Lectura", "ID_Punto", "Valor_Medido", "Inspector", "Estado"])
+    n_p, n_t = len(puntos), dias * por_dia
+    variables = np.array([p.rsplit("-", 1)[1] for p in puntos])
+    media = np.array([PERFIL_VARIABLE[v][0] for v in variables]) * rng.uniform(0.8, 1.1, n_p)
+    dispersion = np.array([PERFIL_VARIABLE[v][1] for v in variables])
+
+    rondas = inicio + pd.to_timedelta(np.arange(n_t) * (86400 // por_dia), unit="s")
+    # Segundos que tarda el inspector en llegar a cada punto dentro de la ronda
+    desfase = pd.to_timedelta(np.arange(n_p) * max(1, (86400 // por_dia) // (n_p + 1)), unit="s")
+    fechas = (np.repeat(rondas.to_numpy(), n_p) + np.tile(desfase.to_numpy(), n_t)).astype("datetime64[s]")
+    deriva = np.sin(np.linspace(0, 6 * np.pi, n_t))[:, None] * dispersion
+    valores = (media + deriva + rng.normal(0, 1, (n_t, n_p)) * dispersion).ravel().round(2)
+
+    return pd.DataFrame({
+        "Fecha_Lectura": fechas,
+        "ID_Punto": np.tile(np.array(puntos, dtype=object), n_t),
+        "Valor_Medido": valores,
+        "Inspector": np.array(["Ronda A", "Ronda B", "Ronda C"], dtype=object)[np.arange(n_t * n_p) // n_p % 3],
+        "Estado": "Registrado",
+    })
+
+
+def generar_limites(rng, puntos, fraccion=0.2):
+    """Límites propios para una fracción de los puntos (el resto usa los de su variable)"""
+    elegidos = [p for p, r in zip(puntos, rng.random(len(puntos))) if r < fraccion]
+    filas = []
+    for p in elegidos:
+        alerta, disparo, tasa = LIMITES_DEFECTO.get(p.rsplit("-", 1)[1], (np.nan,) * 3)
+        if np.isnan(alerta):
+            alerta, disparo, tasa = 110.0, 125.0, 20.0
+        filas.append((p, round(alerta * 1.1, 2), round(disparo * 1.1, 2), tasa))
+    return pd.DataFrame(filas, columns=COLUMNAS_LIMITES)
+
+
+def generar_planta(plantas=1, areas=3, equipos=10, sistemas=2, componentes=4, materiales=500,
+                   bom_por_componente=2, ots_por_equipo=20, anos=1, lecturas_por_dia=2,
+                   inicio="2023-01-01", semilla=0):
+    """
+    Retorna {(libro, hoja): DataFrame} con las seis hojas de la app.
+    Tamaño: plantas·areas·equipos·(1 + sistemas·(1 + componentes)) activos y
+    ~componentes_totales·2.2·365·anos·lecturas_por_dia lecturas.
+    """
+    rng = np.random.default_rng(semilla)
+    inicio = pd.Timestamp(inicio)
+    dias = int(round(365 * anos))
+
+    df_act = generar_activos(rng, plantas, areas, equipos, sistemas, componentes, inicio)
+    df_mat = generar_materiales(rng, materiales)
+    puntos = puntos_de_medicion(df_act)
+    return {
+        ACTIVOS: df_act,
+        MATERIALES: df_mat,
+        BOM: generar_bom(rng, df_act, df_mat, bom_por_componente),
+        ORDENES: generar_ordenes(rng, df_act, ots_por_equipo, inicio, dias),
+        LECTURAS: generar_lecturas(rng, puntos, inicio, dias, lecturas_por_dia),
+        LIMITES: generar_limites(rng, puntos),
+    }
+
+
+def a_libros(tablas):
+    """{(libro, hoja): df} -> {libro: {hoja: df}} (formato de ClienteLocal)"""
+    libros = {}
+    for (libro, hoja), df in tablas.items():
+        libros.setdefault(libro, {})[hoja] = df
+    return libros
+
+
+def volcar(tablas, almacenamiento):
+    """Escribe las hojas generadas en un almacenamiento (p. ej. AlmacenamientoSQLite)"""
+    for (libro, hoja), df in tablas.items():
+        almacenamiento.importar(libro, hoja, df)
+
+
+def resumen(tablas):
+    return ", ".join(f"{hoja}: {len(tablas[(libro, hoja)]):,}" for libro, hoja in HOJAS if (libro, hoja) in tablas)
+
+
+if __name__ == "__main__":
+    # python generador_planta.py datos_locales/planta.db --plantas 2 --anos 3
+    from almacenamiento import AlmacenamientoSQLite
+
+    parser = argparse.ArgumentParser(description="Genera una planta sintética en un archivo SQLite")
+    parser.add_argument("ruta", help="Archivo .db de destino (se reemplazan sus hojas)")
+    for nombre, defecto in [("plantas", 1), ("areas", 3), ("equipos", 10), ("sistemas", 2), ("componentes", 4),
+                            ("materiales", 500), ("bom_por_componente", 2), ("ots_por_equipo", 20),
+                            ("lecturas_por_dia", 2), ("semilla", 0)]:
+        parser.add_argument(f"--{nombre}", type=int, default=defecto)
+    parser.add_argument("--anos", type=float, default=1)
+    args = vars(parser.parse_args())
+    ruta = args.pop("ruta")
+
+    tablas = generar_planta(**args)
+    volcar(tablas, AlmacenamientoSQLite(ruta))
+    print(f"{ruta}: {resumen(tablas)}")
@@ -8,75 +8,104 @@ import random
 st.set_page_config(page_title="Gestor Activos Rendering", layout="wide", page_icon="🏭")
 
 # --- FUNCIÓN GENERADORA DE EJEMPLO (TU SOLICITUD DE LOS 9 DIGESTORES) ---
-def inicializar_data_ejemplo():
+# Versión de los datos base: cambiarla publica una base nueva para todas las sesiones
+VERSION_DATOS = 1
+
+@st.cache_resource
+def base_compartida(version):
     """
-    Si no hay datos, crea la estructura completa para la Planta de Rendering,
-    específicamente el Área de Digestores con sus 9 equipos y componentes.
+    Crea UNA vez por proceso (y por versión) la estructura completa para la Planta de
+    Rendering, específicamente el Área de Digestores con sus 9 equipos y componentes.
+    Todas las sesiones leen estas mismas tablas y nunca las modifican: las altas de cada
+    sesión se guardan aparte (ver altas_activos / altas_bom).
     """
-    if 'df_activos' not in st.session_state:
-        # 1. Niveles Superiores
-        data = [
-            {"ID": 1, "TAG": "PL-01", "Nombre": "Planta Rendering Principal", "Nivel": "L2-Planta", "TAG_Padre": "ROOT"},
-            {"ID": 2, "TAG": "AR-DIG", "Nombre": "Área de Cocción (Digestores)", "Nivel": "L3-Area", "TAG_Padre": "PL-01"},
-            {"ID": 3, "TAG": "AR-PREN", "Nombre": "Área de Prensado", "Nivel": "L3-Area", "TAG_Padre": "PL-01"},
-        ]
+    # 1. Niveles Superiores
+    data = [
+        {"ID": 1, "TAG": "PL-01", "Nombre": "Planta Rendering Principal", "Nivel": "L2-Planta", "TAG_Padre": "ROOT"},
+        {"ID": 2, "TAG": "AR-DIG", "Nombre": "Área de Cocción (Digestores)", "Nivel": "L3-Area", "TAG_Padre": "PL-01"},
+        {"ID": 3, "TAG": "AR-PREN", "Nombre": "Área de Prensado", "Nivel": "L3-Area", "TAG_Padre": "PL-01"},
+    ]
+    
+    # 2. Generación Automática de los 9 Digestores y sus Sistemas
+    id_counter = 4
+    for i in range(1, 10): # Del 1 al 9
+        num_dig = f"{i:02d}" # 01, 02...
+        tag_dig = f"EQ-DIG-{num_dig}"
         
-        # 2. Generación Automática de los 9 Digestores y sus Sistemas
-        id_counter = 4
-        for i in range(1, 10): # Del 1 al 9
-            num_dig = f"{i:02d}" # 01, 02...
-            tag_dig = f"EQ-DIG-{num_dig}"
-            
-            # El Equipo Principal (Padre de los componentes)
-            data.append({
-                "ID": id_counter,
-                "TAG": tag_dig,
-                "Nombre": f"Digestor Continuo #{i}",
-                "Nivel": "L4-Equipo",
-                "TAG_Padre": "AR-DIG",
-                "Categoria": "Cocción",
-                "Especificaciones": "Capacidad 5 Ton/h, Vapor Indirecto"
-            })
-            id_counter += 1
-            
-            # --- COMPONENTES (HIJOS DEL DIGESTOR) ---
-            # Sistema Motriz
-            data.append({"ID": id_counter, "TAG": f"{tag_dig}-MTR", "Nombre": f"Motor Eléctrico Digestor {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Eléctrico", "Especificaciones": "75HP, 1800RPM, 440V"}); id_counter += 1
-            
-            # Transmisión (Aquí van tus fajas)
-            data.append({"ID": id_counter, "TAG": f"{tag_dig}-TRM", "Nombre": f"Transmisión Digestor {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Mecánico", "Especificaciones": "Poleas C/Buje"}); id_counter += 1
-            
-            # Rodamientos/Chumaceras
-            data.append({"ID": id_counter, "TAG": f"{tag_dig}-ROD-A", "Nombre": f"Chumacera Lado Carga {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Rodamiento", "Especificaciones": "SAF 22522"}); id_counter += 1
-            data.append({"ID": id_counter, "TAG": f"{tag_dig}-ROD-B", "Nombre": f"Chumacera Lado Libre {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Rodamiento", "Especificaciones": "SAF 22522"}); id_counter += 1
+        # El Equipo Principal (Padre de los componentes)
+        data.append({
+            "ID": id_counter,
+            "TAG": tag_dig,
+            "Nombre": f"Digestor Continuo #{i}",
+            "Nivel": "L4-Equipo",
+            "TAG_Padre": "AR-DIG",
+            "Categoria": "Cocción",
+            "Especificaciones": "Capacidad 5 Ton/h, Vapor Indirecto"
+        })
+        id_counter += 1
+        
+        # --- COMPONENTES (HIJOS DEL DIGESTOR) ---
+        # Sistema Motriz
+        data.append({"ID": id_counter, "TAG": f"{tag_dig}-MTR", "Nombre": f"Motor Eléctrico Digestor {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Eléctrico", "Especificaciones": "75HP, 1800RPM, 440V"}); id_counter += 1
+        
+        # Transmisión (Aquí van tus fajas)
+        data.append({"ID": id_counter, "TAG": f"{tag_dig}-TRM", "Nombre": f"Transmisión Digestor {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Mecánico", "Especificaciones": "Poleas C/Buje"}); id_counter += 1
+        
+        # Rodamientos/Chumaceras
+        data.append({"ID": id_counter, "TAG": f"{tag_dig}-ROD-A", "Nombre": f"Chumacera Lado Carga {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Rodamiento", "Especificaciones": "SAF 22522"}); id_counter += 1
+        data.append({"ID": id_counter, "TAG": f"{tag_dig}-ROD-B", "Nombre": f"Chumacera Lado Libre {i}", "Nivel": "L5-Componente", "TAG_Padre": tag_dig, "Categoria": "Rodamiento", "Especificaciones": "SAF 22522"}); id_counter += 1
 
-        # Guardamos en Session State (Simulando tu Excel)
-        st.session_state.df_activos = pd.DataFrame(data)
+    # Tabla base compartida (Simulando tu Excel)
+    df_activos = pd.DataFrame(data)
 
     # --- DATAFRAME DE BOM (Repuestos asignados) ---
-    if 'df_bom' not in st.session_state:
-        # Asignamos Fajas B86 automáticamente a los sistemas de transmisión creados
-        bom_data = []
-        df = st.session_state.df_activos
-        transmisiones = df[df['TAG'].str.contains("-TRM")]
+    # Asignamos Fajas B86 automáticamente a los sistemas de transmisión creados
+    bom_data = []
+    transmisiones = df_activos[df_activos['TAG'].str.contains("-TRM")]
+    
+    for _, row in transmisiones.iterrows():
+        bom_data.append({
+            "TAG_Equipo": row['TAG'], # Se asigna al componente "Transmisión"
+            "Tipo_Repuesto": "Faja en V",
+            "Modelo": "B86",
+            "Cantidad": 4,
+            "Observacion": "Cambio cada 6 meses"
+        })
         
-        for _, row in transmisiones.iterrows():
-            bom_data.append({
-                "TAG_Equipo": row['TAG'], # Se asigna al componente "Transmisión"
-                "Tipo_Repuesto": "Faja en V",
-                "Modelo": "B86",
-                "Cantidad": 4,
-                "Observacion": "Cambio cada 6 meses"
-            })
-            
-        st.session_state.df_bom = pd.DataFrame(bom_data)
+    df_bom = pd.DataFrame(bom_data)
+
+    return {"activos": df_activos, "bom": df_bom,
+            "tags": frozenset(df_activos['TAG']), "max_id": int(df_activos['ID'].max())}
+
+# Ejecutamos la carga inicial (compartida) y la capa propia de la sesión
+BASE = base_compartida(VERSION_DATOS)
+st.session_state.setdefault('altas_activos', [])   # Solo los registros creados en esta sesión
+st.session_state.setdefault('altas_bom', [])
+
+def combinar(base, altas, cond=None):
+    """
+    Base compartida + altas de la sesión, combinadas al leer.
+    cond(df) -> máscara: se filtra cada capa por separado y solo se juntan las filas
+    que cumplen, así la base nunca se copia entera (salvo que se pida la tabla completa).
+    """
+    if not altas:
+        return base if cond is None else base[cond(base)]
+    extra = pd.DataFrame(altas)
+    if cond is None:
+        return pd.concat([base, extra], ignore_index=True)
+    return pd.concat([base[cond(base)], extra[cond(extra)]], ignore_index=True)
+
+def activos(cond=None):
+    return combinar(BASE["activos"], st.session_state.altas_activos, cond)
+
+def bom(cond=None):
+    return combinar(BASE["bom"], st.session_state.altas_bom, cond)
 
-# Ejecutamos la carga inicial
-inicializar_data_ejemplo()
+def existe_tag(tag):
+    return tag in BASE["tags"] or any(a["TAG"] == tag for a in st.session_state.altas_activos)
 
-# Atajos para facilitar código
-df = st.session_state.df_activos
-df_bom = st.session_state.df_bom
+def siguiente_id():
+    return max([BASE["max_id"]] + [a["ID"] for a in st.session_state.altas_activos]) + 1
 
 # ==========================================
 # 2. FUNCIONES DE UTILIDAD (LÓGICA)
@@ -85,7 +114,7 @@ def obtener_siguiente_tag(nivel, padre_tag):
     """
     Genera automáticamente el siguiente TAG (Ej: Si existe EQ-DIG-09, genera EQ-DIG-10)
     """
-    filtro = df[df['Nivel'] == nivel]
+    filtro = activos(lambda d: d['Nivel'] == nivel)
     if filtro.empty:
         return f"{padre_tag}-01"
     
@@ -113,21 +142,21 @@ with tab1:
     col1, col2, col3, col4 = st.columns(4)
     
     # 1. Nivel Planta
-    plantas = df[df['Nivel'] == 'L2-Planta']['TAG'].unique()
+    plantas = activos(lambda d: d['Nivel'] == 'L2-Planta')['TAG'].unique()
     sel_planta = col1.selectbox("1. Seleccionar Planta", plantas)
     
     # 2. Nivel Área (Filtrado por Planta)
-    areas = df[df['TAG_Padre'] == sel_planta]['TAG'].unique()
+    areas = activos(lambda d: d['TAG_Padre'] == sel_planta)['TAG'].unique()
     sel_area = col2.selectbox("2. Seleccionar Área", areas)
     
     # 3. Nivel Equipo (Filtrado por Área)
-    equipos = df[(df['TAG_Padre'] == sel_area) & (df['Nivel'] == 'L4-Equipo')]['TAG'].unique()
+    equipos = activos(lambda d: (d['TAG_Padre'] == sel_area) & (d['Nivel'] == 'L4-Equipo'))['TAG'].unique()
     sel_equipo = col3.selectbox("3. Seleccionar Equipo", equipos)
     
     # 4. Mostrar Info
     if sel_equipo:
         st.divider()
-        equipo_data = df[df['TAG'] == sel_equipo].iloc[0]
+        equipo_data = activos(lambda d: d['TAG'] == sel_equipo).iloc[0]
         st.subheader(f"{equipo_data['Nombre']} ({sel_equipo})")
         
         c1, c2 = st.columns([1, 2])
@@ -137,7 +166,7 @@ with tab1:
         with c2:
             st.markdown("#### 🔩 Componentes Instalados")
             # Filtrar componentes hijos de este equipo
-            componentes = df[df['TAG_Padre'] == sel_equipo]
+            componentes = activos(lambda d: d['TAG_Padre'] == sel_equipo)
             
             if not componentes.empty:
                 st.dataframe(componentes[['TAG', 'Nombre', 'Categoria', 'Especificaciones']], use_container_width=True)
@@ -146,7 +175,7 @@ with tab1:
                 st.markdown("#### 📦 Repuestos Asignados (BOM)")
                 # Buscamos BOM asociada a cualquiera de los componentes listados o al equipo
                 tags_familia = [sel_equipo] + componentes['TAG'].tolist()
-                bom_asociada = df_bom[df_bom['TAG_Equipo'].isin(tags_familia)]
+                bom_asociada = bom(lambda d: d['TAG_Equipo'].isin(tags_familia))
                 
                 if not bom_asociada.empty:
                     st.table(bom_asociada)
@@ -162,7 +191,7 @@ with tab2:
     c_padre, c_nivel = st.columns(2)
     
     # Selección inteligente del padre para mantener la cascada
-    padre_opciones = df['TAG'].tolist()
+    padre_opciones = BASE["activos"]['TAG'].tolist() + [a["TAG"] for a in st.session_state.altas_activos]
     tag_padre = c_padre.selectbox("Seleccione TAG Padre (Donde se instalará)", padre_opciones, index=len(padre_opciones)-1)
     
     nivel_nuevo = c_nivel.selectbox("Nivel del Nuevo Activo", ["L3-Area", "L4-Equipo", "L5-Componente"])
@@ -181,11 +210,11 @@ with tab2:
         
         if submitted:
             # Validación de duplicados
-            if nuevo_tag in df['TAG'].values:
+            if existe_tag(nuevo_tag):
                 st.error("❌ Error: Ese TAG ya existe en la base de datos.")
             else:
                 nuevo_registro = {
-                    "ID": df['ID'].max() + 1,
+                    "ID": siguiente_id(),
                     "TAG": nuevo_tag,
                     "Nombre": nuevo_nombre,
                     "Nivel": nivel_nuevo,
@@ -193,8 +222,8 @@ with tab2:
                     "Categoria": nueva_cat,
                     "Especificaciones": nueva_spec
                 }
-                # Agregar al DataFrame en Session State
-                st.session_state.df_activos = pd.concat([df, pd.DataFrame([nuevo_registro])], ignore_index=True)
+                # Solo la fila nueva va a la sesión; la base compartida no se copia
+                st.session_state.altas_activos.append(nuevo_registro)
                 st.success(f"✅ Activo {nuevo_tag} creado correctamente bajo {tag_padre}")
                 st.rerun() # Recargar para ver cambios
 
@@ -211,9 +240,9 @@ with tab3:
         
         if filtro_txt:
             # Buscar en el dataframe
-            opciones = df[df['Nombre'].str.contains(filtro_txt, case=False, na=False)]
+            opciones = activos(lambda d: d['Nombre'].str.contains(filtro_txt, case=False, na=False))
         else:
-            opciones = df[df['Nivel'] == 'L5-Componente']
+            opciones = activos(lambda d: d['Nivel'] == 'L5-Componente')
             
         equipo_destino = st.selectbox("Seleccionar Componente Destino", opciones['TAG'] + " | " + opciones['Nombre'])
     
@@ -237,11 +266,11 @@ with tab3:
                     "Cantidad": r_cant,
                     "Observacion": r_obs
                 }
-                st.session_state.df_bom = pd.concat([df_bom, pd.DataFrame([nueva_bom])], ignore_index=True)
+                st.session_state.altas_bom.append(nueva_bom)
                 st.success("Repuesto asignado.")
                 st.rerun()
 
 # --- VISUALIZACIÓN DE LA TABLA MAESTRA (PARA QUE VEAS LOS DATOS) ---
 st.markdown("---")
 with st.expander("Ver Base de Datos Completa (Excel Virtual)"):
-    st.dataframe(st.session_state.df_activos)
+    st.dataframe(activos())
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ÍNDICE DE LA JERARQUÍA DE ACTIVOS
+# ==========================================
+NIVELES = ["L2-Planta", "L3-Area", "L4-Equipo", "L5-Sistema", "L6-Componente"]
+NIVEL_HIJO = {"L2-Planta": "L3-Area", "L3-Area": "L4-Equipo", "L4-Equipo": "L5-Sistema", "L5-Sistema": "L6-Componente"}
+
+
+class IndiceJerarquia:
+    """
+    Mapas de la tabla ACTIVOS construidos en una sola pasada:
+      - fila:  TAG -> posición en df_activos
+      - padre: TAG -> TAG_Padre
+      - nivel: TAG -> Nivel
+      - hijos: TAG_Padre -> array de TAGs hijos (sin repetir, en el orden del Excel)
+    Se construye una vez por versión de ACTIVOS; cada consulta cuesta O(hijos), no O(N).
+    """
+    def __init__(self, df_activos):
+        self.df = df_activos
+        if df_activos.empty or "TAG" not in df_activos.columns:
+            self.tags = np.array([], dtype=object)
+            self.padres_filas = np.array([], dtype=object)
+            self.fila, self.padre, self.nivel, self.hijos, self._pos_hijos = {}, {}, {}, {}, {}
+            return
+
+        tags = df_activos["TAG"].astype(str).to_numpy()
+        padres = df_activos["TAG_Padre"].astype(str).to_numpy() if "TAG_Padre" in df_activos.columns else np.full(len(tags), "")
+        niveles = df_activos["Nivel"].astype(str).to_numpy() if "Nivel" in df_activos.columns else np.full(len(tags), "")
+
+        self.tags = tags
+        self.padres_filas = padres
+        # Ante TAGs duplicados gana la primera aparición (igual que .iloc[0] en la app)
+        self.fila = {}
+        for i, t in enumerate(tags):
+            self.fila.setdefault(t, i)
+        self.padre = dict(zip(tags, padres))
+        self.nivel = dict(zip(tags, niveles))
+
+        self._pos_hijos = pd.Series(padres).groupby(padres, sort=False).indices
+        self.hijos = {p: pd.unique(tags[pos]) for p, pos in self._pos_hijos.items()}
+        self._plantas = pd.unique(tags[niveles == "L2-Planta"])
+
+    def plantas(self):
+        return self._plantas if len(self.tags) else []
+
+    def hijos_de(self, tag):
+        return self.hijos.get(str(tag), []) if tag else []
+
+    def posiciones_hijos(self, tag):
+        return self._pos_hijos.get(str(tag), np.array([], dtype=int))
+
+    def registro(self, tag):
+        """Fila de ACTIVOS del TAG (Series) o None"""
+        pos = self.fila.get(str(tag))
+        return None if pos is None else self.df.iloc[pos]
+
+    def tabla_hijos(self, tag):
+        return self.df.iloc[self.posiciones_hijos(tag)]
+
+    def nivel_sugerido(self, padre):
+        """Nivel que le corresponde a un hijo nuevo de 'padre'"""
+        nivel_padre = self.nivel.get(str(padre), "ROOT") if padre else "ROOT"
+        return NIVEL_HIJO.get(nivel_padre, "L2-Planta")
+
+    def existe(self, tag):
+        return str(tag) in self.fila
+
+    def ruta(self, tag):
+        """Ancestros de tag desde la planta hasta él (inclusive)"""
+        ruta, tag = [], str(tag)
+        while tag in self.fila and tag not in ruta:
+            ruta.append(tag)
+            tag = self.padre.get(tag)
+        return ruta[::-1]
+
+
+# ==========================================
+# ÍNDICE DE SUBÁRBOLES (INTERVALOS DE EULER)
+# ==========================================
+ESTADOS_OT_CERRADOS = ["Cerrada", "Finalizada", "Cancelada"]
+
+
+class IndiceSubarbol:
+    """
+    Recorrido de Euler sobre la jerarquía: cada TAG recibe [entrada, salida) y sus
+    descendientes son exactamente los de entrada dentro de ese intervalo.
+    Con la posición de entrada de cada fila de ORDENES / BOM / LECTURAS, "todo lo que
+    cuelga de AR-DIG" es una comparación vectorizada de rango, sin recorrer TAG_Padre.
+    """
+    def __init__(self, jer):
+        self.id = {}            # TAG -> id interno (estable al agregar activos)
+        self.tags = []
+        entrada, salida = [], []
+        contador = 0
+
+        # Raíces: las plantas y cualquier activo cuyo padre no exista (huérfanos)
+        raices = [t for t in pd.unique(jer.tags) if jer.padre.get(t) not in jer.fila]
+        for raiz in raices:
+            if raiz in self.id:
+                continue
+            pila = [(raiz, iter(jer.hijos_de(raiz)))]
+            self._registrar(raiz, contador, entrada, salida)
+            contador += 1
+            while pila:
+                tag, hijos = pila[-1]
+                hijo = next((h for h in hijos if h not in self.id), None)
+                if hijo is None:
+                    salida[self.id[tag]] = contador
+                    contador += 1
+                    pila.pop()
+                else:
+                    self._registrar(hijo, contador, entrada, salida)
+                    contador += 1
+                    pila.append((hijo, iter(jer.hijos_de(hijo))))
+
+        self.entrada = np.array(entrada, dtype=np.int64)
+        self.salida = np.array(salida, dtype=np.int64)
+        self.total = contador
+        # Filas de ACTIVOS cubiertas (para detectar si una versión nueva solo agregó filas)
+        self._tags_filas = jer.tags.copy()
+        self._padres_filas = jer.padres_filas.astype(object)
+
+    def _registrar(self, tag, posicion, entrada, salida):
+        self.id[tag] = len(self.tags)
+        self.tags.append(tag)
+        entrada.append(posicion)
+        salida.append(posicion + 1)
+
+    # --- Actualización incremental ---
+    def con_activos_nuevos(self, df_activos):
+        """
+        Si df_activos solo agregó filas al final (alta desde "Crear Activo"), retorna
+        un índice nuevo que las inserta como hojas sin recorrer el árbol. Si hubo otros
+        cambios retorna None (hay que reconstruir).
+        """
+        n = len(self._tags_filas)
+        if len(df_activos) < n or "TAG_Padre" not in df_activos.columns:
+            return None
+        tags = df_activos["TAG"].astype(str).to_numpy()
+        padres = df_activos["TAG_Padre"].astype(str).to_numpy()
+        if not (np.array_equal(tags[:n], self._tags_filas) and np.array_equal(padres[:n], self._padres_filas)):
+            return None
+
+        nuevo = object.__new__(IndiceSubarbol)
+        nuevo.id, nuevo.tags = dict(self.id), list(self.tags)
+        nuevo.entrada, nuevo.salida, nuevo.total = self.entrada.copy(), self.salida.copy(), self.total
+        for tag, padre in zip(tags[n:], padres[n:]):
+            nuevo._agregar_hoja(tag, padre)
+        nuevo._tags_filas, nuevo._padres_filas = tags, padres.astype(object)
+        return nuevo
+
+    def _agregar_hoja(self, tag, padre):
+        if tag in self.id:
+            return
+        if padre in self.id:
+            # La hoja entra al final del intervalo del padre; todo lo posterior se corre 2
+            pos = int(self.salida[self.id[padre]])
+            self.entrada[self.entrada >= pos] += 2
+            self.salida[self.salida >= pos] += 2
+        else:
+            pos = self.total    # Nueva raíz al final
+        self.id[tag] = len(self.tags)
+        self.tags.append(tag)
+        self.entrada = np.append(self.entrada, pos)
+        self.salida = np.append(self.salida, pos + 1)
+        self.total += 2
+
+    # --- Consultas ---
+    def rango(self, tag):
+        i = self.id.get(str(tag))
+        return None if i is None else (int(self.entrada[i]), int(self.salida[i]))
+
+    def posiciones(self, tags):
+        """Serie de TAGs -> array con la posición de entrada de cada uno (-1 si no existe)"""
+        ids = pd.Series(tags).astype(str).map(self.id).fillna(-1).astype(np.int64).to_numpy()
+        return np.where(ids >= 0, self.entrada[np.maximum(ids, 0)] if len(self.entrada) else -1, -1)
+
+    def mascara(self, tag, posiciones):
+        """Filas (por su posición de Euler) que pertenecen al subárbol de tag, incluido él"""
+        r = self.rango(tag)
+        if r is None:
+            return np.zeros(len(posiciones), dtype=bool)
+        return (posiciones >= r[0]) & (posiciones < r[1])
+
+    def descendientes(self, tag):
+        """TAGs del subárbol (incluido tag)"""
+        r = self.rango(tag)
+        if r is None:
+            return []
+        dentro = (self.entrada >= r[0]) & (self.entrada < r[1])
+        return [self.tags[i] for i in np.flatnonzero(dentro)]
+
+    def totales(self, posiciones, pesos=None):
+        """
+        Suma de pesos (o conteo) de los eventos en el subárbol de CADA activo, en una
+        pasada: acumulado sobre posiciones de Euler y resta en los extremos del intervalo.
+        Retorna Serie indexada por TAG.
+        """
+        validas = posiciones >= 0
+        w = None if pesos is None else np.asarray(pesos, dtype=float)[validas]
+        conteo = np.bincount(posiciones[validas], weights=w, minlength=self.total)
+        acumulado = np.concatenate([[0], np.cumsum(conteo)])
+        return pd.Series(acumulado[self.salida] - acumulado[self.entrada], index=self.tags)
+
+
+def resumen_subarbol(sub, tag, df_ots, pos_ots, df_bom, pos_bom, df_lecturas, pos_lecturas):
+    """OTs abiertas, ítems de BOM y última lectura de todo lo que cuelga de tag"""
+    resumen = {"ots_abiertas": 0, "bom_lineas": 0, "bom_unidades": 0, "ultima_lectura": None}
+
+    if not df_ots.empty and "Estado_OT" in df_ots.columns:
+        ots = df_ots[sub.mascara(tag, pos_ots)]
+        resumen["ots_abiertas"] = int((~ots["Estado_OT"].isin(ESTADOS_OT_CERRADOS)).sum())
+
+    if not df_bom.empty:
+        bom = df_bom[sub.mascara(tag, pos_bom)]
+        resumen["bom_lineas"] = len(bom)
+        if "Cantidad" in bom.columns:
+            resumen["bom_unidades"] = float(pd.to_numeric(bom["Cantidad"], errors="coerce").sum())
+
+    if not df_lecturas.empty and "Fecha_Lectura" in df_lecturas.columns:
+        lect = df_lecturas[sub.mascara(tag, pos_lecturas)]
+        if not lect.empty:
+            fechas = pd.to_datetime(lect["Fecha_Lectura"], errors="coerce")
+            if fechas.notna().any():
+                resumen["ultima_lectura"] = lect.loc[fechas.idxmax()]
+    return resumen
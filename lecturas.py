@@ -0,0 +1,331 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# PUNTOS DE MEDICIÓN (LECTURAS)
+# ==========================================
+# ID_Punto se genera como "PM-{TAG}-{VAR}" (VAR = 3 primeras letras de la variable)
+VARIABLES = {"TEM": "Temperatura", "VIB": "Vibración", "AMP": "Amperaje"}
+
+
+def _por_valor_unico(id_punto, funcion):
+    # Hay pocos puntos y muchas lecturas: la regex se aplica una vez por ID_Punto distinto
+    codigos, unicos = pd.factorize(id_punto.astype(str))
+    return pd.Series(funcion(pd.Series(unicos, dtype=object)).to_numpy()[codigos], index=id_punto.index)
+
+
+def tag_de_punto(id_punto):
+    """Serie de ID_Punto -> Serie con el TAG del activo ("PM-EQ-DIG-01-VIB" -> "EQ-DIG-01")"""
+    return _por_valor_unico(id_punto, lambda s: s.str.replace(r"^PM-", "", regex=True)
+                                                 .str.replace(r"-[^-]+$", "", regex=True))
+
+
+def variable_de_punto(id_punto):
+    """Serie de ID_Punto -> código de variable ("PM-EQ-DIG-01-VIB" -> "VIB")"""
+    return _por_valor_unico(id_punto, lambda s: s.str.extract(r"-([^-]+)$", expand=False).fillna(""))
+
+
+def parsear_fechas(fechas):
+    """Fechas ISO (lo que escribe la app) en bloque; el resto con formato libre"""
+    if pd.api.types.is_datetime64_any_dtype(fechas):
+        return fechas    # Ya tipadas (almacén local)
+    resultado = pd.to_datetime(fechas, errors="coerce", format="ISO8601")
+    faltan = resultado.isna() & fechas.notna() & (fechas.astype(str) != "")
+    if faltan.any():
+        resultado[faltan] = pd.to_datetime(fechas[faltan], errors="coerce", format="mixed", dayfirst=True)
+    return resultado
+
+
+def parsear_lecturas(df_lecturas, desde_fila=0):
+    """
+    Columnas tipadas a partir de LECTURAS: tag, variable, fecha (datetime), valor (float)
+    y fila (posición en la hoja, para escribir de vuelta).
+    """
+    df = df_lecturas.iloc[desde_fila:]
+    if df.empty or "ID_Punto" not in df.columns:
+        return pd.DataFrame({"tag": pd.Series(dtype=object), "variable": pd.Series(dtype=object),
+                             "fecha": pd.Series(dtype="datetime64[ns]"), "valor": pd.Series(dtype=float),
+                             "ID_Punto": pd.Series(dtype=object), "fila": pd.Series(dtype=np.int64)})
+    puntos = df["ID_Punto"].astype(str)
+    return pd.DataFrame({
+        "tag": tag_de_punto(puntos).to_numpy(),
+        "variable": variable_de_punto(puntos).to_numpy(),
+        "fecha": parsear_fechas(df["Fecha_Lectura"]).to_numpy() if "Fecha_Lectura" in df.columns else pd.NaT,
+        "valor": pd.to_numeric(df.get("Valor_Medido"), errors="coerce").to_numpy(dtype=float),
+        "ID_Punto": puntos.to_numpy(),
+        "fila": np.arange(desde_fila, desde_fila + len(df), dtype=np.int64),
+    })
+
+
+# ==========================================
+# CARGA MASIVA (CSV / XLSX DE COLECTORES E HISTORIADORES)
+# ==========================================
+# Orden de columnas con que la app escribe en LECTURAS (igual que frm_lectura)
+COLUMNAS_LECTURAS = ["Fecha_Lectura", "ID_Punto", "Valor_Medido", "Inspector", "Estado"]
+
+# Encabezados aceptados en los archivos (en minúsculas, espacios -> "_")
+_ALIAS_CARGA = {
+    "fecha_lectura": "Fecha_Lectura", "fecha": "Fecha_Lectura", "fecha_hora": "Fecha_Lectura", "timestamp": "Fecha_Lectura",
+    "id_punto": "ID_Punto", "punto": "ID_Punto",
+    "tag": "TAG", "tag_equipo": "TAG",
+    "variable": "Variable",
+    "valor_medido": "Valor_Medido", "valor": "Valor_Medido", "value": "Valor_Medido",
+    "inspector": "Inspector",
+    "estado": "Estado",
+}
+
+# Cada fila se rechaza por el primer motivo que cumpla, en este orden
+MOTIVOS_RECHAZO = ["TAG no existe en ACTIVOS", "Variable desconocida", "Fecha inválida",
+                   "Valor no numérico", "Duplicada en el archivo", "Ya registrada"]
+
+
+def leer_archivo_lecturas(archivo, nombre):
+    """CSV (separador detectado) o XLSX, todo como texto para validarlo en bloque"""
+    if nombre.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(archivo, dtype=str).fillna("")
+    return pd.read_csv(archivo, dtype=str, sep=None, engine="python").fillna("")
+
+
+def validar_carga(df, tags_validos, existentes=None, inspector="Carga masiva"):
+    """
+    Valida un archivo de lecturas contra ACTIVOS con operaciones vectorizadas.
+    Acepta ID_Punto, o TAG + Variable (nombre o código: "Vibración" / "VIB").
+    existentes: DataFrame con ID_Punto y fecha ya registrados (p. ej. IndiceLecturas.datos).
+    Retorna (validas con COLUMNAS_LECTURAS, rechazadas con Fila_Archivo y Motivo).
+    """
+    df = df.rename(columns=lambda c: _ALIAS_CARGA.get(str(c).strip().lower().replace(" ", "_"), str(c).strip()))
+    df = df.reset_index(drop=True)
+    vacio = pd.Series("", index=df.index, dtype=object)
+    texto = lambda col: df[col].astype(str).str.strip() if col in df.columns else vacio
+
+    if "ID_Punto" in df.columns:
+        puntos = texto("ID_Punto")
+        tags, variables = tag_de_punto(puntos), variable_de_punto(puntos).str.upper()
+    else:
+        tags = texto("TAG")
+        variables = texto("Variable").str.upper().str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str[:3]
+        puntos = "PM-" + tags + "-" + variables
+    fechas = texto("Fecha_Lectura")
+    fechas = parsear_fechas(fechas.mask(fechas == "")).astype("datetime64[ns]")
+    valores = pd.to_numeric(texto("Valor_Medido").str.replace(",", ".", regex=False), errors="coerce")
+
+    clave = pd.MultiIndex.from_arrays([puntos.to_numpy(), fechas.to_numpy()])
+    ya_registradas = np.zeros(len(df), dtype=bool)
+    if existentes is not None and len(existentes):
+        previas = pd.MultiIndex.from_arrays([existentes["ID_Punto"].astype(str).to_numpy(),
+                                             existentes["fecha"].to_numpy().astype("datetime64[ns]")])
+        ya_registradas = clave.isin(previas)
+
+    motivo = np.select(
+        [~tags.isin(set(tags_validos)).to_numpy(), ~variables.isin(list(VARIABLES)).to_numpy(),
+         fechas.isna().to_numpy(), valores.isna().to_numpy(), clave.duplicated(), ya_registradas],
+        MOTIVOS_RECHAZO, default="")
+
+    ok = motivo == ""
+    inspectores = texto("Inspector").where(texto("Inspector") != "", inspector)
+    estados = texto("Estado").where(texto("Estado") != "", "Registrado")
+    validas = pd.DataFrame({
+        "Fecha_Lectura": fechas[ok].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(),
+        "ID_Punto": puntos[ok].to_numpy(),
+        "Valor_Medido": valores[ok].to_numpy(dtype=float),
+        "Inspector": inspectores[ok].to_numpy(),
+        "Estado": estados[ok].to_numpy(),
+    }, columns=COLUMNAS_LECTURAS)
+    rechazadas = df[~ok].assign(Fila_Archivo=np.flatnonzero(~ok) + 2, Motivo=motivo[~ok])
+    return validas, rechazadas
+
+
+# ==========================================
+# SUBMUESTREO PARA GRÁFICOS (LTTB)
+# ==========================================
+def lttb(x, y, n):
+    """
+    Largest-Triangle-Three-Buckets: índices de n puntos que conservan la forma de la
+    curva (picos incluidos). x e y son arrays numéricos ordenados por x.
+    """
+    total = len(x)
+    if n >= total or n < 3:
+        return np.arange(total)
+    x = x.astype(float)
+    indices = np.empty(n, dtype=np.int64)
+    indices[0], indices[-1] = 0, total - 1
+    bordes = np.linspace(1, total - 1, n - 1).astype(np.int64)    # n-2 cubetas interiores
+    a = 0
+    for i in range(n - 2):
+        ini, fin = bordes[i], max(bordes[i + 1], bordes[i] + 1)
+        sig_ini, sig_fin = fin, (bordes[i + 2] if i + 2 < len(bordes) else total)
+        prom_x = x[sig_ini:max(sig_fin, sig_ini + 1)].mean()
+        prom_y = y[sig_ini:max(sig_fin, sig_ini + 1)].mean()
+        area = np.abs((x[a] - prom_x) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (prom_y - y[a]))
+        a = ini + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+# ==========================================
+# ÍNDICE POR (TAG, VARIABLE) ORDENADO POR FECHA
+# ==========================================
+def _tramos(datos):
+    """[(tag, variable, inicio, fin)] de un DataFrame ya ordenado por (tag, variable)"""
+    claves = datos["tag"].to_numpy(dtype=object) + "|" + datos["variable"].to_numpy(dtype=object)
+    if not len(claves):
+        return []
+    inicio = np.flatnonzero(np.r_[True, claves[1:] != claves[:-1]])
+    fin = np.r_[inicio[1:], len(claves)]
+    tags, variables = datos["tag"].to_numpy(dtype=object), datos["variable"].to_numpy(dtype=object)
+    return [(tags[i], variables[i], int(i), int(f)) for i, f in zip(inicio, fin)]
+
+
+# Columnas de LECTURAS de las que dependen los índices derivados: si cambian en filas ya
+# consumidas, una actualización incremental quedaría desfasada
+COLUMNAS_HUELLA = ["ID_Punto", "Fecha_Lectura", "Valor_Medido"]
+
+
+def huellas_lecturas(df_lecturas):
+    """Hash por fila de COLUMNAS_HUELLA (con los tipos del esquema: unos ms por 200k filas)"""
+    columnas = [c for c in COLUMNAS_HUELLA if c in df_lecturas.columns]
+    if not columnas:
+        return np.zeros(len(df_lecturas), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df_lecturas[columnas], index=False).to_numpy()
+
+
+class IndiceLecturas:
+    """
+    Lecturas parseadas una vez, ordenadas por (tag, variable, fecha).
+    Cada punto ocupa un tramo contiguo [inicio, fin): una tendencia es un lookup
+    del tramo más un searchsorted por fecha, sin recorrer toda la hoja.
+    """
+    def __init__(self, df_lecturas, parseado=None):
+        datos = parseado if parseado is not None else parsear_lecturas(df_lecturas)
+        datos = datos.dropna(subset=["fecha"]).sort_values(["tag", "variable", "fecha"], kind="mergesort")
+        datos = datos.reset_index(drop=True)
+        self._armar(datos, {(tag, var): (ini, fin) for tag, var, ini, fin in _tramos(datos)}, huellas_lecturas(df_lecturas))
+
+    def _armar(self, datos, tramos, huellas):
+        # tramos: {(tag, variable): (inicio, fin)} en el mismo orden que datos
+        # huellas: huellas_lecturas de las filas de LECTURAS ya consumidas
+        self.datos = datos
+        self._fechas = datos["fecha"].to_numpy()
+        self._huellas = huellas
+        self.tramos = tramos
+        self.variables_por_tag = {}
+        self._reducidas = {}    # {(tag, variable, desde, hasta, puntos): DataFrame} de esta versión
+        for tag, var in tramos:
+            self.variables_por_tag.setdefault(tag, []).append(var)
+
+    def con_filas_nuevas(self, df_lecturas):
+        """
+        Si LECTURAS solo creció al final, parsea y ordena únicamente las filas nuevas y las
+        intercala en los tramos de sus puntos: los demás tramos solo se desplazan, sin volver
+        a ordenar toda la historia. Retorna un índice nuevo, o None si la hoja cambió de otra
+        forma (filas borradas, o punto, fecha o valor editados en filas previas: reconstruir).
+        """
+        n = len(self._huellas)
+        if ("ID_Punto" not in df_lecturas.columns or len(df_lecturas) < n
+                or not np.array_equal(huellas_lecturas(df_lecturas.iloc[:n]), self._huellas)):
+            return None
+        nuevas = parsear_lecturas(df_lecturas, desde_fila=n).dropna(subset=["fecha"])
+        nuevas = nuevas.sort_values(["tag", "variable", "fecha"], kind="mergesort").reset_index(drop=True)
+
+        # Posición de cada fila nueva en datos: al final de las lecturas de su punto con fecha <=
+        # (o al comienzo del punto siguiente si el punto es nuevo)
+        total = len(self.datos)
+        claves = list(self.tramos)      # Ordenadas, como datos
+        fechas_nuevas = nuevas["fecha"].to_numpy()
+        posiciones, agregadas = [], {}
+        for tag, var, i, f in _tramos(nuevas):
+            agregadas[(tag, var)] = f - i
+            tramo = self.tramos.get((tag, var))
+            if tramo is None:
+                k = bisect.bisect_left(claves, (tag, var))
+                posiciones.append(np.full(f - i, self.tramos[claves[k]][0] if k < len(claves) else total))
+            else:
+                ini, fin = tramo
+                posiciones.append(ini + np.searchsorted(self._fechas[ini:fin], fechas_nuevas[i:f], side="right"))
+        if posiciones:
+            orden = np.insert(np.arange(total), np.concatenate(posiciones), np.arange(total, total + len(nuevas)))
+            datos = pd.concat([self.datos, nuevas], ignore_index=True).iloc[orden].reset_index(drop=True)
+        else:
+            datos = self.datos
+
+        tramos, inicio = {}, 0
+        for clave in sorted(self.tramos.keys() | agregadas.keys()):
+            ini, fin = self.tramos.get(clave, (0, 0))
+            largo = fin - ini + agregadas.get(clave, 0)
+            tramos[clave] = (inicio, inicio + largo)
+            inicio += largo
+
+        nuevo = object.__new__(IndiceLecturas)
+        nuevo._armar(datos, tramos, np.concatenate([self._huellas, huellas_lecturas(df_lecturas.iloc[n:])]))
+        return nuevo
+
+    def puntos(self, tags):
+        """(tag, variable) con lecturas para los TAGs dados"""
+        return [(t, v) for t in tags for v in self.variables_por_tag.get(t, [])]
+
+    def serie(self, tag, variable, desde=None, hasta=None):
+        """Lecturas de un punto dentro de [desde, hasta], ya ordenadas por fecha"""
+        tramo = self.tramos.get((tag, variable))
+        if tramo is None:
+            return self.datos.iloc[0:0]
+        ini, fin = tramo
+        fechas = self._fechas[ini:fin]
+        if desde is not None:
+            ini += int(np.searchsorted(fechas, np.datetime64(pd.Timestamp(desde)), side="left"))
+        if hasta is not None:
+            fin = tramo[0] + int(np.searchsorted(fechas, np.datetime64(pd.Timestamp(hasta)), side="right"))
+        return self.datos.iloc[ini:fin]
+
+    def ultimas(self, puntos=None, n=1):
+        """Las n lecturas más recientes de cada (tag, variable) (todos si puntos es None)"""
+        tramos = self.tramos.values() if puntos is None else [self.tramos[p] for p in puntos if p in self.tramos]
+        if not tramos:
+            return self.datos.iloc[0:0]
+        return self.datos.iloc[np.concatenate([np.arange(max(ini, fin - n), fin) for ini, fin in tramos])]
+
+    def historia(self, tags, variables=None, desde=None, hasta=None):
+        """Lecturas de varios TAGs (p. ej. un equipo y sus descendientes) en la ventana"""
+        partes = [self.serie(t, v, desde, hasta) for t, v in self.puntos(tags)
+                  if variables is None or v in variables]
+        partes = [p for p in partes if not p.empty]
+        return pd.concat(partes, ignore_index=True) if partes else self.datos.iloc[0:0]
+
+    def ultima_fecha(self, tags):
+        """Fecha de la lectura más reciente entre los TAGs dados (o None)"""
+        fechas = [self._fechas[self.tramos[p][1] - 1] for p in self.puntos(tags)]
+        return pd.Timestamp(max(fechas)) if fechas else None
+
+    def serie_reducida(self, tag, variable, desde=None, hasta=None, puntos=1000):
+        """
+        Serie en la ventana reducida a ~puntos con LTTB. Se memoriza por
+        (punto, ventana, puntos) dentro de esta versión de LECTURAS, así que los
+        reruns y cambios de pestaña no la recalculan.
+        """
+        clave = (tag, variable, desde, hasta, puntos)
+        if clave not in self._reducidas:
+            serie = self.serie(tag, variable, desde, hasta)
+            serie = serie[serie["valor"].notna()]
+            if len(serie) > puntos:
+                x = serie["fecha"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+                serie = serie.iloc[lttb(x, serie["valor"].to_numpy(), puntos)]
+            self._reducidas[clave] = serie
+        return self._reducidas[clave]
+
+    def historia_reducida(self, tags, dias=None, puntos=1000):
+        """
+        Historia de varios TAGs para graficar: ventana de 'dias' hasta la última lectura
+        (None = todo) y como máximo 'puntos' por ID_Punto.
+        Retorna (DataFrame, total de lecturas en la ventana antes de reducir).
+        """
+        fin = self.ultima_fecha(tags)
+        if fin is None:
+            return self.datos.iloc[0:0], 0
+        desde = fin - pd.Timedelta(days=dias) if dias else None
+        partes, total = [], 0
+        for t, v in self.puntos(tags):
+            total += len(self.serie(t, v, desde, fin))
+            partes.append(self.serie_reducida(t, v, desde, fin, puntos))
+        partes = [p for p in partes if not p.empty]
+        return (pd.concat(partes, ignore_index=True) if partes else self.datos.iloc[0:0]), total
@@ -0,0 +1,201 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+# ==========================================
+# TRAMOS DE TIEMPO (INSTRUMENTACIÓN)
+# ==========================================
+# Uso:
+#   with tramo("cascada", "calculo"): ...
+#   with tramo("vista:jerarquia", "cache") as t: t["resultado"] = "hit"
+#   @medido("diff", "calculo")
+# Tipos: api (llamadas al almacenamiento), cache (hit/miss), calculo, grafico, rerun, arranque.
+# Desactivada (por defecto) tramo() devuelve siempre el mismo contexto vacío: el costo es
+# una llamada y un if. Se activa con la variable de entorno MEDICION=1 o con activar().
+#
+# Cada tramo terminado va a:
+#   - el rerun en curso del hilo (iniciar_rerun / terminar_rerun), para el panel de la sesión
+#   - los contadores del proceso (incluye los hilos de fondo: sincronizador, cola)
+#   - el log JSONL (una línea por tramo), escrito en bloques
+API, CACHE, CALCULO, GRAFICO, RERUN, ARRANQUE = "api", "cache", "calculo", "grafico", "rerun", "arranque"
+LOTE_LOG = 200                  # Tramos acumulados antes de escribir el log
+MAX_LOG_MB = 20                 # Al superarlo el log se rota a .1
+
+_activa = os.environ.get("MEDICION", "") not in ("", "0")
+_ruta_log = None
+_pendientes_log = []
+_lock = threading.Lock()
+_hilo = threading.local()       # .tramos: lista del rerun en curso en este hilo
+proceso = Counter()             # {(tipo, nombre): llamadas} desde que arrancó el proceso
+arranque = {}                   # {etapa: {"ms", ...}} del primer rerun del proceso (siempre activo)
+
+
+class _Nulo:
+    """Contexto vacío compartido (medición desactivada)"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _Nulo()
+
+
+class _Tramo:
+    __slots__ = ("nombre", "tipo", "datos", "_t0")
+
+    def __init__(self, nombre, tipo, datos):
+        self.nombre, self.tipo, self.datos = nombre, tipo, datos
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self.datos
+
+    def __exit__(self, tipo_exc, exc, tb):
+        ms = (time.perf_counter() - self._t0) * 1000
+        registro = {"nombre": self.nombre, "tipo": self.tipo, "ms": round(ms, 3),
+                    "t": round(time.time(), 3), "hilo": threading.current_thread().name, **self.datos}
+        if tipo_exc is not None:
+            registro["error"] = tipo_exc.__name__
+        _registrar(registro)
+        return False
+
+
+def activa():
+    return _activa
+
+
+def activar(si=True):
+    global _activa
+    _activa = bool(si)
+
+
+def usar_log(ruta):
+    """Archivo JSONL donde se escriben los tramos (None = sin log)"""
+    global _ruta_log
+    _ruta_log = ruta
+
+
+def tramo(nombre, tipo=CALCULO, **datos):
+    if not _activa:
+        return _NULO
+    return _Tramo(nombre, tipo, datos)
+
+
+def medido(nombre=None, tipo=CALCULO):
+    """Decorador: cada llamada a la función es un tramo (nombre por defecto: el de la función)"""
+    def decorar(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activa:
+                return funcion(*args, **kwargs)
+            with _Tramo(etiqueta, tipo, {}):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorar
+
+
+class AlmacenamientoMedido:
+    """Envuelve un almacenamiento: cada método público es un tramo 'api' ("SQLite local.leer_libro")"""
+    def __init__(self, almacenamiento):
+        self._almacenamiento = almacenamiento
+        self.nombre = almacenamiento.nombre
+
+    def __getattr__(self, atributo):
+        valor = getattr(self._almacenamiento, atributo)
+        if atributo.startswith("_") or not callable(valor):
+            return valor
+        return medido(f"{self.nombre}.{atributo}", API)(valor)
+
+
+# --- Arranque del proceso ---
+def marcar_arranque(etapa, t0, **datos):
+    """
+    Registra los ms desde t0 la primera vez que el proceso llega a 'etapa' ("importaciones",
+    "primer_pintado"); las siguientes se ignoran. Se mide aunque MEDICION esté desactivada.
+    """
+    if etapa in arranque:
+        return
+    ms = (time.perf_counter() - t0) * 1000
+    arranque[etapa] = {"ms": ms, **datos}
+    if _activa:
+        _registrar({"nombre": f"arranque:{etapa}", "tipo": ARRANQUE, "ms": round(ms, 3),
+                    "t": round(time.time(), 3), "hilo": threading.current_thread().name, **datos})
+
+
+# --- Rerun (sesión) ---
+def iniciar_rerun():
+    """Empieza a juntar los tramos de este hilo (un rerun de Streamlit); nada si está desactivada"""
+    if not _activa:
+        return
+    _hilo.tramos = []
+    _hilo.t0 = time.perf_counter()
+
+
+def terminar_rerun():
+    """
+    Cierra el rerun en curso del hilo y retorna su resumen
+    {ms, tramos: [...], api: {nombre: llamadas}} o None si no había uno.
+    """
+    tramos = getattr(_hilo, "tramos", None)
+    if tramos is None:
+        return None
+    _hilo.tramos = None
+    ms = (time.perf_counter() - _hilo.t0) * 1000
+    _registrar({"nombre": "rerun", "tipo": RERUN, "ms": round(ms, 3), "t": round(time.time(), 3),
+                "hilo": threading.current_thread().name, "tramos": len(tramos)})
+    vaciar_log()
+    return {"ms": ms, "tramos": tramos, "api": dict(Counter(t["nombre"] for t in tramos if t["tipo"] == API))}
+
+
+def _registrar(registro):
+    tramos = getattr(_hilo, "tramos", None)
+    if tramos is not None:
+        tramos.append(registro)
+    with _lock:
+        proceso[(registro["tipo"], registro["nombre"])] += 1
+        if _ruta_log:
+            _pendientes_log.append(registro)
+            lleno = len(_pendientes_log) >= LOTE_LOG
+        else:
+            lleno = False
+    if lleno:
+        vaciar_log()
+
+
+def vaciar_log():
+    """Escribe en el log los tramos acumulados (y rota el archivo si creció demasiado)"""
+    with _lock:
+        if not _ruta_log or not _pendientes_log:
+            return
+        lineas = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in _pendientes_log)
+        _pendientes_log.clear()
+        try:
+            os.makedirs(os.path.dirname(_ruta_log) or ".", exist_ok=True)
+            if os.path.exists(_ruta_log) and os.path.getsize(_ruta_log) > MAX_LOG_MB * 1e6:
+                os.replace(_ruta_log, _ruta_log + ".1")
+            with open(_ruta_log, "a", encoding="utf-8") as f:
+                f.write(lineas)
+        except OSError:
+            pass    # La medición nunca debe romper la app
+
+
+def agrupar(tramos):
+    """[(tipo, nombre, llamadas, ms totales, ms máx)] ordenado por ms totales (cachés separadas en hit/miss)"""
+    grupos = {}
+    for t in tramos:
+        nombre = f"{t['nombre']} ({t['resultado']})" if "resultado" in t else t["nombre"]
+        g = grupos.setdefault((t["tipo"], nombre), [0, 0.0, 0.0])
+        g[0] += 1
+        g[1] += t["ms"]
+        g[2] = max(g[2], t["ms"])
+    return sorted(((tipo, nombre, n, total, maximo) for (tipo, nombre), (n, total, maximo) in grupos.items()),
+                  key=lambda g: -g[3])
@@ -0,0 +1,304 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+import numpy as np
+
+# ==========================================
+# PRUEBA DE CARGA (SESIONES CONCURRENTES)
+# ==========================================
+# python prueba_carga.py --sesiones 20 --acciones 30 --escrituras 0.2
+# Corre app.py sin navegador con streamlit.testing (AppTest): cada sesión simulada es un
+# AppTest en su propio hilo, todas en el mismo proceso, así comparten los cache_resource
+# (sincronizador, cola de escritura, índices) igual que las sesiones de un servidor real.
+# Los datos son una planta sintética en SQLite (AlmacenamientoSQLite) en una carpeta temporal,
+# con MEDICION=1 para contar las llamadas al almacenamiento.
+#
+# Acciones de lectura: navegar la cascada, buscar un activo, ver tendencias.
+# Acciones de escritura: crear una OT, registrar una lectura.
+# Reporta p50/p95/p99 de latencia por rerun, acciones por segundo y llamadas al
+# almacenamiento por acción (en el rerun y en segundo plano: refrescos y cola de escritura).
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+LECTURA, ESCRITURA = "lectura", "escritura"
+MODULOS = {"activos": "1. Maestro de Activos", "ordenes": "2. Gestión Mantenimiento", "monitoreo": "3. Monitoreo"}
+
+
+class Sesion:
+    """Un usuario simulado: su AppTest, su azar y las latencias de cada rerun que provocó"""
+    def __init__(self, numero, semilla, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.numero = numero
+        self.rng = random.Random(semilla + numero)
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.modulo = None
+        self.reruns = []        # [(acción, ms)]
+        self.errores = Counter()
+        self.api = Counter()    # {acción: llamadas al almacenamiento hechas dentro de sus reruns}
+        self.hechas = Counter()
+        self._accion = "inicio"
+
+    def correr(self, elemento=None):
+        """Rerun (de un widget modificado o de la app) cronometrado"""
+        llamadas_antes = self._llamadas_sesion()
+        t0 = time.perf_counter()
+        (elemento or self.at).run()
+        self.reruns.append((self._accion, (time.perf_counter() - t0) * 1000))
+        self.api[self._accion] += self._llamadas_sesion() - llamadas_antes
+        if self.at.exception:
+            self.errores[self._accion] += 1
+
+    def _llamadas_sesion(self):
+        try:
+            return sum(self.at.session_state["medicion"]["api"].values())
+        except KeyError:
+            return 0
+
+    def ir_a(self, modulo):
+        if self.modulo != modulo:
+            self.correr(self.at.sidebar.radio[0].set_value(MODULOS[modulo]))
+            self.modulo = modulo
+
+    def elegir(self, key):
+        """Elige al azar una opción del selectbox 'key' (si existe y tiene opciones)"""
+        try:
+            caja = self.at.selectbox(key=key)
+        except KeyError:
+            return False
+        if not caja.options:
+            return False
+        self.correr(caja.set_value(self.rng.choice(caja.options)))
+        return True
+
+    def accion(self, nombre, funcion, datos):
+        self._accion = nombre
+        self.hechas[nombre] += 1
+        funcion(self, datos)
+
+
+# --- Acciones ---
+def navegar(s, datos):
+    """Planta -> área -> equipo en el navegador del Maestro de Activos"""
+    s.ir_a("activos")
+    for key in ("nav_p", "nav_a", "nav_e"):
+        s.elegir(key)
+
+
+def buscar(s, datos):
+    """Escribe parte de un TAG en el buscador y salta al activo"""
+    s.ir_a("activos")
+    tag = s.rng.choice(datos["tags"])
+    s.correr(s.at.text_input(key="nav_buscar").set_value(tag[:s.rng.randint(6, len(tag))]))
+    s.elegir("nav_ir")
+
+
+def tendencia(s, datos):
+    """Elige un equipo en Monitoreo (dibuja su tendencia) y cambia la ventana"""
+    s.ir_a("monitoreo")
+    for key in ("mon_a", "mon_e"):
+        s.elegir(key)
+    s.elegir("mon_ventana")
+
+
+def crear_ot(s, datos):
+    s.ir_a("ordenes")
+    s.at.text_area[0].set_value(f"Prueba de carga {s.numero}")
+    s.correr([b for b in s.at.button if b.label == "Generar OT"][0].click())
+
+
+def registrar_lectura(s, datos):
+    s.ir_a("monitoreo")
+    s.at.number_input[0].set_value(round(s.rng.uniform(1, 5), 2))
+    s.correr([b for b in s.at.button if b.label == "Grabar Lectura"][0].click())
+
+
+ACCIONES = {
+    "navegar": (LECTURA, navegar),
+    "buscar": (LECTURA, buscar),
+    "tendencia": (LECTURA, tendencia),
+    "crear_ot": (ESCRITURA, crear_ot),
+    "registrar_lectura": (ESCRITURA, registrar_lectura),
+}
+
+
+# ==========================================
+# EJECUCIÓN Y REPORTE
+# ==========================================
+def preparar(escala, semilla, carpeta):
+    """
+    Planta sintética en SQLite dentro de 'carpeta'.
+    Retorna (datos para las acciones, variables de entorno que apuntan la app a esa carpeta).
+    """
+    from benchmark import ESCALAS
+    from generador_planta import generar_planta, volcar, resumen
+    from almacenamiento import AlmacenamientoSQLite
+
+    tablas = generar_planta(**ESCALAS[escala], semilla=semilla)
+    ruta = os.path.join(carpeta, "planta.db")
+    volcar(tablas, AlmacenamientoSQLite(ruta))
+    print(f"Planta '{escala}' en {ruta}: {resumen(tablas)}")
+    activos = tablas[("1_DATA_MAESTRA", "ACTIVOS")]
+    entorno = {"ALMACENAMIENTO_SQLITE": ruta, "DATOS_LOCALES": os.path.join(carpeta, "datos_locales"), "MEDICION": "1"}
+    return {"tags": activos.loc[activos["Nivel"] == "L6-Componente", "TAG"].tolist()}, entorno
+
+
+@contextlib.contextmanager
+def apptest_concurrente():
+    """
+    AppTest está pensado para una sesión a la vez; para correr varias en hilos:
+    - Crea un ScriptCache nuevo en cada rerun y recompila app.py; con varios hilos compilando
+      a la vez el ast de CPython 3.11 falla ("AST constructor recursion depth mismatch").
+      Un servidor real compila una vez para todas las sesiones: se usa un único cache.
+    - Al terminar cada rerun deja Runtime._instance = None, lo que rompe a los que siguen
+      corriendo ("Runtime hasn't been created!"): se sigue usando el último runtime creado.
+    - Activa la opción global.appTest solo mientras dura cada rerun: se deja fija mientras dure el bloque.
+    Al salir del bloque se restauran los originales.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    compartido = ScriptCache()
+    compilar = ScriptCache.__dict__["get_bytecode"]
+    instancia_original, existe_original = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    app_test_original = config.get_option("global.appTest")
+
+    ultimo = {}
+
+    def instancia(cls):
+        if cls._instance is not None:
+            ultimo["runtime"] = cls._instance
+        return cls._instance or ultimo["runtime"]
+
+    ScriptCache.get_bytecode = lambda self, ruta: compilar(compartido, ruta)
+    Runtime.instance = classmethod(instancia)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in ultimo)
+    config.set_option("global.appTest", True)
+    try:
+        yield
+    finally:
+        ScriptCache.get_bytecode = compilar
+        Runtime.instance, Runtime.exists = instancia_original, existe_original
+        config.set_option("global.appTest", app_test_original)
+
+
+def sesion_simulada(s, datos, acciones, escrituras, pausa, inicio):
+    lecturas = [n for n, (tipo, _) in ACCIONES.items() if tipo == LECTURA]
+    de_escritura = [n for n, (tipo, _) in ACCIONES.items() if tipo == ESCRITURA]
+    inicio.wait()
+    for _ in range(acciones):
+        nombre = s.rng.choice(de_escritura if s.rng.random() < escrituras else lecturas)
+        try:
+            s.accion(nombre, ACCIONES[nombre][1], datos)
+        except Exception as e:     # Un widget que no apareció: se cuenta y se sigue
+            s.errores[f"{nombre}: {type(e).__name__}"] += 1
+        if pausa:
+            time.sleep(s.rng.uniform(0, 2 * pausa))
+
+
+def percentiles(ms):
+    if not ms:
+        return {"n": 0, "p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def ejecutar(sesiones=10, acciones=20, escrituras=0.2, pausa=0.0, escala="chica", semilla=0, timeout=120):
+    """Corre la prueba en una carpeta temporal (se borra al terminar) y retorna el resultado"""
+    import medicion
+    activa = medicion.activa()
+    with tempfile.TemporaryDirectory(prefix="prueba_carga_", ignore_cleanup_errors=True) as carpeta:
+        datos, entorno = preparar(escala, semilla, carpeta)
+        with mock.patch.dict(os.environ, entorno), apptest_concurrente():
+            medicion.activar()      # El módulo pudo importarse antes de fijar MEDICION=1
+            try:
+                return _medir(datos, sesiones, acciones, escrituras, pausa, escala, semilla, timeout)
+            finally:
+                medicion.activar(activa)
+
+
+def _medir(datos, sesiones, acciones, escrituras, pausa, escala, semilla, timeout):
+    import medicion
+    from medicion import API
+
+    # Primera carga (bloqueante) fuera de la medición: el resto de las sesiones la encuentra lista
+    calentamiento = Sesion(-1, semilla, timeout)
+    calentamiento.correr()
+    if calentamiento.at.exception:
+        raise RuntimeError(calentamiento.at.exception[0].value)
+
+    lista = [Sesion(i, semilla, timeout) for i in range(sesiones)]
+    for s in lista:
+        s.correr()      # Cada sesión abre la app (no se cuenta como acción)
+        s.reruns.clear()
+    llamadas_antes = Counter({n: c for (t, n), c in medicion.proceso.items() if t == API})
+
+    inicio = threading.Event()
+    hilos = [threading.Thread(target=sesion_simulada, args=(s, datos, acciones, escrituras, pausa, inicio),
+                              name=f"sesion-{s.numero}") for s in lista]
+    for h in hilos:
+        h.start()
+    t0 = time.perf_counter()
+    inicio.set()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - t0
+    time.sleep(2)   # Que la cola termine de enviar lo encolado en las últimas acciones
+
+    llamadas = Counter({n: c for (t, n), c in medicion.proceso.items() if t == API})
+    llamadas.subtract(llamadas_antes)
+    por_accion = {}
+    for s in lista:
+        for accion, ms in s.reruns:
+            por_accion.setdefault(accion, []).append(ms)
+    acciones_hechas = sum((s.hechas for s in lista), Counter())
+    total_acciones = sesiones * acciones
+    return {
+        "sesiones": sesiones, "acciones_por_sesion": acciones, "escrituras": escrituras, "pausa": pausa,
+        "escala": escala, "duracion_s": duracion,
+        "acciones_por_s": total_acciones / duracion, "reruns_por_s": sum(len(v) for v in por_accion.values()) / duracion,
+        "latencia_rerun_ms": {a: percentiles(v) for a, v in sorted(por_accion.items())},
+        "latencia_total_ms": percentiles([ms for v in por_accion.values() for ms in v]),
+        "api_en_rerun_por_accion": {a: sum(s.api[a] for s in lista) / max(acciones_hechas[a], 1) for a in por_accion},
+        "api_total": {n: c for n, c in llamadas.items() if c},
+        "api_por_accion": sum(llamadas.values()) / max(total_acciones, 1),
+        "errores": dict(sum((s.errores for s in lista), Counter())),
+    }
+
+
+def imprimir(r):
+    print(f"\n{r['sesiones']} sesiones × {r['acciones_por_sesion']} acciones ({r['escrituras']:.0%} escrituras) "
+          f"en {r['duracion_s']:.1f} s: {r['acciones_por_s']:.1f} acciones/s, {r['reruns_por_s']:.1f} reruns/s")
+    print(f"  {'acción':<18} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'api/acción':>11}")
+    filas = list(r["latencia_rerun_ms"].items()) + [("TOTAL", r["latencia_total_ms"])]
+    for accion, p in filas:
+        api = r["api_en_rerun_por_accion"].get(accion)
+        print(f"  {accion:<18} {p['n']:>7} {p['p50'] or 0:8.0f} {p['p95'] or 0:8.0f} {p['p99'] or 0:8.0f}"
+              f" {'' if api is None else f'{api:.2f}':>11}")
+    print(f"Llamadas al almacenamiento (incluye refrescos y cola en segundo plano): "
+          f"{r['api_por_accion']:.2f} por acción · {r['api_total']}")
+    if r["errores"]:
+        print(f"Errores: {r['errores']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de app.py con sesiones concurrentes")
+    parser.add_argument("--sesiones", type=int, default=10)
+    parser.add_argument("--acciones", type=int, default=20, help="Acciones por sesión")
+    parser.add_argument("--escrituras", type=float, default=0.2, help="Fracción de acciones que escriben (0 a 1)")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos promedio entre acciones de una sesión")
+    parser.add_argument("--escala", default="chica", help="Escala de la planta (ver benchmark.ESCALAS)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.sesiones, args.acciones, args.escrituras, args.pausa, args.escala, args.semilla)
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:     # Windows: sin bloqueo entre procesos, cada proceso descarga por su cuenta
+    fcntl = None
+
+# ==========================================
+# SNAPSHOT COMPARTIDO ENTRE PROCESOS (RÉPLICAS DE LA APP)
+# ==========================================
+# Varias réplicas en la misma máquina (o con el mismo volumen) comparten datos_locales/snapshot:
+#   - El líder (el proceso que tiene lider.lock) descarga de Drive y publica cada hoja
+#     que cambió como un archivo Arrow IPC sin comprimir.
+#   - Las demás réplicas no llaman a Drive: leen la última versión con memory-map.
+#
+#   datos_locales/snapshot/
+#     snapshot.json     {"version", "tablas": {"libro/hoja": {"ruta", "version", "huella",
+#                                                            "verificado_en", "filas", "anterior"}}}
+#     1_DATA_MAESTRA__ACTIVOS__v000003.arrow
+#     solicitudes/      Una réplica que escribió en una hoja le pide al líder que la relea
+#
+# Un archivo reemplazado se borra una publicación después (quien lo tenga mapeado sigue leyéndolo).
+MANIFIESTO = "snapshot.json"
+BLOQUEO = "lider.lock"
+SOLICITUDES = "solicitudes"
+
+
+def _nombre(clave):
+    return "/".join(clave)
+
+
+def huella_tabla(df):
+    """Resumen del contenido (detecta si una hoja descargada es igual a la publicada)"""
+    filas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(filas.tobytes() + "|".join(map(str, df.columns)).encode(), digest_size=16).hexdigest()
+
+
+def escribir_arrow(df, ruta):
+    tabla = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    with pa.OSFile(ruta + ".tmp", "wb") as f, pa.ipc.new_file(f, tabla.schema) as w:
+        w.write_table(tabla)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def leer_arrow(ruta):
+    """Tabla mapeada en memoria; las columnas numéricas y de fecha no se copian"""
+    return pa.ipc.open_file(pa.memory_map(ruta)).read_all().to_pandas(split_blocks=True)
+
+
+class PublicadorSnapshot:
+    """
+    Uso desde el cargador del Sincronizador:
+      - es_lider() -> True: descargar de Drive y publicar(tablas)
+      - es_lider() -> False: leer(hojas) lo publicado, y confirmar(claves) las que el
+        Sincronizador aceptó (las descartadas se vuelven a entregar en el próximo leer)
+    externas() -> hojas que cambiaron fuera de este proceso (para el líder: pedidas por
+    otras réplicas; para el resto: publicadas en una versión que todavía no leyó).
+    """
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(os.path.join(directorio, SOLICITUDES), exist_ok=True)
+        self._lock = threading.Lock()
+        self._archivo_lider = None
+        self._leidas = {}       # {clave: ruta} publicada que este proceso ya tiene
+        self._escrituras = {}   # {clave: instante} de la última escritura propia aún no vista por el líder
+        self._entregadas = {}   # {clave: (ruta, escritura)} leídas pero aún no confirmadas
+
+    # --- Liderazgo ---
+    def es_lider(self):
+        """Toma lider.lock si está libre (si el líder muere, el siguiente que pregunte lo reemplaza)"""
+        if fcntl is None:
+            return True
+        with self._lock:
+            if self._archivo_lider is None:
+                f = open(os.path.join(self.directorio, BLOQUEO), "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    return False
+                self._archivo_lider = f
+            return True
+
+    # --- Publicación (líder) ---
+    def publicar(self, tablas):
+        """
+        Publica las hojas recién descargadas. Las que no cambiaron solo renuevan
+        verificado_en (no se reescriben). Retorna cuántas hojas se escribieron.
+        """
+        with self._lock:
+            manifiesto = self._leer_manifiesto()
+            ahora, escritas = time.time(), 0
+            for clave, df in tablas.items():
+                nombre = _nombre(clave)
+                previa = manifiesto["tablas"].get(nombre)
+                huella = huella_tabla(df)
+                if previa and previa["huella"] == huella:
+                    previa["verificado_en"] = ahora
+                    continue
+                version = previa["version"] + 1 if previa else 1
+                ruta = f"{'__'.join(clave)}__v{version:06d}.arrow"
+                escribir_arrow(df, os.path.join(self.directorio, ruta))
+                if previa and previa.get("anterior"):
+                    self._borrar(previa["anterior"])
+                manifiesto["tablas"][nombre] = {
+                    "ruta": ruta, "version": version, "huella": huella, "verificado_en": ahora,
+                    "filas": len(df), "anterior": previa["ruta"] if previa else None,
+                }
+                self._leidas[clave] = ruta
+                escritas += 1
+            if escritas:
+                manifiesto["version"] += 1
+            self._escribir_manifiesto(manifiesto)
+            return escritas
+
+    # --- Lectura (réplicas) ---
+    def leer(self, hojas):
+        """
+        Hojas publicadas que este proceso todavía no tiene. Una hoja en la que este proceso
+        escribió se entrega recién cuando el líder la verificó después de esa escritura.
+        Retorna ({clave: DataFrame}, [claves sin publicar]).
+        """
+        manifiesto = self._leer_manifiesto()
+        tablas, faltan = {}, []
+        for clave in hojas:
+            entrada = manifiesto["tablas"].get(_nombre(clave))
+            if entrada is None:
+                faltan.append(clave)
+                continue
+            escrita = self._escrituras.get(clave)
+            if escrita is not None and entrada["verificado_en"] < escrita:
+                continue    # El líder todavía no releyó la hoja: se conserva la copia local
+            if escrita is None and self._leidas.get(clave) == entrada["ruta"]:
+                continue
+            try:
+                tablas[clave] = leer_arrow(os.path.join(self.directorio, entrada["ruta"]))
+            except (OSError, pa.ArrowException):
+                continue    # Reemplazada mientras tanto: el próximo ciclo lee la nueva
+            self._entregadas[clave] = (entrada["ruta"], escrita)
+        return tablas, faltan
+
+    def confirmar(self, claves):
+        """Las hojas entregadas por leer() que entraron al snapshot local: ya no se vuelven a leer"""
+        for clave in claves:
+            entregada = self._entregadas.pop(clave, None)
+            if entregada is None:
+                continue    # Descargada directo (no estaba publicada)
+            ruta, escrita = entregada
+            self._leidas[clave] = ruta
+            if self._escrituras.get(clave) == escrita:
+                self._escrituras.pop(clave, None)   # Una escritura posterior sigue pendiente
+
+    def guardado(self, hojas):
+        """
+        Arranque en frío: todas las hojas tal como quedaron publicadas en disco (aunque el
+        proceso que las publicó ya no exista) y cuándo se verificaron contra el almacenamiento.
+        Retorna ({clave: DataFrame}, {clave: datetime}) o None si falta alguna.
+        """
+        entradas = self._leer_manifiesto()["tablas"]
+        if any(_nombre(clave) not in entradas for clave in hojas):
+            return None
+        tablas, _ = self.leer(hojas)
+        if len(tablas) < len(hojas):
+            return None
+        self.confirmar(tablas)      # El arranque en frío siembra todas
+        return tablas, {clave: datetime.fromtimestamp(entradas[_nombre(clave)]["verificado_en"]) for clave in hojas}
+
+    def solicitar(self, libro, hoja):
+        """Esta réplica escribió en la hoja: el líder debe releerla antes de volver a publicarla"""
+        if self.es_lider():
+            return      # El líder ya ve sus propias escrituras
+        clave = (libro, hoja)
+        self._escrituras[clave] = time.time()
+        with open(os.path.join(self.directorio, SOLICITUDES, "__".join(clave)), "w"):
+            pass
+
+    def externas(self):
+        if self.es_lider():
+            carpeta = os.path.join(self.directorio, SOLICITUDES)
+            pedidas = []
+            for archivo in os.listdir(carpeta):
+                pedidas.append(tuple(archivo.split("__", 1)))
+                self._borrar(os.path.join(SOLICITUDES, archivo))
+            return pedidas
+        manifiesto = self._leer_manifiesto()
+        return [tuple(nombre.split("/", 1)) for nombre, e in manifiesto["tablas"].items()
+                if self._leidas.get(tuple(nombre.split("/", 1))) != e["ruta"]]
+
+    # --- Manifiesto ---
+    def _leer_manifiesto(self):
+        try:
+            with open(os.path.join(self.directorio, MANIFIESTO), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "tablas": {}}
+
+    def _escribir_manifiesto(self, manifiesto):
+        ruta = os.path.join(self.directorio, MANIFIESTO)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f)
+        os.replace(ruta + ".tmp", ruta)
+
+    def _borrar(self, ruta):
+        try:
+            os.remove(os.path.join(self.directorio, ruta))
+        except OSError:
+            pass
@@ -0,0 +1,325 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from medicion import tramo, CACHE
+
+
+# ==========================================
+# SNAPSHOT INMUTABLE DE LOS DATOS
+# ==========================================
+class Snapshot:
+    """
+    Foto de las hojas en un instante. Nunca se modifica: se reemplaza entera.
+    Cada hoja lleva su propia versión y fecha de carga, así cambiar una no toca a las demás.
+    """
+    def __init__(self, tablas, versiones, cargado_en, tiempos, version):
+        self.tablas = tablas            # {(libro, hoja): DataFrame}
+        self.versiones = versiones      # {(libro, hoja): int}
+        self.cargado_en = cargado_en    # {(libro, hoja): datetime de la última descarga exitosa}
+        self.tiempos = tiempos          # {libro: segundos de la última descarga}
+        self.version = version          # Versión global (cambia con cualquier hoja)
+
+    def tabla(self, libro, hoja):
+        return self.tablas.get((libro, hoja), pd.DataFrame())
+
+    def version_de(self, libro, hoja):
+        return self.versiones.get((libro, hoja), 0)
+
+    def edad_segundos(self, libro=None, hoja=None):
+        """Antigüedad de una hoja, o de la más antigua si no se indica"""
+        if libro is not None:
+            fechas = [self.cargado_en.get((libro, hoja), datetime.min)]
+        else:
+            fechas = list(self.cargado_en.values()) or [datetime.now()]
+        return (datetime.now() - min(fechas)).total_seconds()
+
+    def con_tablas(self, nuevas, tiempos=None, recargadas=False, cargadas_en=None):
+        """
+        Nuevo snapshot reemplazando solo las hojas indicadas (el resto se comparte, no se copia).
+        cargadas_en: {(libro, hoja): datetime} explícito (hojas leídas de disco, no recién bajadas).
+        """
+        tablas, versiones, cargado_en = dict(self.tablas), dict(self.versiones), dict(self.cargado_en)
+        for clave, df in nuevas.items():
+            tablas[clave] = df
+            versiones[clave] = versiones.get(clave, 0) + 1
+            if recargadas:
+                cargado_en[clave] = datetime.now()
+        cargado_en.update(cargadas_en or {})
+        return Snapshot(tablas, versiones, cargado_en, {**self.tiempos, **(tiempos or {})}, self.version + 1)
+
+
+def snapshot_vacio():
+    return Snapshot({}, {}, {}, {}, 0)
+
+
+# ==========================================
+# APLICACIÓN LOCAL DE FILAS NUEVAS
+# ==========================================
+def anexar_filas(df, filas):
+    """
+    Agrega filas (listas de valores en el orden de la hoja, o dicts por columna)
+    al final de df respetando los tipos existentes. El índice sigue siendo 0..n-1,
+    igual que la posición en el Excel (fila = índice + 2).
+    """
+    columnas = list(df.columns)
+    registros = []
+    for fila in filas:
+        if isinstance(fila, dict):
+            if columnas and not set(fila) <= set(columnas):
+                fila = list(fila.values())      # Encabezados distintos: se respeta la posición
+            else:
+                registros.append(fila)
+                continue
+        registros.append({c: v for c, v in zip(columnas or range(len(fila)), fila)})
+
+    nuevo = pd.DataFrame(registros, columns=columnas or None)
+    ampliadas = {}
+    for col in columnas:
+        if col not in nuevo.columns or nuevo[col].dtype == df[col].dtype:
+            continue
+        tipo = df[col].dtype
+        try:
+            if isinstance(tipo, pd.CategoricalDtype):
+                # Valores nuevos (un Estado_OT que no estaba) amplían las categorías
+                vacias = nuevo[col].isna() | (nuevo[col].astype(str) == "")
+                valores = nuevo[col].astype(str).mask(vacias)
+                categorias = tipo.categories.union(pd.Index(valores.dropna().unique()))
+                if len(categorias) != len(tipo.categories):
+                    ampliadas[col] = df[col].cat.set_categories(categorias)
+                nuevo[col] = pd.Categorical(valores, categories=categorias)
+            elif pd.api.types.is_numeric_dtype(tipo) and not pd.api.types.is_bool_dtype(tipo):
+                # Celdas vacías ("" en el formulario) -> NaN / <NA> en columnas tipadas
+                nuevo[col] = pd.to_numeric(nuevo[col].replace("", None), errors="raise").astype(tipo)
+            elif pd.api.types.is_datetime64_any_dtype(tipo):
+                nuevo[col] = nuevo[col].replace("", None).astype(tipo)
+            else:
+                nuevo[col] = nuevo[col].astype(tipo)
+        except (ValueError, TypeError):
+            pass    # Tipo incompatible: concat promueve la columna a object
+
+    if df.empty:
+        return nuevo.reset_index(drop=True)
+    base = df.assign(**ampliadas) if ampliadas else df
+    return pd.concat([base, nuevo], ignore_index=True)
+
+
+def fila_final_de_rango(rango):
+    """'LECTURAS'!A120:E121 -> 121 (última fila escrita según la respuesta de append)"""
+    m = re.search(r"(\d+)$", rango or "")
+    return int(m.group(1)) if m else None
+
+
+# ==========================================
+# REFRESCO EN SEGUNDO PLANO (STALE-WHILE-REVALIDATE)
+# ==========================================
+class Sincronizador:
+    """
+    Sirve siempre el último snapshot bueno y refresca en un hilo aparte solo las hojas
+    cuyo TTL venció o que fueron invalidadas.
+    cargar: función que recibe {libro: [hojas]} y retorna (tablas, tiempos, errores),
+            como cargar_libros. Si un libro falla se conservan sus hojas anteriores.
+    ttl: {(libro, hoja): segundos}; las hojas sin entrada usan ttl_defecto.
+    """
+    def __init__(self, cargar, hojas, ttl=None, ttl_defecto=60, revision=5, pendientes=None, externas=None,
+                 aceptadas=None):
+        self._cargar = cargar
+        # pendientes(libro, hoja) -> filas aún no escritas en Drive; esas hojas no se
+        # reemplazan con una descarga (la descarga todavía no las incluye)
+        self.pendientes = pendientes or (lambda libro, hoja: 0)
+        # externas() -> [(libro, hoja)] que cambiaron fuera de este proceso (snapshot
+        # compartido entre réplicas); se recargan sin esperar su TTL
+        self.externas = externas or (lambda: [])
+        # aceptadas([(libro, hoja)]) -> hojas descargadas que sí entraron al snapshot (las
+        # descartadas por escrituras en curso se vuelven a pedir: quien las entregó no debe darlas por leídas)
+        self.aceptadas = aceptadas or (lambda claves: None)
+        self.hojas = list(hojas)        # [(libro, hoja)] que administra
+        self.ttl = dict(ttl or {})
+        self.ttl_defecto = ttl_defecto
+        self.revision = revision        # Cada cuántos segundos el hilo revisa vencimientos
+        self._snapshot = snapshot_vacio()
+        self._invalidadas = set()
+        self._vistas = {}               # {nombre: (versiones de dependencias, valor)}
+        self._lock_refresco = threading.Lock()
+        self._lock_snapshot = threading.Lock()
+        self._lock_vistas = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self.errores = {}               # errores del último intento {libro: mensaje}
+        self.ultimo_intento = None
+        self.sembrado = False           # El primer snapshot vino de disco (arranque en frío)
+        self.desde_disco = set()        # Hojas sembradas ya vencidas que aún no se sincronizaron
+
+    def actual(self):
+        """Snapshot vigente (lectura sin bloqueo: es un reemplazo atómico de referencia)"""
+        return self._snapshot
+
+    def listo(self):
+        return bool(self._snapshot.tablas)
+
+    # --- Vencimientos ---
+    def ttl_de(self, libro, hoja):
+        return self.ttl.get((libro, hoja), self.ttl_defecto)
+
+    def vencidas(self):
+        snap = self._snapshot
+        try:
+            self._invalidadas.update(set(self.externas()) & set(self.hojas))
+        except OSError:
+            pass
+        return [
+            (libro, hoja) for libro, hoja in self.hojas
+            if (libro, hoja) in self._invalidadas
+            or (libro, hoja) not in snap.cargado_en
+            or snap.edad_segundos(libro, hoja) >= self.ttl_de(libro, hoja)
+        ]
+
+    def sembrar(self, tablas, cargadas_en):
+        """
+        Arranque en frío: publica hojas guardadas en disco sin ir a la red.
+        cargadas_en: {(libro, hoja): datetime} de su última verificación; las que ya
+        vencieron las refresca el hilo de fondo en su primera revisión.
+        """
+        with self._lock_snapshot:
+            self._snapshot = snap = self._snapshot.con_tablas(tablas, cargadas_en=cargadas_en)
+        self.sembrado = True
+        self.desde_disco = {c for c in tablas if snap.edad_segundos(*c) >= self.ttl_de(*c)}
+
+    def invalidar(self, libro, hoja):
+        """Marca una hoja para recargarla en el próximo ciclo (las demás no se tocan)"""
+        self._invalidadas.add((libro, hoja))
+        self._despertar.set()
+
+    # --- Descarga ---
+    def refrescar(self, hojas=None):
+        """
+        Descarga las hojas indicadas (por defecto todas) y publica un nuevo snapshot.
+        Retorna True si alguna hoja se actualizó.
+        """
+        with self._lock_refresco:
+            hojas = list(hojas if hojas is not None else self.hojas)
+            if not hojas:
+                return False
+            self.ultimo_intento = datetime.now()
+            libros = {}
+            for libro, hoja in hojas:
+                libros.setdefault(libro, []).append(hoja)
+            versiones_al_inicio = {h: self._snapshot.version_de(*h) for h in hojas}
+            for h in hojas:
+                self._invalidadas.discard(h)
+
+            try:
+                tablas, tiempos, errores = self._cargar(libros)
+            except Exception as e:
+                self.errores = {"*": str(e)}
+                self._invalidadas.update(hojas)
+                return False
+            self.errores = errores
+            self.desde_disco -= {h for h in hojas if h[0] not in errores}
+
+            with self._lock_snapshot:
+                snap = self._snapshot
+                nuevas = {}
+                for clave in hojas:
+                    if clave[0] in errores or clave not in tablas:
+                        continue    # Libro con error: se conserva la versión anterior
+                    if snap.version_de(*clave) != versiones_al_inicio[clave] or self.pendientes(*clave):
+                        # Hubo escrituras durante la descarga: esta foto podría no incluirlas
+                        self._invalidadas.add(clave)
+                        continue
+                    nuevas[clave] = tablas[clave]
+                if not nuevas:
+                    return False
+                ok = {libro: seg for libro, seg in tiempos.items() if libro not in errores}
+                self._snapshot = snap.con_tablas(nuevas, tiempos=ok, recargadas=True)
+            self.aceptadas(list(nuevas))
+            return True
+
+    # --- Escrituras locales ---
+    def aplicar_filas(self, libro, hoja, filas, fila_final_remota=None):
+        """
+        Aplica al snapshot filas ya confirmadas en Drive, sin volver a descargar.
+        fila_final_remota: última fila escrita según Drive. Si no coincide con la
+        cantidad local hay deriva (otro usuario escribió) y se recarga solo esa hoja.
+        """
+        with self._lock_snapshot:
+            snap = self._snapshot
+            df = snap.tabla(libro, hoja)
+            esperado = len(df) + len(filas) + 1    # +1 por la fila de encabezados
+            self._snapshot = snap.con_tablas({(libro, hoja): anexar_filas(df, filas)})
+
+        if fila_final_remota is not None and fila_final_remota != esperado:
+            self.invalidar(libro, hoja)
+
+    def verificar_deriva(self, libro, hoja, fila_final_remota, filas_sin_confirmar=0):
+        """
+        Compara la última fila escrita en Drive con la tabla local (que ya incluye
+        las filas aún en cola). Si no cuadra, otro usuario escribió: se recarga la hoja.
+        """
+        if fila_final_remota is None:
+            return
+        esperado = len(self._snapshot.tabla(libro, hoja)) - filas_sin_confirmar + 1
+        if esperado != fila_final_remota:
+            self.invalidar(libro, hoja)
+
+    def reemplazar_tabla(self, libro, hoja, df):
+        """Publica una hoja completa ya escrita en Drive (editor masivo)"""
+        with self._lock_snapshot:
+            self._snapshot = self._snapshot.con_tablas({(libro, hoja): df.reset_index(drop=True)})
+
+    # --- Vistas derivadas ---
+    def vista(self, nombre, dependencias, construir, actualizar=None, snapshot=None):
+        """
+        Valor calculado a partir de una o más hojas, memorizado por sus versiones.
+        Solo se reconstruye cuando cambia alguna de sus hojas de origen.
+        construir recibe los DataFrames de dependencias en el mismo orden.
+        actualizar(valor_previo, *dfs), opcional: intenta ponerse al día de forma
+        incremental; si retorna None se reconstruye completo.
+        snapshot: el que está usando el rerun (por defecto el actual). Así la vista
+        corresponde a los mismos DataFrames aunque otra sesión haya escrito entre medio.
+        """
+        snap = snapshot or self._snapshot
+        clave = tuple(snap.version_de(*d) for d in dependencias)
+        guardado = self._vistas.get(nombre)
+        # Solo se pone al día desde un valor de versiones anteriores (nunca "hacia atrás")
+        previo = guardado if guardado and all(g <= c for g, c in zip(guardado[0], clave)) else None
+        with tramo(f"vista:{nombre}", CACHE) as t:
+            if guardado and guardado[0] == clave:
+                t["resultado"] = "hit"
+                return guardado[1]
+            tablas = [snap.tabla(*d) for d in dependencias]
+            valor = actualizar(previo[1], *tablas) if previo and actualizar else None
+            t["resultado"] = "incremental" if valor is not None else "miss"
+            if valor is None:
+                valor = construir(*tablas)
+        with self._lock_vistas:
+            actual = self._vistas.get(nombre)
+            if not actual or all(a <= c for a, c in zip(actual[0], clave)):
+                self._vistas[nombre] = (clave, valor)
+        return valor
+
+    # --- Hilo de fondo ---
+    def solicitar_refresco(self):
+        """Invalida todas las hojas y despierta al hilo de fondo"""
+        self._invalidadas.update(self.hojas)
+        self._despertar.set()
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._despertar.set()   # La primera revisión es inmediata (hojas sembradas desde disco)
+        self._hilo = threading.Thread(target=self._bucle, name="sincronizador-drive", daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(self.revision)
+            self._despertar.clear()
+            try:
+                self.refrescar(self.vencidas())
+            except Exception:
+                # El hilo nunca debe morir: el próximo ciclo lo reintenta
+                time.sleep(1)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from alarmas import tabla_limites, evaluar, NORMAL, ALERTA, ALERTA_TASA, DISPARO
+from lecturas import parsear_lecturas
+
+
+def lecturas(filas):
+    """[(ID_Punto, fecha, valor)] -> datos de parsear_lecturas ordenados por punto y fecha"""
+    df = pd.DataFrame(filas, columns=["ID_Punto", "Fecha_Lectura", "Valor_Medido"])
+    return parsear_lecturas(df).sort_values(["ID_Punto", "fecha"], kind="mergesort").reset_index(drop=True)
+
+
+def test_tabla_limites_usa_la_hoja_y_completa_con_los_defectos():
+    hoja = pd.DataFrame({"ID_Punto": ["PM-EQ-01-TEM", "PM-EQ-02-AMP", "PM-EQ-03-VIB"],
+                         "Alerta": ["60", "30", ""], "Disparo": ["70", "", "9"], "Tasa_Max": ["", "", ""]})
+
+    limites = tabla_limites(hoja, ["PM-EQ-01-TEM", "PM-EQ-02-AMP", "PM-EQ-03-VIB", "PM-EQ-04-VIB", "PM-EQ-05-XYZ"])
+
+    assert limites.loc["PM-EQ-01-TEM"].tolist() == [60.0, 70.0, 10.0]      # Tasa vacía: la de TEM
+    assert limites.loc["PM-EQ-03-VIB"].tolist() == [4.5, 9.0, 2.0]         # Alerta vacía: la de VIB
+    assert limites.loc["PM-EQ-04-VIB"].tolist() == [4.5, 7.1, 2.0]         # Sin fila en la hoja
+    # AMP no tiene defecto y una variable desconocida tampoco: sin límite
+    assert limites.loc["PM-EQ-02-AMP", "Alerta"] == 30.0 and np.isnan(limites.loc["PM-EQ-02-AMP", "Disparo"])
+    assert limites.loc["PM-EQ-05-XYZ"].isna().all()
+
+
+def test_tabla_limites_sin_hoja():
+    limites = tabla_limites(pd.DataFrame(), ["PM-EQ-01-TEM"])
+
+    assert limites.loc["PM-EQ-01-TEM"].tolist() == [80.0, 95.0, 10.0]
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (79.9, NORMAL), (80.0, ALERTA), (94.9, ALERTA), (95.0, DISPARO), (120.0, DISPARO),
+])
+def test_evaluar_limites_inclusivos(valor, esperado):
+    datos = lecturas([("PM-EQ-01-TEM", "2024-01-01 08:00", valor)])
+
+    assert evaluar(datos, tabla_limites(pd.DataFrame(), datos["ID_Punto"])).tolist() == [esperado]
+
+
+def test_evaluar_tasa_de_cambio_por_punto():
+    datos = lecturas([
+        ("PM-EQ-01-TEM", "2024-01-01 08:00", 40.0),
+        ("PM-EQ-01-TEM", "2024-01-01 10:00", 60.0),     # 10 °C/h: en el límite, no lo supera
+        ("PM-EQ-01-TEM", "2024-01-01 11:00", 71.0),     # 11 °C/h
+        ("PM-EQ-02-TEM", "2024-01-01 11:00", 20.0),     # Otro punto: sin tasa contra el anterior
+    ])
+
+    assert evaluar(datos, tabla_limites(pd.DataFrame(), datos["ID_Punto"])).tolist() == [
+        NORMAL, NORMAL, ALERTA_TASA, NORMAL]
+
+
+def test_evaluar_sin_limites_es_normal():
+    datos = lecturas([("PM-EQ-01-AMP", "2024-01-01 08:00", 500.0), ("PM-EQ-01-AMP", "2024-01-01 09:00", 5.0)])
+
+    assert evaluar(datos, tabla_limites(pd.DataFrame(), datos["ID_Punto"])).tolist() == [NORMAL, NORMAL]
+    assert evaluar(datos.iloc[:0], tabla_limites(pd.DataFrame(), [])).empty
@@ -0,0 +1,55 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from almacen_lecturas import AlmacenLecturas
+
+HOY = datetime(2024, 3, 15)
+
+
+def lecturas_prueba():
+    return pd.DataFrame({
+        "ID_Punto": ["P-01", "P-02", "P-01", "P-02"],
+        "Fecha_Lectura": ["2024-01-10 08:00", "2024-01-20 08:00", "2024-02-10 08:00", "2024-03-10 08:00"],
+        "Valor_Medido": ["1.5", "2.0", "1.7", "2.1"],
+        "Estado": ["Normal"] * 4,
+    })
+
+
+def test_sella_meses_cerrados_y_descarga_solo_lo_posterior(tmp_path):
+    almacen = AlmacenLecturas(str(tmp_path))
+    completa = almacen.sincronizar(lecturas_prueba(), hoy=HOY)
+
+    assert len(completa) == 4
+    assert almacen.filas == 3 and almacen.meses() == {"2024-01": 2, "2024-02": 1}
+    # Se vuelve a pedir la última fila sellada para comprobar que la hoja no cambió
+    assert almacen.fila_desde() == 4
+    assert len(almacen.sincronizar(lecturas_prueba().iloc[2:], hoy=HOY)) == 4
+
+
+def test_descarte_pedido_por_otra_replica_lo_atiende_quien_sincroniza(tmp_path):
+    lider, replica = AlmacenLecturas(str(tmp_path)), AlmacenLecturas(str(tmp_path))
+    lider.sincronizar(lecturas_prueba(), hoy=HOY)
+    archivos = [os.path.join(r, a) for r, _, nombres in os.walk(tmp_path) for a in nombres if a.endswith(".parquet")]
+
+    replica.descartar()
+    # La réplica no borra nada: el líder puede estar leyendo esos archivos
+    assert all(os.path.exists(a) for a in archivos)
+
+    # Lo descargado desde la última fila sellada ya no sirve: hay que bajar la hoja entera
+    assert lider.sincronizar(lecturas_prueba().iloc[2:], hoy=HOY) is None
+    editada = lecturas_prueba().assign(Estado="Alarma")
+    completa = lider.sincronizar(editada, hoy=HOY)
+
+    assert list(completa["Estado"]) == ["Alarma"] * 4
+    assert list(lider.selladas()["Estado"]) == ["Alarma"] * 3
+
+
+def test_nuevo_lider_retoma_lo_sellado_por_el_anterior(tmp_path):
+    anterior, nuevo = AlmacenLecturas(str(tmp_path)), AlmacenLecturas(str(tmp_path))
+    anterior.sincronizar(lecturas_prueba().iloc[:2], hoy=HOY)
+    anterior.sincronizar(lecturas_prueba().iloc[1:], hoy=HOY)
+
+    assert nuevo.fila_desde() == 4
+    assert list(nuevo.sincronizar(lecturas_prueba().iloc[2:], hoy=HOY)["Valor_Medido"]) == [1.5, 2.0, 1.7, 2.1]
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from almacenamiento import AlmacenamientoDrive, AlmacenamientoSQLite, copiar_libros
+from carga_datos import ClienteLocal
+
+LIBRO = "1_DATA_MAESTRA"
+
+
+def activos_prueba():
+    return pd.DataFrame({
+        "TAG": ["EQ-01", "EQ-02", "EQ-03"],
+        "Nombre": ["Digestor", "Prensa", "Secador"],
+        "Especificacion_Tecnica": ["Vapor 8 bar", "Tornillo doble", "Rotatorio"],
+        "Potencia": [75, 40, 55],
+    })
+
+
+@pytest.fixture(params=["drive", "sqlite"])
+def almacenamiento(request, tmp_path):
+    """Las mismas hojas en cada backend: las pruebas verifican que se comporten igual"""
+    if request.param == "drive":
+        return AlmacenamientoDrive(ClienteLocal({LIBRO: {"ACTIVOS": activos_prueba()}}))
+    sqlite = AlmacenamientoSQLite(str(tmp_path / "planta.db"))
+    sqlite.importar(LIBRO, "ACTIVOS", activos_prueba())
+    return sqlite
+
+
+def test_leer_libro_con_hoja_opcional_faltante(almacenamiento):
+    tablas, _ = almacenamiento.leer_libro(LIBRO, ["ACTIVOS", "LIMITES"], opcionales=["LIMITES"])
+
+    assert tablas["ACTIVOS"].to_dict("list") == activos_prueba().to_dict("list")
+    assert tablas["LIMITES"].empty
+
+
+def test_leer_desde_fila(almacenamiento):
+    tablas, _ = almacenamiento.leer_libro(LIBRO, ["ACTIVOS"], desde={"ACTIVOS": 4})
+
+    assert list(tablas["ACTIVOS"]["TAG"]) == ["EQ-03"]
+
+
+def test_escrituras_por_posicion(almacenamiento):
+    assert almacenamiento.anexar_filas(LIBRO, "ACTIVOS", [["EQ-04", "Molino", "", 30]]) == 5
+    almacenamiento.actualizar_rangos(LIBRO, "ACTIVOS", [{"range": "B3:B3", "values": [["Prensa 2"]]},
+                                                        {"range": "D5", "values": [[35]]}])
+    almacenamiento.borrar_filas(LIBRO, "ACTIVOS", [2, 4])
+
+    df = almacenamiento.leer_hoja(LIBRO, "ACTIVOS")
+    assert df[["TAG", "Nombre", "Potencia"]].to_dict("list") == {
+        "TAG": ["EQ-02", "EQ-04"], "Nombre": ["Prensa 2", "Molino"], "Potencia": [40, 35]}
+
+
+def test_reescribir_hoja(almacenamiento):
+    almacenamiento.reescribir_hoja(LIBRO, "ACTIVOS", [["TAG", "Nombre"], ["EQ-09", "Caldero"]])
+
+    assert almacenamiento.leer_hoja(LIBRO, "ACTIVOS").to_dict("list") == {"TAG": ["EQ-09"], "Nombre": ["Caldero"]}
+
+
+def test_copiar_drive_a_sqlite(tmp_path):
+    drive = AlmacenamientoDrive(ClienteLocal({LIBRO: {"ACTIVOS": activos_prueba()}}))
+    sqlite = AlmacenamientoSQLite(str(tmp_path / "copia.db"))
+
+    copiadas = copiar_libros(drive, sqlite, {LIBRO: ["ACTIVOS"]})
+
+    assert copiadas == {(LIBRO, "ACTIVOS"): 3}
+    assert sqlite.leer_hoja(LIBRO, "ACTIVOS").to_dict("list") == activos_prueba().to_dict("list")
+
+
+# --- Proyección de columnas ---
+def test_leer_por_columnas_y_omitiendo(almacenamiento):
+    assert almacenamiento.leer_hoja(LIBRO, "ACTIVOS", columnas=["TAG", "Potencia"]).to_dict("list") == {
+        "TAG": ["EQ-01", "EQ-02", "EQ-03"], "Potencia": [75, 40, 55]}
+
+    tablas, _ = almacenamiento.leer_libro(LIBRO, ["ACTIVOS"], omitir={"ACTIVOS": ["Especificacion_Tecnica"]})
+    sin_especificacion = tablas["ACTIVOS"]
+    # La columna omitida queda vacía en su posición (las escrituras siguen usando posiciones del Excel)
+    assert list(sin_especificacion.columns) == list(activos_prueba().columns)
+    assert list(sin_especificacion["Especificacion_Tecnica"]) == ["", "", ""]
+    assert list(sin_especificacion["Potencia"]) == [75, 40, 55]
+
+
+def test_proyeccion_en_drive_pide_solo_los_bloques_de_columnas(monkeypatch):
+    import carga_datos
+    pedidos = []
+    original = carga_datos._LibroLocal.values_batch_get
+    monkeypatch.setattr(carga_datos._LibroLocal, "values_batch_get",
+                        lambda self, ranges, params=None: pedidos.append(list(ranges)) or original(self, ranges, params))
+    drive = AlmacenamientoDrive(ClienteLocal({LIBRO: {"ACTIVOS": activos_prueba()}}))
+    omitir = {"ACTIVOS": ["Especificacion_Tecnica"]}
+
+    drive.leer_libro(LIBRO, ["ACTIVOS"], omitir=omitir)
+    drive.leer_libro(LIBRO, ["ACTIVOS"], omitir=omitir)
+
+    # Primera lectura: encabezados y luego los bloques; con los encabezados conocidos, un solo pedido
+    assert pedidos == [["'ACTIVOS'!1:1"], ["'ACTIVOS'!A2:B", "'ACTIVOS'!D2:D"],
+                       ["'ACTIVOS'!1:1", "'ACTIVOS'!A2:B", "'ACTIVOS'!D2:D"]]
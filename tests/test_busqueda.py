@@ -0,0 +1,53 @@
+import pandas as pd
+
+from busqueda import IndiceBusqueda, tokens
+
+
+def activos_prueba():
+    return pd.DataFrame({
+        "TAG": ["EQ-DIG-01", "EQ-DIG-01-MTR", "EQ-PREN-01", "EQ-PREN-01-ROD"],
+        "Nombre": ["Digestor 1", "Motor eléctrico", "Prensa 1", "Rodamiento lado carga"],
+    })
+
+
+def indice(df):
+    return IndiceBusqueda(df, "TAG", {"TAG": 3, "Nombre": 2}, ["Nombre"])
+
+
+def test_tokens():
+    assert tokens("EQ-DIG-01") == ["eq", "dig", "01", "eqdig01"]
+    assert tokens("Vibración", compacto=False) == ["vibracion"]
+
+
+def test_buscar_exacta_prefijo_y_con_error_de_tipeo():
+    idx = indice(activos_prueba())
+
+    assert idx.buscar("motor")[0] == "EQ-DIG-01-MTR"
+    assert set(idx.buscar("pren")) == {"EQ-PREN-01", "EQ-PREN-01-ROD"}
+    assert idx.buscar("rodamineto") == ["EQ-PREN-01-ROD"]
+    assert idx.etiqueta("EQ-DIG-01") == "EQ-DIG-01 · Digestor 1"
+
+
+def test_con_filas_nuevas_retorna_otro_indice_y_no_cambia_el_anterior():
+    df = activos_prueba()
+    previo = indice(df)
+    previo.buscar("motor")      # Arreglos numpy ya calculados para "motor"
+    ampliado = pd.concat([df, pd.DataFrame({"TAG": ["EQ-SEC-01-MTR"], "Nombre": ["Motor secador"]})],
+                         ignore_index=True)
+
+    nuevo = previo.con_filas_nuevas(ampliado)
+
+    assert nuevo is not previo
+    assert previo.buscar("motor") == ["EQ-DIG-01-MTR"]
+    assert previo.buscar("secador") == [] and len(previo.claves) == 4
+    assert nuevo.buscar("motor") == indice(ampliado).buscar("motor")
+    assert nuevo.buscar("secador") == ["EQ-SEC-01-MTR"]
+    assert nuevo.buscar("secdor") == ["EQ-SEC-01-MTR"]
+
+
+def test_con_filas_nuevas_detecta_cambios_previos():
+    df = activos_prueba()
+    previo = indice(df)
+
+    assert previo.con_filas_nuevas(df) is previo
+    assert previo.con_filas_nuevas(df.assign(Nombre=df["Nombre"].str.upper())) is None
@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+
+import carga_datos
+from carga_datos import (ClienteLocal, leer_libro, cargar_libros, _numerizar, valores_a_dataframe,
+                         LIBROS, HOJAS, ACTIVOS, LIMITES)
+
+
+def libros_prueba():
+    return {
+        "1_DATA_MAESTRA": {
+            "ACTIVOS": [["TAG", "Nombre", "TAG_Padre", "Potencia"],
+                        ["EQ-01", "Digestor", "", "75"], ["EQ-01-MTR", "Motor", "EQ-01", "7.5"]],
+            "MATERIALES": [["SKU", "Descripcion"], ["M-1", "Rodamiento"]],
+            "BOM": [["TAG_Equipo", "SKU_Material"], ["EQ-01-MTR", "M-1"]],
+        },
+        "2_GESTION_TRABAJO": {"ORDENES": [["ID_OT", "TAG_Equipo"], ["OT-1", "EQ-01"]]},
+        "3_MONITOREO": {
+            "LECTURAS": [["Fecha_Lectura", "ID_Punto", "Valor_Medido"],
+                         ["2024-01-01 08:00:00", "PM-EQ-01-MTR-TEM", "61.5"],
+                         ["2024-01-02 08:00:00", "PM-EQ-01-MTR-TEM", "62"],
+                         ["2024-01-03 08:00:00", "PM-EQ-01-MTR-TEM"]],
+            "LIMITES": [["ID_Punto", "Alerta", "Disparo", "Tasa_Max"], ["PM-EQ-01-MTR-TEM", "70", "80", ""]],
+        },
+    }
+
+
+@pytest.fixture
+def pedidos(monkeypatch):
+    """Rangos de cada values_batch_get que llega al cliente local"""
+    llamadas = []
+    original = carga_datos._LibroLocal.values_batch_get
+
+    def registrar(self, ranges, params=None):
+        llamadas.append(list(ranges))
+        return original(self, ranges, params)
+
+    monkeypatch.setattr(carga_datos._LibroLocal, "values_batch_get", registrar)
+    return llamadas
+
+
+# --- Un pedido por libro ---
+def test_cargar_libros_hace_un_pedido_por_libro(pedidos):
+    tablas, tiempos, errores = cargar_libros(ClienteLocal(libros_prueba()))
+
+    assert errores == {}
+    assert set(tablas) == set(HOJAS) and set(tiempos) == set(LIBROS)
+    assert len(pedidos) == len(LIBROS)
+    # Cada pedido trae todas las hojas de un mismo libro
+    assert sorted(len(rangos) for rangos in pedidos) == sorted(len(hojas) for hojas in LIBROS.values())
+    assert list(tablas[ACTIVOS]["TAG"]) == ["EQ-01", "EQ-01-MTR"]
+
+
+def test_leer_libro_desde_fila_pide_encabezados_y_el_final(pedidos):
+    tablas, _ = leer_libro(ClienteLocal(libros_prueba()), "3_MONITOREO", ["LECTURAS"], desde={"LECTURAS": 3})
+
+    assert pedidos == [["'LECTURAS'!1:1", "'LECTURAS'!A3:ZZ"]]
+    assert list(tablas["LECTURAS"]["Fecha_Lectura"]) == ["2024-01-02 08:00:00", "2024-01-03 08:00:00"]
+
+
+def test_libro_inexistente_queda_como_error():
+    libros = libros_prueba()
+    del libros["2_GESTION_TRABAJO"]
+    tablas, _, errores = cargar_libros(ClienteLocal(libros))
+
+    assert list(errores) == ["2_GESTION_TRABAJO"]
+    assert tablas[("2_GESTION_TRABAJO", "ORDENES")].empty
+    assert not tablas[ACTIVOS].empty
+
+
+# --- Hojas opcionales ---
+def test_hoja_opcional_faltante_se_lee_vacia():
+    libros = libros_prueba()
+    del libros["3_MONITOREO"]["LIMITES"]
+    tablas, _, errores = cargar_libros(ClienteLocal(libros))
+
+    assert errores == {}
+    assert tablas[LIMITES].empty
+    assert len(tablas[("3_MONITOREO", "LECTURAS")]) == 3
+
+
+def test_hoja_obligatoria_faltante_usa_la_primera_del_libro():
+    tablas, _ = leer_libro(ClienteLocal(libros_prueba()), "1_DATA_MAESTRA", ["MATERIALES", "NO_EXISTE"])
+
+    assert list(tablas["NO_EXISTE"].columns) == ["TAG", "Nombre", "TAG_Padre", "Potencia"]
+    assert list(tablas["MATERIALES"]["SKU"]) == ["M-1"]
+
+
+# --- Conversión de valores ---
+@pytest.mark.parametrize("valor, esperado", [
+    ("12", 12), ("1.5", 1.5), ("-3", -3), ("", ""), ("EQ-01", "EQ-01"), ("1e3", 1000.0), (7, 7), (None, None),
+])
+def test_numerizar(valor, esperado):
+    resultado = _numerizar(valor)
+    assert resultado == esperado and type(resultado) is type(esperado)
+
+
+def test_valores_numericos_y_filas_cortas():
+    tablas, _ = leer_libro(ClienteLocal(libros_prueba()), "3_MONITOREO", ["LECTURAS"])
+    lecturas = tablas["LECTURAS"]
+
+    assert list(lecturas["Valor_Medido"]) == [61.5, 62, ""]
+    assert valores_a_dataframe([]).empty
+    assert valores_a_dataframe([["A", "B"], ["1"]]).to_dict("records") == [{"A": 1, "B": ""}]
+
+
+def test_cliente_local_acepta_dataframes():
+    df = pd.DataFrame({"SKU": ["M-1", "M-2"], "Stock": [3, 4]})
+    tablas, _ = leer_libro(ClienteLocal({"L": {"MATERIALES": df}}), "L", ["MATERIALES"])
+
+    assert tablas["MATERIALES"].to_dict("list") == {"SKU": ["M-1", "M-2"], "Stock": [3, 4]}
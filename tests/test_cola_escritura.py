@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+import cola_escritura
+from cola_escritura import ColaEscritura, reservar_journal, PENDIENTE, CONFIRMADA, FALLIDA
+
+LECTURAS = ("3_MONITOREO", "LECTURAS")
+ORDENES = ("2_GESTION_TRABAJO", "ORDENES")
+
+
+class ErrorApi(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class AlmacenamientoFalso:
+    """anexar_filas de un backend en memoria; 'fallas' se lanzan en orden antes de escribir"""
+    def __init__(self, fallas=()):
+        self.hojas = {}
+        self.envios = []
+        self.fallas = list(fallas)
+
+    def anexar_filas(self, libro, hoja, filas):
+        if self.fallas:
+            raise self.fallas.pop(0)
+        self.envios.append(((libro, hoja), [f[0] for f in filas]))
+        self.hojas.setdefault((libro, hoja), []).extend(filas)
+        return len(self.hojas[(libro, hoja)]) + 1     # Última fila escrita (con encabezados)
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Segundos de cada time.sleep de la cola (sin esperar de verdad)"""
+    registro = []
+    monkeypatch.setattr(cola_escritura.time, "sleep", registro.append)
+    return registro
+
+
+def filas_en_journal(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea)["fila"] for linea in f if json.loads(linea)["op"] == "encolar"]
+
+
+# --- Journal ---
+def test_reinicio_reencola_lo_pendiente_del_journal(tmp_path):
+    journal = str(tmp_path / "cola.jsonl")
+    anterior = ColaEscritura(AlmacenamientoFalso().anexar_filas, journal)
+    anterior.encolar(*LECTURAS, ["P-01", 1.0])
+    anterior.encolar(*LECTURAS, ["P-02", 2.0])
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('{"op": "encolar", "id": "cortada"')      # Corte abrupto a mitad de línea
+
+    almacenamiento, confirmadas = AlmacenamientoFalso(), []
+    cola = ColaEscritura(almacenamiento.anexar_filas, journal,
+                         al_confirmar=lambda libro, hoja, no_aplicadas, *_: confirmadas.append(no_aplicadas))
+
+    assert cola.pendientes(*LECTURAS) == 2
+    assert cola.vaciar() == 2
+    assert almacenamiento.hojas[LECTURAS] == [["P-01", 1.0], ["P-02", 2.0]]
+    # Recuperadas del journal: nunca se mostraron en esta ejecución, la app debe aplicarlas
+    assert confirmadas == [[["P-01", 1.0], ["P-02", 2.0]]]
+    assert filas_en_journal(journal) == []
+
+
+def test_lo_confirmado_no_se_reenvia_tras_reiniciar(tmp_path):
+    journal = str(tmp_path / "cola.jsonl")
+    anterior = ColaEscritura(AlmacenamientoFalso().anexar_filas, journal)
+    anterior.encolar(*LECTURAS, ["P-01", 1.0])
+    anterior.vaciar()
+    anterior.encolar(*LECTURAS, ["P-02", 2.0])
+
+    cola = ColaEscritura(AlmacenamientoFalso().anexar_filas, journal)
+
+    assert [p["fila"] for p in cola._pendientes] == [["P-02", 2.0]]
+
+
+@pytest.mark.skipif(cola_escritura.fcntl is None, reason="sin bloqueo entre procesos todos comparten el journal")
+def test_cada_cola_usa_su_propio_journal(tmp_path):
+    ruta_a, ruta_b = reservar_journal(str(tmp_path)), reservar_journal(str(tmp_path))
+    assert ruta_a != ruta_b
+
+    a = ColaEscritura(AlmacenamientoFalso().anexar_filas, ruta_a)
+    b = ColaEscritura(AlmacenamientoFalso().anexar_filas, ruta_b)
+    b.encolar(*LECTURAS, ["P-02", 2.0])
+    a.encolar(*LECTURAS, ["P-01", 1.0])
+
+    # La compactación de una réplica no toca lo que otra tiene pendiente
+    assert a.vaciar() == 1
+    assert filas_en_journal(ruta_a) == []
+    assert filas_en_journal(ruta_b) == [["P-02", 2.0]]
+
+
+# --- Envío ---
+def test_lotes_por_hoja_conservan_el_orden(tmp_path):
+    almacenamiento = AlmacenamientoFalso()
+    cola = ColaEscritura(almacenamiento.anexar_filas, str(tmp_path / "cola.jsonl"), lote_maximo=2)
+    for i in range(5):
+        cola.encolar(*LECTURAS, [f"L{i}"])
+        cola.encolar(*ORDENES, [f"O{i}"])
+
+    assert cola.vaciar() == 10
+    # Un append_rows por hoja y cada lote_maximo filas, en el orden en que se encolaron
+    assert almacenamiento.envios == [(LECTURAS, ["L0", "L1"]), (LECTURAS, ["L2", "L3"]), (LECTURAS, ["L4"]),
+                                     (ORDENES, ["O0", "O1"]), (ORDENES, ["O2", "O3"]), (ORDENES, ["O4"])]
+
+
+def test_limite_de_cuota_reintenta_con_espera_creciente(tmp_path, esperas):
+    almacenamiento = AlmacenamientoFalso(fallas=[ErrorApi(429)] * 7)
+    cola = ColaEscritura(almacenamiento.anexar_filas, str(tmp_path / "cola.jsonl"),
+                         backoff_inicial=2.0, backoff_max=16.0, max_reintentos=2)
+    id_escritura = cola.encolar(*LECTURAS, ["P-01", 1.0])
+
+    # La cuota se recupera sola: se reintenta más allá de max_reintentos
+    assert cola.vaciar() == 1
+    assert esperas == [2.0, 4.0, 8.0, 16.0, 16.0, 16.0, 16.0]
+    assert almacenamiento.hojas[LECTURAS] == [["P-01", 1.0]]
+    assert cola.estado(id_escritura) == CONFIRMADA
+
+
+def test_error_permanente_descarta_el_lote(tmp_path, esperas):
+    almacenamiento, fallidas = AlmacenamientoFalso(fallas=[ErrorApi(400)] * 3), []
+    cola = ColaEscritura(almacenamiento.anexar_filas, str(tmp_path / "cola.jsonl"), max_reintentos=3,
+                         al_fallar=lambda libro, hoja: fallidas.append((libro, hoja)))
+    id_escritura = cola.encolar(*LECTURAS, ["P-01", 1.0])
+
+    assert cola.vaciar() == 0
+    assert len(esperas) == 2 and fallidas == [LECTURAS]
+    assert cola.estado(id_escritura) == FALLIDA and cola.pendientes() == 0
+
+
+def test_estados_confirmados_no_se_acumulan(tmp_path):
+    cola = ColaEscritura(AlmacenamientoFalso().anexar_filas, str(tmp_path / "cola.jsonl"))
+    ids = cola.encolar_lote(*LECTURAS, [[f"P-{i:02d}", float(i)] for i in range(50)])
+    assert {cola.estado(i) for i in ids} == {PENDIENTE}
+
+    cola.vaciar()
+
+    assert cola._estados == {}
+    assert {cola.estado(i) for i in ids} == {CONFIRMADA}
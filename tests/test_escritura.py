@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from almacenamiento import AlmacenamientoDrive
+from carga_datos import ClienteLocal
+from escritura import calcular_diff, aplicar_diff, agrupar_rangos, rango_columna, rangos_columna
+
+
+def hoja_prueba():
+    return pd.DataFrame({
+        "TAG": ["EQ-01", "EQ-02", "EQ-03", "EQ-04"],
+        "Nombre": ["Digestor", "Prensa", "Secador", "Molino"],
+        "Estado": ["Operativo", "Operativo", "Parado", "Operativo"],
+        "Potencia": [75, 40, 55, 30],
+    })
+
+
+def drive(df):
+    return AlmacenamientoDrive(ClienteLocal({"1_DATA_MAESTRA": {"ACTIVOS": df}}))
+
+
+# --- Rangos ---
+def test_agrupar_rangos_une_celdas_contiguas_sin_nombre_de_hoja():
+    data = agrupar_rangos([(5, 2, "a"), (5, 3, "b"), (5, 4, "c"), (5, 7, "d"), (2, 1, "e")])
+
+    assert data == [{"range": "A2", "values": [["e"]]},
+                    {"range": "B5:D5", "values": [["a", "b", "c"]]},
+                    {"range": "G5", "values": [["d"]]}]
+
+
+def test_rango_columna():
+    assert rango_columna(5, ["x", None, 3]) == [{"range": "E2:E4", "values": [["x"], [""], [3]]}]
+
+
+def test_cliente_local_rechaza_rangos_con_hoja_como_gspread():
+    ws = ClienteLocal({"L": {"H": [["A"], ["1"]]}}).open("L").worksheet("H")
+    with pytest.raises(ValueError):
+        ws.batch_update([{"range": "'H'!A2", "values": [["2"]]}])
+
+
+def test_rangos_columna_solo_celdas_cambiadas():
+    previos = ["Normal", "Normal", "Alerta", None, "Normal"]
+    nuevos = ["Normal", "Disparo", "Alerta", "", "Alerta"]
+
+    assert rangos_columna(5, previos, nuevos) == [{"range": "E3", "values": [["Disparo"]]},
+                                                  {"range": "E6", "values": [["Alerta"]]}]
+    assert rangos_columna(5, previos, previos) == []
+
+
+def test_rangos_columna_entera_si_cambio_la_mayoria():
+    previos = ["Normal"] * 4
+    nuevos = ["Alerta", "Alerta", "Alerta", "Normal"]
+
+    assert rangos_columna(5, previos, nuevos) == rango_columna(5, nuevos)
+
+
+# --- Ida y vuelta contra el cliente local ---
+def test_diff_ida_y_vuelta():
+    original = hoja_prueba()
+    editado = original.copy()
+    editado.loc[1, "Estado"] = "Parado"
+    editado.loc[1, "Potencia"] = 45
+    editado.loc[3, "Nombre"] = "Molino de martillos"
+    editado = editado.drop(index=2)
+    editado = pd.concat([editado, pd.DataFrame([{"TAG": "EQ-05", "Nombre": "Caldero",
+                                                 "Estado": "Operativo", "Potencia": 120}], index=[10])])
+    almacenamiento = drive(original)
+
+    diff = calcular_diff(original, editado)
+    resumen = aplicar_diff(almacenamiento, "1_DATA_MAESTRA", "ACTIVOS", diff)
+
+    assert resumen == {"celdas": 3, "rangos": 2, "insertadas": 1, "eliminadas": 1}
+    leida = almacenamiento.leer_hoja("1_DATA_MAESTRA", "ACTIVOS")
+    pd.testing.assert_frame_equal(leida, diff["resultado"], check_dtype=False)
+
+
+def test_diff_sin_cambios_no_escribe():
+    original = hoja_prueba()
+    diff = calcular_diff(original, original.copy())
+
+    assert diff["celdas"] == [] and diff["eliminadas"] == [] and diff["insertadas"].empty
+
+
+def test_diff_con_otras_columnas_no_es_posible():
+    original = hoja_prueba()
+    assert calcular_diff(original, original.drop(columns=["Potencia"])) is None
@@ -0,0 +1,71 @@
+import re
+
+import pandas as pd
+import pytest
+
+from carga_datos import ACTIVOS, ORDENES, LECTURAS
+from esquema import aplicar_esquema, sin_categorias, ErrorEsquema
+
+
+def ordenes(**columnas):
+    base = {"ID_OT": ["1", "2", "3", "4", "5"], "TAG_Equipo": ["EQ-01", "EQ-02", "EQ-01", "EQ-03", "EQ-01"],
+            "Fecha_Programada": ["2024-01-05", "2024-01-06", "", "2024-01-08", "2024-01-09"],
+            "Estado_OT": ["Abierta", "Cerrada", "Abierta", "", "Abierta"], "Comentario": ["a", "b", "c", "d", "e"]}
+    return pd.DataFrame({**base, **columnas})
+
+
+def test_tipos_compactos_y_vacios():
+    df, informe = aplicar_esquema(ORDENES, ordenes())
+
+    assert df["ID_OT"].dtype == "Int64" and list(df["ID_OT"]) == [1, 2, 3, 4, 5]
+    assert df["Fecha_Programada"].dtype == "datetime64[ns]" and df["Fecha_Programada"].isna().tolist() == [
+        False, False, True, False, False]
+    assert isinstance(df["Estado_OT"].dtype, pd.CategoricalDtype)
+    assert pd.isna(df["Estado_OT"].iloc[3])                     # Celda vacía: sin categoría ""
+    assert df["Comentario"].dtype == ordenes()["Comentario"].dtype    # No declarada: queda como llegó
+    assert informe["filas"] == 5 and informe["invalidas"] == {}
+
+
+def test_pocas_celdas_ilegibles_quedan_vacias_y_se_informan():
+    df, informe = aplicar_esquema(ORDENES, ordenes(ID_OT=["1", "2", "3", "4", "1.5"],
+                                                   Fecha_Programada=["2024-01-05", "2024-01-06", "pronto",
+                                                                     "2024-01-08", "2024-01-09"]))
+
+    assert df["ID_OT"].isna().tolist() == [False] * 4 + [True]   # 1.5 no es un entero
+    assert df["Fecha_Programada"].isna().tolist() == [False, False, True, False, False]
+    assert informe["invalidas"] == {"ID_OT": 1, "Fecha_Programada": 1}
+
+
+def test_categoria_desconocida_se_agrega():
+    df, informe = aplicar_esquema(ORDENES, ordenes(Estado_OT=["Abierta", "En espera de repuesto", "", "", ""]))
+
+    assert list(df["Estado_OT"].cat.categories) == ["Abierta", "En espera de repuesto"]
+    assert informe["invalidas"] == {}
+
+
+@pytest.mark.parametrize("columna, valores, mensaje", [
+    ("ID_OT", ["1", "dos", "tres", "4", "cinco"], "'ID_OT' no es entero (3 de 5 celdas"),
+    ("Fecha_Programada", ["2024-01-05", "mañana", "pronto", "", "luego"], "'Fecha_Programada' no es fecha (3 de 4 celdas"),
+])
+def test_columna_mayormente_ilegible_se_rechaza(columna, valores, mensaje):
+    with pytest.raises(ErrorEsquema, match=re.escape(mensaje)):
+        aplicar_esquema(ORDENES, ordenes(**{columna: valores}))
+
+    # Sin estricto (escrituras propias) no se rechaza: las celdas quedan vacías
+    df, informe = aplicar_esquema(ORDENES, ordenes(**{columna: valores}), estricto=False)
+    assert informe["invalidas"][columna] == 3
+
+
+def test_columna_obligatoria_ausente():
+    with pytest.raises(ErrorEsquema, match="faltan las columnas ID_Punto"):
+        aplicar_esquema(LECTURAS, pd.DataFrame({"Fecha_Lectura": ["2024-01-01"], "Valor_Medido": ["1"]}))
+    # Hoja vacía (sin encabezados): no hay nada que rechazar
+    assert aplicar_esquema(LECTURAS, pd.DataFrame())[0].empty
+
+
+def test_sin_categorias_para_el_editor():
+    df, _ = aplicar_esquema(ACTIVOS, pd.DataFrame({"TAG": ["EQ-01"], "Nivel": ["Equipo"]}))
+
+    editable = sin_categorias(df)
+
+    assert editable["Nivel"].dtype == object and isinstance(df["Nivel"].dtype, pd.CategoricalDtype)
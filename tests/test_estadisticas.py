@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from estadisticas import EstadisticasPuntos
+from lecturas import IndiceLecturas
+
+
+def lecturas_prueba():
+    filas = []
+    for dia in range(1, 11):
+        for punto, base in [("PM-EQ-01-VIB", 2.0), ("PM-EQ-02-TEM", 60.0)]:
+            filas.append({"Fecha_Lectura": f"2024-01-{dia:02d} 08:00:00", "ID_Punto": punto,
+                          "Valor_Medido": base + dia % 3, "Inspector": "Turno A", "Estado": "Normal"})
+    return pd.DataFrame(filas)
+
+
+def con_lectura(df, fecha, punto, valor):
+    fila = {"Fecha_Lectura": fecha, "ID_Punto": punto, "Valor_Medido": valor, "Inspector": "Turno B", "Estado": "Normal"}
+    return pd.concat([df, pd.DataFrame([fila])], ignore_index=True)
+
+
+def estadisticas(df):
+    return EstadisticasPuntos.desde_indice(IndiceLecturas(df), df)
+
+
+def test_con_filas_nuevas_igual_que_reconstruir():
+    df = lecturas_prueba()
+    df_nuevo = con_lectura(df, "2024-01-11 08:00:00", "PM-EQ-01-VIB", 9.0)
+
+    nuevo = estadisticas(df).con_filas_nuevas(df_nuevo, IndiceLecturas(df_nuevo))
+
+    completo = estadisticas(df_nuevo)
+    pd.testing.assert_frame_equal(nuevo.estado.sort_index(), completo.estado.sort_index(), check_dtype=False)
+    assert nuevo.huella == completo.huella
+
+
+@pytest.mark.parametrize("columna, valor", [("Valor_Medido", 40.0), ("Fecha_Lectura", "2024-01-09 12:00:00"),
+                                            ("ID_Punto", "PM-EQ-02-TEM")])
+def test_lecturas_previas_editadas_obligan_a_reconstruir(columna, valor):
+    df = lecturas_prueba()
+    est = estadisticas(df)
+    editado = con_lectura(df, "2024-01-11 08:00:00", "PM-EQ-01-VIB", 9.0)
+    editado.loc[4, columna] = valor     # No es la última fila: antes pasaba inadvertido
+
+    assert est.con_filas_nuevas(editado, IndiceLecturas(editado)) is None
+
+
+def test_estado_guardado_se_pone_al_dia(tmp_path):
+    df = lecturas_prueba()
+    ruta = str(tmp_path / "estadisticas.parquet")
+    estadisticas(df).guardar(ruta)
+    df_nuevo = con_lectura(df, "2024-01-11 08:00:00", "PM-EQ-02-TEM", 61.0)
+
+    nuevo = EstadisticasPuntos.cargar(ruta).con_filas_nuevas(df_nuevo, IndiceLecturas(df_nuevo))
+
+    assert nuevo is not None and nuevo.filas == 21
+    assert nuevo.estado.loc["PM-EQ-02-TEM", "ultimo_valor"] == 61.0
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from jerarquia import IndiceJerarquia, IndiceSubarbol, resumen_subarbol
+
+
+def activos_prueba():
+    return pd.DataFrame({
+        "TAG": ["PL-01", "AR-DIG", "EQ-DIG-01", "EQ-DIG-01-MTR", "AR-PREN", "EQ-PREN-01", "HUERFANO"],
+        "TAG_Padre": ["", "PL-01", "AR-DIG", "EQ-DIG-01", "PL-01", "AR-PREN", "NO-EXISTE"],
+        "Nivel": ["L2-Planta", "L3-Area", "L4-Equipo", "L5-Sistema", "L3-Area", "L4-Equipo", "L4-Equipo"],
+        "Nombre": ["Planta", "Digestión", "Digestor 1", "Motor", "Prensado", "Prensa 1", "Suelto"],
+    })
+
+
+def test_indice_jerarquia():
+    jer = IndiceJerarquia(activos_prueba())
+
+    assert list(jer.plantas()) == ["PL-01"]
+    assert list(jer.hijos_de("PL-01")) == ["AR-DIG", "AR-PREN"]
+    assert list(jer.hijos_de("EQ-PREN-01")) == []
+    assert jer.ruta("EQ-DIG-01-MTR") == ["PL-01", "AR-DIG", "EQ-DIG-01", "EQ-DIG-01-MTR"]
+    assert jer.registro("AR-PREN")["Nombre"] == "Prensado"
+    assert list(jer.tabla_hijos("AR-DIG")["TAG"]) == ["EQ-DIG-01"]
+    assert jer.nivel_sugerido("EQ-DIG-01") == "L5-Sistema" and jer.nivel_sugerido(None) == "L2-Planta"
+
+
+def test_indice_jerarquia_vacio():
+    jer = IndiceJerarquia(pd.DataFrame())
+
+    assert list(jer.plantas()) == [] and not jer.existe("PL-01") and jer.registro("PL-01") is None
+
+
+# --- Subárboles (intervalos de Euler) ---
+def test_subarbol_descendientes_y_totales():
+    sub = IndiceSubarbol(IndiceJerarquia(activos_prueba()))
+    ots = pd.DataFrame({"TAG_Equipo": ["EQ-DIG-01-MTR", "EQ-DIG-01", "EQ-PREN-01", "NO-EXISTE"],
+                        "Estado_OT": ["Abierta", "Cerrada", "Abierta", "Abierta"]})
+    pos = sub.posiciones(ots["TAG_Equipo"])
+
+    assert set(sub.descendientes("AR-DIG")) == {"AR-DIG", "EQ-DIG-01", "EQ-DIG-01-MTR"}
+    assert sub.descendientes("HUERFANO") == ["HUERFANO"]
+    assert pos[-1] == -1
+    assert list(sub.mascara("AR-DIG", pos)) == [True, True, False, False]
+    totales = sub.totales(pos)
+    assert totales["PL-01"] == 3 and totales["AR-DIG"] == 2 and totales["HUERFANO"] == 0
+    resumen = resumen_subarbol(sub, "PL-01", ots, pos, pd.DataFrame(), pos[:0], pd.DataFrame(), pos[:0])
+    assert resumen["ots_abiertas"] == 2
+
+
+def test_subarbol_con_activos_nuevos_igual_que_reconstruir():
+    df = activos_prueba()
+    previo = IndiceSubarbol(IndiceJerarquia(df))
+    ampliado = pd.concat([df, pd.DataFrame({"TAG": ["EQ-DIG-02", "PL-02"], "TAG_Padre": ["AR-DIG", ""],
+                                            "Nivel": ["L4-Equipo", "L2-Planta"], "Nombre": ["Digestor 2", "Planta 2"]})],
+                         ignore_index=True)
+
+    nuevo = previo.con_activos_nuevos(ampliado)
+    completo = IndiceSubarbol(IndiceJerarquia(ampliado))
+
+    assert nuevo is not previo and "EQ-DIG-02" not in previo.id
+    for tag in ampliado["TAG"]:
+        assert set(nuevo.descendientes(tag)) == set(completo.descendientes(tag))
+    assert previo.con_activos_nuevos(df.assign(TAG_Padre=df["TAG_Padre"].shift(fill_value=""))) is None
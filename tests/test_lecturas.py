@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lecturas import IndiceLecturas, validar_carga
+
+
+def lecturas_prueba():
+    filas = []
+    for dia in range(1, 11):
+        for punto in ["PM-EQ-01-TEM", "PM-EQ-01-VIB", "PM-EQ-02-AMP"]:
+            filas.append({"Fecha_Lectura": f"2024-01-{dia:02d} 08:00:00", "ID_Punto": punto,
+                          "Valor_Medido": float(dia), "Inspector": "Turno A", "Estado": "Normal"})
+    return pd.DataFrame(filas)
+
+
+def anexar(df, filas):
+    nuevas = pd.DataFrame([{"Fecha_Lectura": f, "ID_Punto": p, "Valor_Medido": v, "Inspector": "Turno B",
+                            "Estado": "Normal"} for f, p, v in filas])
+    return pd.concat([df, nuevas], ignore_index=True)
+
+
+def assert_mismo_indice(a, b):
+    assert list(a.tramos.items()) == list(b.tramos.items())
+    assert a.variables_por_tag == b.variables_por_tag
+    pd.testing.assert_frame_equal(a.datos, b.datos)
+
+
+def test_serie_y_ultimas():
+    indice = IndiceLecturas(lecturas_prueba())
+
+    serie = indice.serie("EQ-01", "VIB", desde="2024-01-03", hasta="2024-01-05 08:00")
+    assert list(serie["valor"]) == [3.0, 4.0, 5.0]
+    assert indice.puntos(["EQ-01"]) == [("EQ-01", "TEM"), ("EQ-01", "VIB")]
+    assert list(indice.ultimas([("EQ-02", "AMP")], n=2)["valor"]) == [9.0, 10.0]
+
+
+# --- Actualización incremental ---
+@pytest.mark.parametrize("filas", [
+    [("2024-01-11 08:00:00", "PM-EQ-01-VIB", 11.0)],                                # al final de un punto
+    [("2024-01-04 12:00:00", "PM-EQ-01-TEM", 4.5), ("2024-01-01 08:00:00", "PM-EQ-02-AMP", 0.5)],   # atrasadas y empate
+    [("2024-01-05 08:00:00", "PM-EQ-00-TEM", 1.0), ("2024-01-05 08:00:00", "PM-EQ-01-AMP", 1.0),
+     ("2024-01-05 08:00:00", "PM-EQ-09-VIB", 1.0)],                                 # puntos nuevos antes, en medio y al final
+    [("sin fecha", "PM-EQ-01-VIB", 1.0)],                                           # fila sin fecha válida
+])
+def test_con_filas_nuevas_igual_que_reconstruir(filas):
+    df = lecturas_prueba()
+    indice = IndiceLecturas(df)
+    df_nuevo = anexar(df, filas)
+
+    nuevo = indice.con_filas_nuevas(df_nuevo)
+
+    assert nuevo is not None and nuevo is not indice
+    assert_mismo_indice(nuevo, IndiceLecturas(df_nuevo))
+    assert len(indice.datos) == 30      # El índice anterior no cambia
+
+
+def test_con_filas_nuevas_admite_id_punto_vacio():
+    df = lecturas_prueba()
+    df.loc[4, "ID_Punto"] = np.nan
+    df_nuevo = anexar(df, [("2024-01-11 08:00:00", "PM-EQ-01-TEM", 11.0)])
+
+    nuevo = IndiceLecturas(df).con_filas_nuevas(df_nuevo)
+
+    assert nuevo is not None
+    assert_mismo_indice(nuevo, IndiceLecturas(df_nuevo))
+
+
+def test_con_filas_nuevas_detecta_cambios_previos():
+    df = lecturas_prueba()
+    indice = IndiceLecturas(df)
+    editado = anexar(df, [("2024-01-11 08:00:00", "PM-EQ-01-TEM", 11.0)])
+    editado.loc[2, "ID_Punto"] = "PM-EQ-03-TEM"
+
+    assert indice.con_filas_nuevas(editado) is None
+    assert indice.con_filas_nuevas(df.iloc[:-1]) is None
+
+
+@pytest.mark.parametrize("columna, valor", [("Valor_Medido", 99.0), ("Fecha_Lectura", "2024-01-09 12:00:00")])
+def test_con_filas_nuevas_detecta_lecturas_previas_editadas(columna, valor):
+    df = lecturas_prueba()
+    indice = IndiceLecturas(df)
+    editado = anexar(df, [("2024-01-11 08:00:00", "PM-EQ-01-TEM", 11.0)])
+    editado.loc[2, columna] = valor
+
+    assert indice.con_filas_nuevas(editado) is None
+    # Editar columnas que el índice no usa no obliga a reconstruir
+    editado = anexar(df, [("2024-01-11 08:00:00", "PM-EQ-01-TEM", 11.0)])
+    editado.loc[2, "Estado"] = "Alarma"
+    assert indice.con_filas_nuevas(editado) is not None
+
+
+# --- Carga masiva ---
+def test_validar_carga_acepta_y_rechaza_por_motivo():
+    archivo = pd.DataFrame({
+        "TAG": ["EQ-01", "EQ-01", "EQ-99", "EQ-01", "EQ-01", "EQ-01", "EQ-01", "EQ-01", "EQ-01"],
+        "Variable": ["Vibración", "TEM", "VIB", "Presión", "VIB", "VIB", "VIB", "AMP", "TEM"],
+        "Fecha": ["2024-02-01 08:00", "01/02/2024 09:00", "2024-02-01 08:00", "2024-02-01 08:00",
+                  "", "ayer", "2024-02-01 08:00", "2024-02-02 08:00", "2024-01-03 08:00:00"],
+        "Valor": ["2,5", "61", "1", "1", "1", "1", "3.0", "x", "3"],
+    })
+    existentes = IndiceLecturas(lecturas_prueba()).datos
+
+    validas, rechazadas = validar_carga(archivo, ["EQ-01", "EQ-02"], existentes)
+
+    assert validas[["Fecha_Lectura", "ID_Punto", "Valor_Medido"]].values.tolist() == [
+        ["2024-02-01 08:00:00", "PM-EQ-01-VIB", 2.5], ["2024-02-01 09:00:00", "PM-EQ-01-TEM", 61.0]]
+    assert list(validas["Estado"]) == ["Registrado", "Registrado"]
+    assert list(rechazadas["Fila_Archivo"]) == [4, 5, 6, 7, 8, 9, 10]
+    assert list(rechazadas["Motivo"]) == ["TAG no existe en ACTIVOS", "Variable desconocida", "Fecha inválida",
+                                          "Fecha inválida", "Duplicada en el archivo", "Valor no numérico",
+                                          "Ya registrada"]
+
+
+def test_validar_carga_fecha_vacia_es_invalida_sin_importar_el_tipo():
+    archivo = pd.DataFrame({"ID_Punto": ["PM-EQ-01-VIB", "PM-EQ-01-TEM"], "Fecha_Lectura": ["", " "],
+                            "Valor_Medido": ["1", "2"]}).astype("str")
+
+    validas, rechazadas = validar_carga(archivo, ["EQ-01"])
+
+    assert validas.empty
+    assert list(rechazadas["Motivo"]) == ["Fecha inválida", "Fecha inválida"]
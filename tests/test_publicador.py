@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+import publicador
+from publicador import PublicadorSnapshot
+from sincronizador import Sincronizador
+
+ACTIVOS = ("1_DATA_MAESTRA", "ACTIVOS")
+
+pytestmark = pytest.mark.skipif(publicador.fcntl is None, reason="sin bloqueo entre procesos no hay réplicas")
+
+
+def replica_con_sincronizador(publicador_replica, pendientes):
+    def cargar(libros):
+        tablas, _ = publicador_replica.leer([(libro, hoja) for libro, hojas in libros.items() for hoja in hojas])
+        return tablas, {}, {}
+    return Sincronizador(cargar, [ACTIVOS], pendientes=lambda libro, hoja: pendientes[0],
+                         aceptadas=publicador_replica.confirmar)
+
+
+def test_replica_lee_lo_publicado_por_el_lider(tmp_path):
+    lider, replica = PublicadorSnapshot(str(tmp_path)), PublicadorSnapshot(str(tmp_path))
+    assert lider.es_lider() and not replica.es_lider()
+    lider.publicar({ACTIVOS: pd.DataFrame({"TAG": ["EQ-01", "EQ-02"]})})
+
+    tablas, faltan = replica.leer([ACTIVOS, ("2_GESTION_TRABAJO", "ORDENES")])
+
+    assert list(tablas[ACTIVOS]["TAG"]) == ["EQ-01", "EQ-02"]
+    assert faltan == [("2_GESTION_TRABAJO", "ORDENES")]
+
+
+def test_hoja_descartada_por_el_sincronizador_se_vuelve_a_entregar(tmp_path):
+    lider, replica = PublicadorSnapshot(str(tmp_path)), PublicadorSnapshot(str(tmp_path))
+    lider.es_lider()
+    lider.publicar({ACTIVOS: pd.DataFrame({"TAG": ["EQ-01"]})})
+    pendientes = [1]
+    sinc = replica_con_sincronizador(replica, pendientes)
+
+    # Con escrituras locales en cola la descarga se descarta...
+    assert not sinc.refrescar()
+    assert ACTIVOS in replica.externas()
+
+    # ...y cuando se confirman, la misma versión publicada se vuelve a leer
+    pendientes[0] = 0
+    assert sinc.refrescar()
+    assert list(sinc.actual().tabla(*ACTIVOS)["TAG"]) == ["EQ-01"]
+    assert ACTIVOS not in replica.externas()
+    assert not sinc.refrescar()     # Ya la tiene: no se relee
+
+
+def test_escritura_propia_espera_la_verificacion_del_lider(tmp_path):
+    lider, replica = PublicadorSnapshot(str(tmp_path)), PublicadorSnapshot(str(tmp_path))
+    lider.es_lider()
+    lider.publicar({ACTIVOS: pd.DataFrame({"TAG": ["EQ-01"]})})
+    replica.confirmar(replica.leer([ACTIVOS])[0])
+
+    replica.solicitar(*ACTIVOS)
+    assert replica.leer([ACTIVOS])[0] == {}
+
+    lider.publicar({ACTIVOS: pd.DataFrame({"TAG": ["EQ-01", "EQ-02"]})})
+    assert list(replica.leer([ACTIVOS])[0][ACTIVOS]["TAG"]) == ["EQ-01", "EQ-02"]